@@ -5,35 +5,149 @@ Unified backend (Flask) using the shared SQLAlchemy models in /database.
 
 Implements:
 - CRUD for passwords (list/add/update/trash/restore/delete/favorite)
+- Bulk upsert for vault import (skip/overwrite/merge on site + username)
+- Keyset-paginated, field-projected password listing
+- Delta sync (per-user change sequence + tombstones for deleted rows)
 - Simple reveal (returns stored encrypted_password as-is; client-side decrypt if you use zero-knowledge)
-- Stats endpoint (weak/medium/strong + favorites + trashed + security score)
+- Stats endpoint (weak/medium/strong + favorites + trashed + security score),
+  served from per-user counters or a single GROUP BY aggregate; password
+  reuse from keyed fingerprints
+- Security audit (weak/reused/old/pwned) with incremental re-runs
 - Profile endpoint (get/update username/email)
 - Sessions + devices listing + revoke (optional, for 'pro' feel)
-- Export/Import JSON (for backups / portability)
+- Export/Import JSON (for backups / portability); export can stream NDJSON
 """
 
 from __future__ import annotations
 
+import base64
+import json
+import os
+import threading
+from collections import Counter
 from datetime import datetime
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from sqlalchemy import select, update, delete
-from sqlalchemy.exc import IntegrityError
-
-from database.engine import SessionLocal, init_db
-from database.models import Password, User, Session, UserDevice, ActivityLog
+from sqlalchemy import String, and_, bindparam, case, func, insert, literal, or_, select, update, delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from database.engine import SessionLocal, count_if, engine, init_db, insert_ignore
+from database.models import (
+    Password, PasswordStats, PasswordTombstone, User, Session, UserDevice,
+)
+from database.sync import current_seq, next_seq, prune_tombstones, pruned_seq, record_cursor
+from src.security.audit import log_action
+from src.security.log_retention import retention_loop
+from src.security.fingerprint import backfill_fingerprints, fingerprints_many, password_fingerprint, reuse_counts
+from src.security.security_audit import audit_findings, audit_summary, run_security_audit
 
 app = Flask(__name__)
 CORS(app)
 init_db()
 
+# Per-user stats counters (password_stats); set STATS_COUNTERS=0 to always aggregate.
+STATS_COUNTERS = os.getenv("STATS_COUNTERS", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _log(user_id: int | None, action: str, durable: bool | None = None) -> bool:
+    """Queue an activity entry on the write-behind audit writer (no extra commit here).
+
+    With `durable`, returns False when the entry could not be committed.
+    """
+    return log_action(user_id or 0, action, durable=durable)
+
+
+def _audit_unavailable():
+    return jsonify({"ok": False, "error": "Audit log unavailable, try again later"}), 500
+
+
+_STRENGTH_POINTS = {"strong": 2, "medium": 1}
+_STAT_KEYS = ("total", "active", "weak", "medium", "strong", "favorites", "trashed", "points")
+
+
+def _stat_row(p) -> tuple[str, bool, bool]:
+    """What a password contributes to /stats: (strength, favorite, trashed)."""
+    return (p.strength or "").lower(), bool(p.favorite), p.trashed_at is not None
+
+
+def _stat_dict(d: dict) -> tuple[str, bool, bool]:
+    """_stat_row for plain dicts (bulk paths)."""
+    return (d.get("strength") or "").lower(), bool(d.get("favorite")), d.get("trashed_at") is not None
+
+
+def _stat_deltas(row: tuple[str, bool, bool], n: int = 1) -> dict:
+    strength, favorite, trashed = row
+    d = {"total": n}
+    if strength in ("weak", "medium", "strong"):
+        d[strength] = n
+    if favorite:
+        d["favorites"] = n
+    if trashed:
+        d["trashed"] = n
+    else:
+        d["active"] = n
+        d["points"] = n * _STRENGTH_POINTS.get(strength, 0)
+    return d
 
-def _log(db, user_id: int | None, action: str) -> None:
+
+def _bump_counters(db, user_id: int, before=(), after=()) -> None:
+    """Apply stat rows leaving (`before`) / entering (`after`) to password_stats.
+
+    A missing counters row is left alone; /stats rebuilds it from the aggregate.
+    With STATS_COUNTERS off the row is dropped instead, so it is rebuilt (not
+    stale) once counters are turned back on.
+    """
+    if not STATS_COUNTERS:
+        db.execute(delete(PasswordStats).where(PasswordStats.user_id == user_id))
+        return
+    delta = Counter()
+    for row in before:
+        delta.update(_stat_deltas(row, -1))
+    for row in after:
+        delta.update(_stat_deltas(row, 1))
+    values = {k: getattr(PasswordStats, k) + v for k, v in delta.items() if v}
+    if values:
+        db.execute(update(PasswordStats).where(PasswordStats.user_id == user_id).values(**values))
+
+
+def _stats_select(user_id: int):
+    """_STAT_KEYS for one user as a single aggregate row, over the (user_id, strength, favorite, trashed_at) index."""
+    strength = func.lower(func.coalesce(Password.strength, ""))
+    active = Password.trashed_at.is_(None)
+    return select(
+        func.count().label("total"),
+        count_if(active).label("active"),
+        count_if(strength == "weak").label("weak"),
+        count_if(strength == "medium").label("medium"),
+        count_if(strength == "strong").label("strong"),
+        count_if(Password.favorite.is_(True)).label("favorites"),
+        count_if(Password.trashed_at.is_not(None)).label("trashed"),
+        func.coalesce(func.sum(case(
+            *((and_(active, strength == k), v) for k, v in _STRENGTH_POINTS.items()), else_=0,
+        )), 0).label("points"),
+    ).where(Password.user_id == user_id)
+
+
+def _aggregate_stats(db, user_id: int) -> dict:
+    return dict(db.execute(_stats_select(user_id)).one()._mapping)
+
+
+def _build_counters(db, user_id: int) -> None:
+    """Create the user's counters row from the aggregate, in one INSERT ... SELECT.
+
+    Counting and inserting in the same statement means no write can land
+    between the two (a concurrent builder's row wins instead).
+    """
+    agg = _stats_select(user_id).add_columns(literal(user_id).label("user_id"))
+    stmt = insert_ignore(PasswordStats).from_select([*_STAT_KEYS, "user_id"], agg)
+    if engine.dialect.name in ("sqlite", "postgresql", "mysql", "mariadb"):
+        db.execute(stmt)
+        return
     try:
-        db.add(ActivityLog(user_id=user_id or 0, action=action))
-        db.commit()
-    except Exception:
-        db.rollback()
+        with db.begin_nested():
+            db.execute(stmt)
+    except IntegrityError:
+        pass  # no ON CONFLICT on this backend: another request built it first
 
 
 @app.get("/health")
@@ -43,32 +157,176 @@ def health():
 
 # --------------------------- PASSWORDS ---------------------------
 
+PASSWORD_FIELDS = (
+    "id",
+    "user_id",
+    "site_name",
+    "site_url",
+    "site_icon",
+    "username",
+    "encrypted_password",
+    "category",
+    "strength",
+    "favorite",
+    "trashed_at",
+    "change_seq",
+    "last_updated",
+    "created_at",
+)
+PAGE_SIZE_DEFAULT = 200
+PAGE_SIZE_MAX = 1000
+
+
+def _serialize_password(row, fields=PASSWORD_FIELDS) -> dict:
+    """Serialize a Password (ORM object or projected row) restricted to `fields`."""
+    out = {}
+    for f in fields:
+        v = getattr(row, f)
+        if f == "site_url":
+            v = v or ""
+        elif f == "site_icon":
+            v = v or "🔒"
+        elif f == "favorite":
+            v = bool(v)
+        elif f in ("trashed_at", "last_updated", "created_at"):
+            v = v.isoformat() if v else None
+        out[f] = v
+    return out
+
+
+def _parse_fields(raw: str | None) -> tuple[str, ...]:
+    """Parse a `fields=a,b,c` projection; id and last_updated are always kept (cursor keys)."""
+    if not raw:
+        return PASSWORD_FIELDS
+    wanted = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = wanted - set(PASSWORD_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    wanted |= {"id", "last_updated"}
+    return tuple(f for f in PASSWORD_FIELDS if f in wanted)
+
+
+def _encode_cursor(last_updated: datetime | None, pid: int) -> str:
+    raw = f"{last_updated.isoformat() if last_updated else ''}|{pid}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        ts, pid = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(ts) if ts else None), int(pid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _ts_param(dt: datetime):
+    # SQLite keeps CURRENT_TIMESTAMP values as "YYYY-MM-DD HH:MM:SS" text, so compare
+    # against the same textual form (a bound datetime would carry ".000000").
+    if engine.dialect.name == "sqlite":
+        return literal(dt.isoformat(sep=" "), String)
+    return dt
+
+
 @app.get("/passwords/<int:user_id>")
 def list_passwords(user_id: int):
+    """List a user's passwords, newest first.
+
+    Query params:
+    - fields=a,b,c  projection (e.g. leave out encrypted_password)
+    - limit=N       enables keyset paging on (last_updated, id); returns
+                    {"items": [...], "next_cursor": "..."}
+    - cursor=...    next_cursor from the previous page
+    Without limit/cursor the full list is returned (legacy shape).
+    """
+    try:
+        fields = _parse_fields(request.args.get("fields"))
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit", type=int)
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    paged = limit is not None or cursor is not None
     db = SessionLocal()
     try:
-        rows = db.execute(
-            select(Password).where(Password.user_id == user_id).order_by(Password.last_updated.desc())
-        ).scalars().all()
+        seq = current_seq(db, user_id)
+        q = (
+            select(*[getattr(Password, f) for f in fields])
+            .where(Password.user_id == user_id)
+            .order_by(Password.last_updated.desc(), Password.id.desc())
+        )
+        if after is not None:
+            ts, pid = after
+            if ts is None:
+                q = q.where(Password.last_updated.is_(None), Password.id < pid)
+            else:
+                ts = _ts_param(ts)
+                q = q.where(or_(
+                    Password.last_updated < ts,
+                    and_(Password.last_updated == ts, Password.id < pid),
+                    Password.last_updated.is_(None),
+                ))
+        if not paged:
+            return jsonify([_serialize_password(r, fields) for r in db.execute(q)])
+
+        limit = max(1, min(limit or PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX))
+        rows = db.execute(q.limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1].last_updated, rows[-1].id)
+        return jsonify({
+            "ok": True,
+            "items": [_serialize_password(r, fields) for r in rows],
+            "next_cursor": next_cursor,
+            "seq": seq,
+        })
+    finally:
+        db.close()
 
-        return jsonify([
-            {
-                "id": p.id,
-                "user_id": p.user_id,
-                "site_name": p.site_name,
-                "site_url": p.site_url or "",
-                "site_icon": p.site_icon or "🔒",
-                "username": p.username,
-                "encrypted_password": p.encrypted_password,
-                "category": p.category,
-                "strength": p.strength,
-                "favorite": bool(p.favorite),
-                "trashed_at": p.trashed_at.isoformat() if p.trashed_at else None,
-                "last_updated": p.last_updated.isoformat() if p.last_updated else None,
-                "created_at": p.created_at.isoformat() if p.created_at else None,
-            }
-            for p in rows
-        ])
+
+@app.get("/passwords/<int:user_id>/changes")
+def list_password_changes(user_id: int):
+    """Rows written and ids deleted after change sequence `since`.
+
+    Without `since` only the current head sequence is returned, so a client
+    can record it before a full load. Supports the same `fields=` projection
+    as the list endpoint.
+
+    With `client=<id>` the returned head is recorded as that client's cursor
+    and tombstones every client has seen are pruned. `reset: true` means
+    `since` is older than the pruned tombstones: reload instead.
+    """
+    try:
+        fields = _parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    since = request.args.get("since", type=int)
+    client = (request.args.get("client") or "").strip()[:64]
+
+    db = SessionLocal()
+    try:
+        seq = current_seq(db, user_id)
+        out = {"ok": True, "seq": seq, "changed": [], "deleted": []}
+        if since is not None and since < pruned_seq(db, user_id):
+            out["reset"] = True
+        elif since is not None and since < seq:
+            changed = db.execute(
+                select(*[getattr(Password, f) for f in fields])
+                .where(Password.user_id == user_id, Password.change_seq > since)
+                .order_by(Password.last_updated.desc(), Password.id.desc())
+            ).all()
+            out["changed"] = [_serialize_password(r, fields) for r in changed]
+            out["deleted"] = list(db.execute(
+                select(PasswordTombstone.password_id)
+                .where(PasswordTombstone.user_id == user_id, PasswordTombstone.change_seq > since)
+            ).scalars().all())
+        if client:
+            record_cursor(db, user_id, client, seq)
+            prune_tombstones(db, user_id)
+            db.commit()
+        return jsonify(out)
     finally:
         db.close()
 
@@ -90,14 +348,17 @@ def add_password():
             site_icon=str(data.get("site_icon") or "🔒"),
             username=str(data["username"]),
             encrypted_password=str(data["encrypted_password"]),
+            fingerprint=password_fingerprint(int(data["user_id"]), str(data["encrypted_password"])),
             category=str(data.get("category") or "personal"),
             strength=str(data.get("strength") or "medium"),
             favorite=bool(data.get("favorite") or False),
             trashed_at=None,
         )
+        p.change_seq = next_seq(db, p.user_id)
         db.add(p)
+        _bump_counters(db, p.user_id, after=[_stat_row(p)])
         db.commit()
-        _log(db, p.user_id, f"password:add:{p.site_name}")
+        _log(p.user_id, f"password:add:{p.site_name}")
         return jsonify({"ok": True, "id": p.id})
     except Exception as e:
         db.rollback()
@@ -106,6 +367,162 @@ def add_password():
         db.close()
 
 
+BULK_MODES = ("skip", "overwrite", "merge")
+_BULK_FILL_FIELDS = ("site_url", "site_icon", "category", "strength")
+
+
+def _dup_key(site_name, username) -> tuple[str, str]:
+    return str(site_name or "").strip().lower(), str(username or "").strip().lower()
+
+
+def _bulk_values(it: dict) -> dict:
+    return {
+        "site_name": str(it.get("site_name")),
+        "site_url": str(it.get("site_url") or "") or None,
+        "site_icon": str(it.get("site_icon") or "🔒"),
+        "username": str(it.get("username")),
+        "encrypted_password": str(it.get("encrypted_password")),
+        "category": str(it.get("category") or "personal"),
+        "strength": str(it.get("strength") or "medium"),
+        "favorite": bool(it.get("favorite") or False),
+    }
+
+
+def _bulk_merge(current: dict, it: dict) -> dict:
+    """Fields of `it` that fill gaps in `current` (merge mode never replaces data)."""
+    updates = {}
+    for field in _BULK_FILL_FIELDS:
+        if not current.get(field) and it.get(field):
+            updates[field] = str(it.get(field))
+    if not current.get("favorite") and it.get("favorite"):
+        updates["favorite"] = True
+    return updates
+
+
+@app.post("/passwords/bulk")
+def bulk_upsert_passwords():
+    """Insert/update many passwords in one transaction.
+
+    Body: {"user_id": int, "mode": "skip|overwrite|merge", "items": [...]}
+    Items are matched on (site_name, username), case-insensitive, against the
+    vault and against earlier items of the same request. Returns counters and
+    one {"index", "status", "id"} outcome per item.
+    """
+    data = request.get_json(force=True) or {}
+    items = data.get("items")
+    mode = str(data.get("mode") or "merge").lower()
+    if not data.get("user_id"):
+        return jsonify({"ok": False, "error": "Missing fields: user_id"}), 400
+    if not isinstance(items, list):
+        return jsonify({"ok": False, "error": "items must be a list"}), 400
+    if mode not in BULK_MODES:
+        return jsonify({"ok": False, "error": f"mode must be one of: {', '.join(BULK_MODES)}"}), 400
+    user_id = int(data["user_id"])
+
+    db = SessionLocal()
+    try:
+        cols = ("id", "site_name", "username", "favorite", "trashed_at") + _BULK_FILL_FIELDS
+        existing = {}
+        for r in db.execute(select(*[getattr(Password, c) for c in cols]).where(Password.user_id == user_id)):
+            existing.setdefault(_dup_key(r.site_name, r.username), dict(r._mapping))
+
+        results = [{"index": i, "status": "invalid", "id": None} for i in range(len(items))]
+        pending = {}   # key -> values of rows to insert
+        updates = {}   # id -> {field: value}
+        for i, it in enumerate(items):
+            if not isinstance(it, dict) or not it.get("site_name") or not it.get("username") \
+                    or not it.get("encrypted_password"):
+                continue
+            key = _dup_key(it.get("site_name"), it.get("username"))
+            res = results[i]
+            match = existing.get(key)
+            if match is None and key not in pending:
+                pending[key] = _bulk_values(it)
+                res["status"] = "added"
+                continue
+            res["id"] = match["id"] if match else None
+            if mode == "skip":
+                res["status"] = "skipped"
+                continue
+            if match is None:
+                # duplicate of an earlier item in this request
+                target = pending[key]
+                changes = _bulk_values(it) if mode == "overwrite" else _bulk_merge(target, it)
+                target.update(changes)
+                res["status"] = "updated" if changes else "skipped"
+                continue
+            changes = _bulk_values(it) if mode == "overwrite" else _bulk_merge(match, it)
+            if not changes:
+                res["status"] = "skipped"
+                continue
+            u = updates.setdefault(match["id"], {"before": _stat_dict(match), "values": {}})
+            u["values"].update(changes)
+            match.update(changes)
+            res["status"] = "updated"
+
+        new_rows = list(pending.values())
+        for v, fp in zip(new_rows, fingerprints_many(user_id, [v["encrypted_password"] for v in new_rows])):
+            v["fingerprint"] = fp
+        rekeyed = [u["values"] for u in updates.values() if "encrypted_password" in u["values"]]
+        for v, fp in zip(rekeyed, fingerprints_many(user_id, [v["encrypted_password"] for v in rekeyed])):
+            v["fingerprint"] = fp
+
+        seq = next_seq(db, user_id) if pending or updates else None
+        if pending:
+            db.execute(
+                insert(Password),
+                [dict(v, user_id=user_id, change_seq=seq, trashed_at=None) for v in pending.values()],
+            )
+        # executemany UPDATE, one statement per distinct column set
+        by_cols = {}
+        for pid, u in updates.items():
+            by_cols.setdefault(tuple(sorted(u["values"])), []).append(dict(u["values"], _id=pid))
+        table = Password.__table__
+        for fields, params in by_cols.items():
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values({**{f: bindparam(f) for f in fields}, "change_seq": seq}),
+                params,
+            )
+        _bump_counters(
+            db,
+            user_id,
+            before=[u["before"] for u in updates.values()],
+            after=[_stat_dict(m) for m in existing.values() if m["id"] in updates]
+            + [_stat_dict(v) for v in pending.values()],
+        )
+        db.commit()
+
+        if pending:
+            added_ids = {
+                _dup_key(r.site_name, r.username): r.id
+                for r in db.execute(
+                    select(Password.id, Password.site_name, Password.username)
+                    .where(Password.user_id == user_id, Password.change_seq == seq)
+                )
+            }
+            for i, res in enumerate(results):
+                if res["id"] is None and res["status"] != "invalid":
+                    res["id"] = added_ids.get(_dup_key(items[i].get("site_name"), items[i].get("username")))
+
+        counts = Counter(r["status"] for r in results)
+        _log(user_id, f"vault:import:{counts['added']}:{counts['updated']}")
+        return jsonify({
+            "ok": True,
+            "added": counts["added"],
+            "updated": counts["updated"],
+            "skipped": counts["skipped"],
+            "invalid": counts["invalid"],
+            "results": results,
+        })
+    except Exception as e:
+        db.rollback()
+        return jsonify({"ok": False, "error": str(e)}), 500
+    finally:
+        db.close()
+
+
 @app.put("/passwords/<int:pid>")
 def update_password(pid: int):
     data = request.get_json(force=True) or {}
@@ -114,6 +531,7 @@ def update_password(pid: int):
         p = db.get(Password, pid)
         if not p:
             return jsonify({"ok": False, "error": "Not found"}), 404
+        before = _stat_row(p)
 
         for field in ["site_name", "site_url", "site_icon", "username", "encrypted_password", "category", "strength"]:
             if field in data and data[field] is not None:
@@ -121,9 +539,13 @@ def update_password(pid: int):
 
         if "favorite" in data and data["favorite"] is not None:
             p.favorite = bool(data["favorite"])
+        if data.get("encrypted_password") is not None:
+            p.fingerprint = password_fingerprint(p.user_id, p.encrypted_password)
 
+        p.change_seq = next_seq(db, p.user_id)
+        _bump_counters(db, p.user_id, before=[before], after=[_stat_row(p)])
         db.commit()
-        _log(db, p.user_id, f"password:update:{p.site_name}")
+        _log(p.user_id, f"password:update:{p.site_name}")
         return jsonify({"ok": True})
     except Exception as e:
         db.rollback()
@@ -139,9 +561,12 @@ def trash_password(pid: int):
         p = db.get(Password, pid)
         if not p:
             return jsonify({"ok": False, "error": "Not found"}), 404
+        before = _stat_row(p)
         p.trashed_at = datetime.utcnow()
+        p.change_seq = next_seq(db, p.user_id)
+        _bump_counters(db, p.user_id, before=[before], after=[_stat_row(p)])
         db.commit()
-        _log(db, p.user_id, f"password:trash:{p.site_name}")
+        _log(p.user_id, f"password:trash:{p.site_name}")
         return jsonify({"ok": True})
     except Exception as e:
         db.rollback()
@@ -157,9 +582,12 @@ def restore_password(pid: int):
         p = db.get(Password, pid)
         if not p:
             return jsonify({"ok": False, "error": "Not found"}), 404
+        before = _stat_row(p)
         p.trashed_at = None
+        p.change_seq = next_seq(db, p.user_id)
+        _bump_counters(db, p.user_id, before=[before], after=[_stat_row(p)])
         db.commit()
-        _log(db, p.user_id, f"password:restore:{p.site_name}")
+        _log(p.user_id, f"password:restore:{p.site_name}")
         return jsonify({"ok": True})
     except Exception as e:
         db.rollback()
@@ -177,9 +605,11 @@ def delete_password(pid: int):
             return jsonify({"ok": False, "error": "Not found"}), 404
         uid = p.user_id
         name = p.site_name
+        db.add(PasswordTombstone(user_id=uid, password_id=p.id, change_seq=next_seq(db, uid)))
+        _bump_counters(db, uid, before=[_stat_row(p)])
         db.delete(p)
         db.commit()
-        _log(db, uid, f"password:delete:{name}")
+        _log(uid, f"password:delete:{name}")
         return jsonify({"ok": True})
     except Exception as e:
         db.rollback()
@@ -196,7 +626,9 @@ def reveal_password(pid: int):
         p = db.get(Password, pid)
         if not p:
             return jsonify({"ok": False, "error": "Not found"}), 404
-        _log(db, p.user_id, f"password:reveal:{p.site_name}")
+        # Secret disclosure: the entry must be committed before the response leaves.
+        if not _log(p.user_id, f"password:reveal:{p.site_name}", durable=True):
+            return _audit_unavailable()
         return jsonify({"ok": True, "encrypted_password": p.encrypted_password})
     finally:
         db.close()
@@ -209,9 +641,12 @@ def toggle_favorite(pid: int):
         p = db.get(Password, pid)
         if not p:
             return jsonify({"ok": False, "error": "Not found"}), 404
+        before = _stat_row(p)
         p.favorite = not bool(p.favorite)
+        p.change_seq = next_seq(db, p.user_id)
+        _bump_counters(db, p.user_id, before=[before], after=[_stat_row(p)])
         db.commit()
-        _log(db, p.user_id, f"password:favorite:{p.site_name}:{int(p.favorite)}")
+        _log(p.user_id, f"password:favorite:{p.site_name}:{int(p.favorite)}")
         return jsonify({"ok": True, "favorite": bool(p.favorite)})
     except Exception as e:
         db.rollback()
@@ -226,34 +661,72 @@ def toggle_favorite(pid: int):
 def stats(user_id: int):
     db = SessionLocal()
     try:
-        rows = db.execute(select(Password).where(Password.user_id == user_id)).scalars().all()
-        total = len(rows)
-        weak = sum(1 for p in rows if (p.strength or "").lower() == "weak")
-        medium = sum(1 for p in rows if (p.strength or "").lower() == "medium")
-        strong = sum(1 for p in rows if (p.strength or "").lower() == "strong")
-        favorites = sum(1 for p in rows if p.favorite)
-        trashed = sum(1 for p in rows if p.trashed_at is not None)
+        row = db.get(PasswordStats, user_id) if STATS_COUNTERS else None
+        if row is None and STATS_COUNTERS:
+            try:
+                _build_counters(db, user_id)
+                db.commit()
+                row = db.get(PasswordStats, user_id)
+            except OperationalError:
+                # SQLite busy / stale WAL snapshot: answer from the aggregate, build next time.
+                db.rollback()
+        if row is not None:
+            counts = {k: getattr(row, k) for k in _STAT_KEYS}
+        else:
+            counts = _aggregate_stats(db, user_id)
 
         # simple score: strong=2, medium=1, weak=0 (ignore trashed)
-        active = [p for p in rows if p.trashed_at is None]
-        denom = max(1, len(active) * 2)
-        score = int(100 * (sum(2 if (p.strength or "").lower()=="strong" else 1 if (p.strength or "").lower()=="medium" else 0 for p in active) / denom))
+        score = int(100 * (counts["points"] / max(1, counts["active"] * 2)))
+        reused, reused_groups = reuse_counts(db, user_id)
+        audit = audit_summary(db, user_id, active=counts["active"], reused=reused)
 
         return jsonify({
             "ok": True,
-            "total": total,
-            "active": len(active),
-            "weak": weak,
-            "medium": medium,
-            "strong": strong,
-            "favorites": favorites,
-            "trashed": trashed,
+            "total": counts["total"],
+            "active": counts["active"],
+            "weak": counts["weak"],
+            "medium": counts["medium"],
+            "strong": counts["strong"],
+            "favorites": counts["favorites"],
+            "trashed": counts["trashed"],
+            "reused": reused,
+            "reused_groups": reused_groups,
+            "old": audit.old,
+            "pwned": audit.pwned,
+            "audited_at": audit.audited_at,
             "score": score,
         })
     finally:
         db.close()
 
 
+# --------------------------- SECURITY AUDIT ---------------------------
+
+@app.post("/audit/<int:user_id>/run")
+def run_audit(user_id: int):
+    """Audit rows changed since the last run (`{"full": true}` re-audits everything)."""
+    data = request.get_json(silent=True) or {}
+    try:
+        summary = run_security_audit(user_id, full=bool(data.get("full")))
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+    _log(user_id, f"vault:audit:{summary.scanned}")
+    return jsonify({"ok": True, **summary.to_dict()})
+
+
+@app.get("/audit/<int:user_id>")
+def get_audit(user_id: int):
+    db = SessionLocal()
+    try:
+        return jsonify({
+            "ok": True,
+            **audit_summary(db, user_id).to_dict(),
+            "items": audit_findings(db, user_id),
+        })
+    finally:
+        db.close()
+
+
 # --------------------------- PROFILE ---------------------------
 
 @app.get("/profile/<int:user_id>")
@@ -283,7 +756,7 @@ def update_profile(user_id: int):
             u.email = str(data["email"]).strip()
 
         db.commit()
-        _log(db, u.id, "profile:update")
+        _log(u.id, "profile:update")
         return jsonify({"ok": True})
     except IntegrityError:
         db.rollback()
@@ -341,7 +814,7 @@ def revoke_session(session_id: int):
         uid = s.user_id
         db.delete(s)
         db.commit()
-        _log(db, uid, f"session:revoke:{session_id}")
+        _log(uid, f"session:revoke:{session_id}")
         return jsonify({"ok": True})
     except Exception as e:
         db.rollback()
@@ -352,38 +825,73 @@ def revoke_session(session_id: int):
 
 # --------------------------- EXPORT / IMPORT ---------------------------
 
+EXPORT_FIELDS = tuple(f for f in PASSWORD_FIELDS if f not in ("id", "user_id", "change_seq"))
+EXPORT_BATCH = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
 @app.get("/export/<int:user_id>")
 def export_vault(user_id: int):
-    """Export JSON. Recommend encrypting client-side before saving to disk."""
+    """Export JSON. Recommend encrypting client-side before saving to disk.
+
+    `?format=ndjson` streams the vault instead: a header line
+    {"version", "exported_at"}, one line per password, then a trailer
+    {"end": true, "count": n} so readers can detect truncation.
+    """
+    if request.args.get("format") == "ndjson":
+        return _export_ndjson(user_id)
+
     db = SessionLocal()
     try:
-        rows = db.execute(select(Password).where(Password.user_id == user_id)).scalars().all()
+        rows = db.execute(
+            select(*[getattr(Password, f) for f in EXPORT_FIELDS]).where(Password.user_id == user_id)
+        ).all()
         payload = {
             "version": 1,
             "exported_at": datetime.utcnow().isoformat(),
-            "passwords": [
-                {
-                    "site_name": p.site_name,
-                    "site_url": p.site_url or "",
-                    "site_icon": p.site_icon or "🔒",
-                    "username": p.username,
-                    "encrypted_password": p.encrypted_password,
-                    "category": p.category,
-                    "strength": p.strength,
-                    "favorite": bool(p.favorite),
-                    "trashed_at": p.trashed_at.isoformat() if p.trashed_at else None,
-                    "last_updated": p.last_updated.isoformat() if p.last_updated else None,
-                    "created_at": p.created_at.isoformat() if p.created_at else None,
-                }
-                for p in rows
-            ],
+            "passwords": [_serialize_password(p, EXPORT_FIELDS) for p in rows],
         }
-        _log(db, user_id, "vault:export")
+        if not _log(user_id, "vault:export", durable=True):
+            return _audit_unavailable()
         return jsonify({"ok": True, "vault": payload})
     finally:
         db.close()
 
 
+def _export_ndjson(user_id: int):
+    if not _log(user_id, "vault:export", durable=True):
+        return _audit_unavailable()
+    db = SessionLocal()
+
+    def generate():
+        try:
+            buf = [json.dumps({"version": 1, "exported_at": datetime.utcnow().isoformat()}) + "\n"]
+            size = len(buf[0])
+            count = 0
+            # server-side cursor: only EXPORT_BATCH rows are buffered at a time
+            rows = db.execute(
+                select(*[getattr(Password, f) for f in EXPORT_FIELDS])
+                .where(Password.user_id == user_id)
+                .order_by(Password.id)
+                .execution_options(yield_per=EXPORT_BATCH)
+            )
+            for row in rows:
+                line = json.dumps(_serialize_password(row, EXPORT_FIELDS), ensure_ascii=False) + "\n"
+                buf.append(line)
+                size += len(line)
+                count += 1
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield "".join(buf)
+                    buf, size = [], 0
+            buf.append(json.dumps({"end": True, "count": count}) + "\n")
+            yield "".join(buf)
+        finally:
+            db.close()
+
+    # No Content-Length: the WSGI server sends it with chunked transfer encoding.
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @app.post("/import/<int:user_id>")
 def import_vault(user_id: int):
     data = request.get_json(force=True) or {}
@@ -395,6 +903,8 @@ def import_vault(user_id: int):
     db = SessionLocal()
     try:
         imported = 0
+        seq = None
+        added = []
         for it in items:
             if not it.get("site_name") or not it.get("username") or not it.get("encrypted_password"):
                 continue
@@ -410,10 +920,19 @@ def import_vault(user_id: int):
                 favorite=bool(it.get("favorite") or False),
                 trashed_at=None,
             )
+            if seq is None:
+                # one bump covers the whole import (same transaction)
+                seq = next_seq(db, user_id)
+            p.change_seq = seq
             db.add(p)
+            added.append(_stat_row(p))
             imported += 1
+        new_rows = [o for o in db.new if isinstance(o, Password)]
+        for p, fp in zip(new_rows, fingerprints_many(user_id, [p.encrypted_password for p in new_rows])):
+            p.fingerprint = fp
+        _bump_counters(db, user_id, after=added)
         db.commit()
-        _log(db, user_id, f"vault:import:{imported}")
+        _log(user_id, f"vault:import:{imported}")
         return jsonify({"ok": True, "imported": imported})
     except Exception as e:
         db.rollback()
@@ -423,5 +942,15 @@ def import_vault(user_id: int):
 
 
 if __name__ == "__main__":
+    # With debug=True the reloader runs this block twice: in the parent, which
+    # only watches files, and in the serving child (WERKZEUG_RUN_MAIN=true).
+    # Background jobs belong to the child only.
+    serving = os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    # Fill fingerprints of rows written before the column existed.
+    if serving and os.getenv("FINGERPRINT_BACKFILL", "1").strip().lower() in {"1", "true", "yes", "on"}:
+        threading.Thread(target=backfill_fingerprints, name="fingerprint-backfill", daemon=True).start()
+    # Prune / archive old activity_logs rows once a day (src/security/log_retention.py).
+    if serving and os.getenv("LOG_RETENTION", "1").strip().lower() in {"1", "true", "yes", "on"}:
+        threading.Thread(target=retention_loop, name="log-retention", daemon=True).start()
     # Always bind localhost for safety
     app.run(host="127.0.0.1", port=5000, debug=True)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Throughput of decrypt_many / encrypt_many vs. per-token calls.
+
+Run from the project root:
+    python -m benchmarks.bench_batch_crypto [n ...]     (default: 10000 100000)
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from src.security.encryption import (
+    decrypt_any,
+    decrypt_many,
+    encrypt_aes_gcm,
+    encrypt_for_storage,
+    encrypt_many,
+    get_aes_gcm_key,
+    get_fernet,
+)
+
+
+def _rate(n: int, fn) -> str:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    return f"{n / dt:>10,.0f} tok/s  ({dt:6.2f} s)"
+
+
+def run(n: int) -> None:
+    plain = [f"password-{i:08d}!" for i in range(n)]
+    fernet = encrypt_many(plain)
+    # half legacy gcm1, half Fernet: the mix found in real vaults
+    mixed = [encrypt_aes_gcm(p) if i % 2 else fernet[i] for i, p in enumerate(plain)]
+
+    print(f"--- {n:,} tokens ---")
+    print("encrypt  per-token       ", _rate(n, lambda: [encrypt_for_storage(p) for p in plain]))
+    print("encrypt  encrypt_many(1) ", _rate(n, lambda: encrypt_many(plain, workers=1)))
+    print("encrypt  encrypt_many    ", _rate(n, lambda: encrypt_many(plain)))
+    print("decrypt  per-token       ", _rate(n, lambda: [decrypt_any(t) for t in mixed]))
+    print("decrypt  decrypt_many(1) ", _rate(n, lambda: decrypt_many(mixed, workers=1)))
+    print("decrypt  decrypt_many    ", _rate(n, lambda: decrypt_many(mixed)))
+    assert decrypt_many(mixed) == plain
+
+
+def main(sizes: list[int]) -> None:
+    get_fernet()
+    get_aes_gcm_key()
+    for n in sizes:
+        run(n)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Bloom pre-check vs. plain index lookups, with resident memory.
+
+Builds an index + filter from N random hashes, then scans a vault of
+mostly-unbreached passwords through the bare index and through the filter.
+
+Run from the project root:
+    python -m benchmarks.bench_breach_bloom [n_hashes] [fp_rate]   (default: 1000000 0.001)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from src.security.breach_bloom import BloomFilter, BloomGuardedSource, build_bloom_from_file
+from src.security.breach_index import BreachIndex, build_breach_index
+from src.security.password_tools import check_pwned_many
+
+
+def _rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _scan(label: str, passwords: list[str], source) -> None:
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    res = check_pwned_many(passwords, source=source)
+    dt = time.perf_counter() - t0
+    hits = sum(1 for pwned, _ in res if pwned)
+    print(f"{label:<8} {len(passwords) / dt:>12,.0f} lookups/s   "
+          f"{hits} pwned   RSS +{(_rss_kb() - rss0) / 1024:.1f} MB")
+
+
+def main(n: int = 1_000_000, fp_rate: float = 0.001, vault: int = 50_000) -> None:
+    passwords = [f"vault-password-{i}" for i in range(vault)]
+    with tempfile.TemporaryDirectory() as d:
+        dump, idx_path, bloom_path = (os.path.join(d, x) for x in ("dump.txt", "breach.idx", "breach.bloom"))
+        with open(dump, "w") as f:
+            for i in range(n):
+                f.write(f"{os.urandom(20).hex().upper()}:1\n")
+            for p in passwords[::100]:
+                f.write(f"{hashlib.sha1(p.encode()).hexdigest().upper()}:42\n")
+        build_breach_index(dump, idx_path)
+        t0 = time.perf_counter()
+        keys, m, k = build_bloom_from_file(idx_path, bloom_path, fp_rate)
+        print(f"bloom:   {keys:,} keys, {m / 8 / 1e6:.2f} MB, k={k}, "
+              f"built in {time.perf_counter() - t0:.2f} s "
+              f"(index {os.path.getsize(idx_path) / 1e6:.1f} MB)")
+
+        with BreachIndex(idx_path) as idx, BloomFilter(bloom_path) as bloom:
+            print(f"expected fp rate {bloom.fp_rate:.4%}")
+            _scan("index", passwords, idx)
+            _scan("bloom", passwords, BloomGuardedSource(bloom, idx))
+            probes = [os.urandom(20) for _ in range(vault)]
+            fp = sum(1 for p in probes if bloom.might_contain(p))
+            print(f"measured fp rate {fp / vault:.4%} over {vault:,} random probes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.001)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Build + lookup speed of the offline breach index.
+
+Builds an index from a synthetic dump of N random hashes (plus the vault's
+own passwords, so some lookups hit), then scans a 10k-entry vault.
+
+Run from the project root:
+    python -m benchmarks.bench_breach_index [n_hashes]     (default: 1000000)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from src.security.breach_index import BreachIndex, build_breach_index
+from src.security.password_tools import check_pwned_many
+
+
+def main(n: int = 1_000_000, vault: int = 10_000) -> None:
+    passwords = [f"vault-password-{i}" for i in range(vault)]
+    with tempfile.TemporaryDirectory() as d:
+        dump = os.path.join(d, "dump.txt")
+        with open(dump, "w") as f:
+            for i in range(n):
+                f.write(f"{os.urandom(20).hex().upper()}:{i % 1000 + 1}\n")
+            for p in passwords[::10]:
+                f.write(f"{hashlib.sha1(p.encode()).hexdigest().upper()}:42\n")
+
+        t0 = time.perf_counter()
+        total = build_breach_index(dump, os.path.join(d, "breach.idx"))
+        build = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with BreachIndex(os.path.join(d, "breach.idx")) as idx:
+            opened = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            res = check_pwned_many(passwords, source=idx)
+            scan = time.perf_counter() - t0
+        size = os.path.getsize(os.path.join(d, "breach.idx"))
+
+    hits = sum(1 for pwned, _ in res if pwned)
+    print(f"index:  {total:,} hashes, {size / 1e6:.1f} MB, built in {build:.2f} s")
+    print(f"open:   {opened * 1000:.2f} ms")
+    print(f"scan:   {vault:,} passwords in {scan * 1000:.1f} ms "
+          f"({vault / scan:,.0f} lookups/s), {hits} pwned")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Startup cost of importing src.security.encryption.
+
+Keys used to be derived with PBKDF2 at import time (100k + 200k
+iterations). They are now derived lazily, so the import should only cost
+the module loads, and the derivation shows up once on first use.
+
+Run from the project root:
+    python -m benchmarks.bench_import_time [runs]
+"""
+
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Deps are imported first so only encryption.py's own import is measured.
+_PROBE = """
+import time
+import cryptography.fernet, Crypto.Cipher.AES, Crypto.Random
+t0 = time.perf_counter()
+import src.security.encryption as enc
+t1 = time.perf_counter()
+enc.get_fernet(); enc.get_aes_gcm_key()
+t2 = time.perf_counter()
+enc.decrypt_any(enc.encrypt_for_storage("x"))
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+
+def _eager_cost() -> float:
+    """What the old module paid on import: both PBKDF2 derivations."""
+    import hashlib
+    import time
+
+    t0 = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"x", b"salt", 100000)
+    hashlib.pbkdf2_hmac("sha256", b"x", b"salt", 200000)
+    return time.perf_counter() - t0
+
+
+def main(runs: int = 5) -> None:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        samples.append(tuple(float(x) for x in out))
+
+    imp, first, warm = (statistics.median(col) for col in zip(*samples))
+    print(f"runs:                       {runs}")
+    print(f"import encryption.py:       {imp * 1000:8.2f} ms")
+    print(f"first key use (derivation): {first * 1000:8.2f} ms")
+    print(f"encrypt+decrypt, warm:      {warm * 1000:8.2f} ms")
+    print(f"old eager import cost:      {_eager_cost() * 1000:8.2f} ms (PBKDF2 100k + 200k)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
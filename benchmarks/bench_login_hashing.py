@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Login burst: inline PBKDF2 vs. the bounded hashing pool.
+
+N "logins" arrive at once (one thread each). Inline, every request hashes on
+its own thread; through HashingService at most workers + max_queue are
+admitted and the rest wait or are rejected (HashingBusy).
+
+Run from the project root:
+    python -m benchmarks.bench_login_hashing [logins] [iterations]   (default: 64 100000)
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+
+from src.auth.hashing import HashingBusy, HashingService, pbkdf2_hex
+
+
+def _burst(n: int, fn) -> tuple[float, list]:
+    lat, errors = [], []
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            fn(i)
+        except HashingBusy:
+            with lock:
+                errors.append(i)
+            return
+        with lock:
+            lat.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0, sorted(lat), errors
+
+
+def main(n: int = 64, iterations: int = 100_000) -> None:
+    def report(name, wall, lat, errors, extra=""):
+        p50 = lat[len(lat) // 2] * 1000 if lat else 0
+        p99 = lat[int(len(lat) * 0.99)] * 1000 if lat else 0
+        print(f"{name:<18} wall {wall:6.2f} s   p50 {p50:7.0f} ms   p99 {p99:7.0f} ms   "
+              f"rejected {len(errors)}{extra}")
+
+    wall, lat, err = _burst(n, lambda i: pbkdf2_hex(f"pw{i}", "salt", iterations))
+    report("inline", wall, lat, err)
+
+    for mode in ("thread", "process"):
+        svc = HashingService(mode=mode, queue_timeout=30)
+        depth = []
+        stop = threading.Event()
+
+        def sample():
+            while not stop.is_set():
+                depth.append(svc.queue_depth)
+                time.sleep(0.01)
+
+        s = threading.Thread(target=sample, daemon=True)
+        s.start()
+        wall, lat, err = _burst(n, lambda i: svc.hash(f"pw{i}", "salt", iterations))
+        stop.set()
+        st = svc.stats()
+        svc.shutdown()
+        report(f"pool ({mode})", wall, lat, err,
+               f"   workers {st['workers']}   max queue depth {max(depth, default=0)}")
+
+    svc = HashingService(max_queue=2, queue_timeout=0.05)
+    wall, lat, err = _burst(n, lambda i: svc.hash(f"pw{i}", "salt", iterations))
+    svc.shutdown()
+    report("pool (tight)", wall, lat, err, "   (max_queue=2, timeout 50 ms)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Per-login cost of each password hash scheme.
+
+One login = one check_password() on a stored hash. For each scheme this
+prints the median verify time, what that means in logins/s per core, and
+the throughput of the shared hashing pool (all cores) so auth CPU can be
+sized: cores needed ≈ peak logins/s ÷ logins/s per core.
+
+Run from the project root:
+    python -m benchmarks.bench_password_hash_schemes [rounds]   (default: 5)
+"""
+
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.auth.hashing import (
+    ARGON2_AVAILABLE, LEGACY_ITERATIONS, argon2_encoded, check_password, get_hashing_service,
+    pbkdf2_encoded, pbkdf2_hex, target_argon2_params, target_iterations,
+)
+
+
+def _schemes() -> list[tuple[str, str, dict]]:
+    pw = "correct horse battery staple"
+    out = [
+        ("legacy hex (100k)", pbkdf2_hex(pw, "salt", LEGACY_ITERATIONS), {"salt": "salt"}),
+        (f"pbkdf2_sha256 {LEGACY_ITERATIONS // 1000}k", pbkdf2_encoded(pw, "salt", LEGACY_ITERATIONS), {}),
+    ]
+    target = target_iterations()
+    if target != LEGACY_ITERATIONS:
+        out.append((f"pbkdf2_sha256 {target // 1000}k", pbkdf2_encoded(pw, "salt", target), {}))
+    if ARGON2_AVAILABLE:
+        p = target_argon2_params()
+        for m in sorted({19456, p["memory_cost"]}):
+            out.append((
+                f"argon2id t={p['time_cost']} m={m // 1024}M p={p['parallelism']}",
+                argon2_encoded(pw, p["time_cost"], m, p["parallelism"]), {},
+            ))
+    return out
+
+
+def main(rounds: int = 5) -> None:
+    pw = "correct horse battery staple"
+    cores = os.cpu_count() or 1
+    svc = get_hashing_service()
+    print(f"{cores} core(s), pool of {svc.workers} {svc.mode} worker(s)\n")
+    print(f"{'scheme':<28} {'verify ms':>10} {'logins/s/core':>14} {'pool logins/s':>14}")
+    for name, encoded, kw in _schemes():
+        times = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            assert check_password(pw, encoded, **kw)
+            times.append(time.perf_counter() - t0)
+        med = statistics.median(times)
+
+        n = svc.workers * rounds
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            t0 = time.perf_counter()
+            assert all(ex.map(lambda _: check_password(pw, encoded, **kw), range(n)))
+            wall = time.perf_counter() - t0
+        print(f"{name:<28} {med * 1000:10.1f} {1 / med:14.1f} {n / wall:14.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
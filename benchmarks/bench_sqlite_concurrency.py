@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Concurrent SQLite read/write throughput: default settings vs. the tuning profile.
+
+Separate processes stand in for the GUI and the backend sharing one file:
+writers insert activity_logs rows (one commit each, like the API), readers
+page through the journal. Each profile gets its own database file, since
+journal_mode=WAL is persistent.
+
+Run from the project root:
+    python -m benchmarks.bench_sqlite_concurrency [seconds] [writers] [readers]   (default: 5 2 4)
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.exc import OperationalError
+
+from database.engine import apply_sqlite_pragmas, sqlite_pragmas
+from database.models import ActivityLog, Base
+
+
+def _engine(path: str, tuned: bool):
+    eng = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if tuned:
+        pragmas = sqlite_pragmas()
+        event.listen(eng, "connect", lambda c, _r: apply_sqlite_pragmas(c, pragmas))
+    return eng
+
+
+def _worker(kind: str, path: str, tuned: bool, seconds: float, out) -> None:
+    eng = _engine(path, tuned)
+    ops = locked = 0
+    lat = []
+    table = ActivityLog.__table__
+    deadline = time.perf_counter() + seconds
+    pid = os.getpid()
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            with eng.begin() as conn:
+                if kind == "write":
+                    conn.execute(insert(table).values(
+                        user_id=pid % 10, action="password:update:x", action_type="password",
+                        created_at=datetime.utcnow(),
+                    ))
+                else:
+                    conn.execute(
+                        select(table.c.id, table.c.action, table.c.created_at)
+                        .where(table.c.user_id == ops % 10)
+                        .order_by(table.c.created_at.desc(), table.c.id.desc())
+                        .limit(50)
+                    ).all()
+        except OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            locked += 1
+            continue
+        lat.append(time.perf_counter() - t0)
+        ops += 1
+    lat.sort()
+    out.put((kind, ops, locked, lat[int(len(lat) * 0.99)] if lat else 0.0))
+
+
+def run(tuned: bool, seconds: float, writers: int, readers: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix="pg_sqlite_bench_")
+    path = os.path.join(tmp, "bench.db")
+    eng = _engine(path, tuned)
+    Base.metadata.create_all(eng)
+    with eng.begin() as conn:
+        conn.execute(insert(ActivityLog.__table__), [
+            {"user_id": i % 10, "action": "password:add:x", "action_type": "password", "created_at": datetime.utcnow()}
+            for i in range(20_000)
+        ])
+    eng.dispose()
+
+    out = mp.Queue()
+    procs = [mp.Process(target=_worker, args=("write", path, tuned, seconds, out)) for _ in range(writers)]
+    procs += [mp.Process(target=_worker, args=("read", path, tuned, seconds, out)) for _ in range(readers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    agg = {"write": [0, 0, 0.0], "read": [0, 0, 0.0]}
+    for kind, ops, locked, p99 in results:
+        a = agg[kind]
+        a[0] += ops
+        a[1] += locked
+        a[2] = max(a[2], p99)
+    return agg
+
+
+def main(seconds: float = 5.0, writers: int = 2, readers: int = 4) -> None:
+    print(f"{writers} writer + {readers} reader processes, {seconds:.0f} s each\n")
+    print(f"{'profile':<10} {'writes/s':>10} {'reads/s':>10} {'locked':>8} {'write p99':>10} {'read p99':>10}")
+    for name, tuned in (("default", False), ("tuned", True)):
+        agg = run(tuned, seconds, writers, readers)
+        w, r = agg["write"], agg["read"]
+        print(f"{name:<10} {w[0] / seconds:10.0f} {r[0] / seconds:10.0f} {w[1] + r[1]:8d} "
+              f"{w[2] * 1000:8.1f}ms {r[2] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 4)
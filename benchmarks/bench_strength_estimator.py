@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Per-password latency of the pattern estimator (keystroke budget: 1 ms).
+
+Run from the project root:
+    python -m benchmarks.bench_strength_estimator [n]     (default: 5000)
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import string
+import sys
+import time
+
+from src.security.estimator import dictionaries, estimate_strength
+from src.security.password_tools import GeneratorOptions, generate_password
+from src.security.strength import scoring_pool, strength_labels
+
+
+def main(n: int = 5000) -> None:
+    t0 = time.perf_counter()
+    dictionaries()
+    print(f"dictionaries loaded in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    rnd = random.Random(7)
+    sets = {
+        "random": [generate_password(GeneratorOptions(length=rnd.randint(8, 24))) for _ in range(n)],
+        "human": [f"{rnd.choice(['Soleil', 'marseille', 'P@ssw0rd', 'azerty', 'Nicolas'])}"
+                  f"{rnd.randint(1950, 2030)}{rnd.choice(string.punctuation)}" for _ in range(n)],
+        "long": ["".join(rnd.choice(string.ascii_letters) for _ in range(64)) for _ in range(n // 10)],
+    }
+    for name, pws in sets.items():
+        times = []
+        for p in pws:
+            t0 = time.perf_counter()
+            estimate_strength(p)
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        print(f"{name:<7} mean {sum(times) / len(times) * 1000:.3f} ms   "
+              f"p99 {times[int(len(times) * 0.99)] * 1000:.3f} ms   max {times[-1] * 1000:.3f} ms")
+
+    pws = sets["random"] + sets["human"]
+    t0 = time.perf_counter()
+    strength_labels(pws)
+    print(f"batch   {len(pws):,} labels in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    workers = os.cpu_count() or 1
+    if workers > 1:
+        pool = scoring_pool(workers)
+        try:
+            strength_labels(pws[:1000], pool)           # start the workers
+            t0 = time.perf_counter()
+            strength_labels(pws, pool)
+            print(f"pool    {len(pws):,} labels in {(time.perf_counter() - t0) * 1000:.0f} ms ({workers} processes)")
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
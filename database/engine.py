@@ -9,6 +9,7 @@ Pro/uni-friendly DB configuration:
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
 
 try:
@@ -19,7 +20,7 @@ try:
 except Exception:
     # If python-dotenv isn't available or .env missing, keep defaults
     pass
-from sqlalchemy import create_engine
+from sqlalchemy import case, create_engine, event, func, insert
 from sqlalchemy.orm import sessionmaker
 
 def _default_sqlite_url() -> str:
@@ -39,26 +40,96 @@ engine = create_engine(
     pool_pre_ping=True,
 )
 
+
+# Accepted values per pragma: keywords, or integers where SQLite takes them.
+_PRAGMA_KEYWORDS = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+    "busy_timeout": set(),
+    "cache_size": set(),
+    "mmap_size": set(),
+}
+_PRAGMA_INTEGER = {"synchronous", "temp_store", "busy_timeout", "cache_size", "mmap_size"}
+_INTEGER = re.compile(r"-?\d+")
+
+
+def _pragma_value(name: str, value: str) -> str:
+    """`value` normalised for PRAGMA name=value; ValueError unless it is on the allow-list."""
+    if name not in _PRAGMA_KEYWORDS:
+        raise ValueError(f"Unsupported SQLite pragma: {name!r}")
+    v = str(value).strip().upper()
+    if v in _PRAGMA_KEYWORDS[name] or (name in _PRAGMA_INTEGER and _INTEGER.fullmatch(v)):
+        return v
+    raise ValueError(f"Invalid value for SQLite pragma {name}: {value!r}")
+
+
+def sqlite_pragmas() -> dict[str, str]:
+    """SQLite tuning applied to every new connection (SQLITE_* env vars; SQLITE_TUNING=0 disables).
+
+    Values are checked against an allow-list; a bad one raises ValueError.
+
+    WAL lets the GUI and the backend read while the other writes;
+    synchronous=NORMAL is durable across app crashes under WAL (only a power
+    loss can drop the last commits).
+    """
+    if os.getenv("SQLITE_TUNING", "1").strip().lower() not in {"1", "true", "yes", "on"}:
+        return {}
+    pragmas = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),      # negative = KiB (64 MiB)
+        "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+        "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    }
+    return {name: _pragma_value(name, value) for name, value in pragmas.items()}
+
+
+def apply_sqlite_pragmas(dbapi_conn, pragmas: dict[str, str]) -> None:
+    # PRAGMA takes no bound parameters: only allow-listed values reach the SQL.
+    checked = {name: _pragma_value(name, value) for name, value in pragmas.items()}
+    cur = dbapi_conn.cursor()
+    try:
+        for name, value in checked.items():
+            cur.execute(f"PRAGMA {name}={value}")
+    finally:
+        cur.close()
+
+
+if DATABASE_URL.startswith("sqlite"):
+    _PRAGMAS = sqlite_pragmas()
+    if ":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:":
+        _PRAGMAS.pop("journal_mode", None)  # no WAL for in-memory databases
+
+    @event.listens_for(engine, "connect")
+    def _on_sqlite_connect(dbapi_conn, _record):
+        apply_sqlite_pragmas(dbapi_conn, _PRAGMAS)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def count_if(cond):
+    """COUNT of rows matching `cond`, for use next to other aggregates (0 when no rows)."""
+    return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+
+def insert_ignore(table):
+    """INSERT that skips rows whose key already exists (ON CONFLICT DO NOTHING / INSERT IGNORE)."""
+    name = engine.dialect.name
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name in ("mysql", "mariadb"):
+        return insert(table).prefix_with("IGNORE")
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
 def init_db() -> None:
+    """Create / upgrade the schema (database/migrations.py); a single version read when up to date."""
     # Import here to avoid circular imports on module load
-    from database.models import Base
-    Base.metadata.create_all(bind=engine)
-
-    # Lightweight migrations for SQLite (add new columns if missing)
-    if DATABASE_URL.startswith("sqlite"):
-        from sqlalchemy import text
-
-        with engine.begin() as conn:
-            def _has_column(table: str, column: str) -> bool:
-                rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
-                return any(r[1] == column for r in rows)
-
-            if not _has_column("users", "mfa_enabled"):
-                conn.execute(text("ALTER TABLE users ADD COLUMN mfa_enabled BOOLEAN DEFAULT 0"))
-            if not _has_column("users", "totp_enabled"):
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_enabled BOOLEAN DEFAULT 0"))
-            if not _has_column("users", "totp_secret"):
-                conn.execute(text("ALTER TABLE users ADD COLUMN totp_secret VARCHAR(64)"))
+    from database.migrations import migrate
+    migrate(engine)
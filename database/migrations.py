@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Versioned schema migrations.
+
+The schema version is a single row in `schema_version`. On startup,
+init_db() reads that number and stops if it equals HEAD. Otherwise the
+pending steps below run in order. Each step is recorded as soon as it
+finishes, so an interrupted upgrade resumes at the step that failed.
+
+- Fresh database: create_all from the models, then stamped HEAD.
+- Database from before versioning (tables present, no version row): every
+  step runs from 0. Steps are idempotent and skip what already exists.
+- Only one process migrates at a time (see _migration_lock); the others
+  wait, re-read the version and find nothing left to do.
+- Data backfills run in id-ordered batches, one commit per batch, so they
+  can run against a live database without holding a long write lock.
+
+To change the schema, append a step to MIGRATIONS. Never edit or reorder
+released steps. New tables and indexes are created explicitly
+(`_create_table(conn, "name")`, `_create_index(conn, "table", "name")`);
+the baseline creates the frozen v1 tables (database/schema_v1.py), not
+the current models.
+
+CLI:
+    python -m database.migrations status
+    python -m database.migrations upgrade
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+BACKFILL_BATCH = 1000
+LOCK_NAME = "password_guardian_migrate"
+LOCK_TIMEOUT = 600  # seconds to wait for another process's upgrade
+
+
+# ----------------- helpers -----------------
+def _tables():
+    # v1 definitions: the indexes / columns the released steps were written against
+    from database.schema_v1 import metadata
+    return metadata.tables
+
+
+def _add_column(conn, table: str, column: str, ddl: str) -> None:
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_table(conn, table: str) -> None:
+    from database.models import Base
+    Base.metadata.tables[table].create(conn, checkfirst=True)
+
+
+def _create_index(conn, table: str, name: str) -> None:
+    from database.models import Base
+    index = next(i for i in Base.metadata.tables[table].indexes if i.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def _create_indexes(conn, table: str) -> None:
+    """Every index the model declares for `table` (existing ones are skipped)."""
+    for index in _tables()[table].indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _backfill(engine: Engine, table: str, column: str, source: str, fn: Callable, batch: int = BACKFILL_BATCH) -> int:
+    """Set table.column = fn(table.source) where it is NULL, `batch` rows per transaction."""
+    t = _tables()[table]
+    stmt = update(t).where(t.c.id == bindparam("_id")).values({column: bindparam("_v")})
+    done = last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(t.c.id, t.c[source])
+                .where(t.c.id > last_id, t.c[column].is_(None))
+                .order_by(t.c.id)
+                .limit(batch)
+            ).all()
+            if not rows:
+                return done
+            conn.execute(stmt, [{"_id": r[0], "_v": fn(r[1])} for r in rows])
+        done += len(rows)
+        last_id = rows[-1][0]
+
+
+# ----------------- steps -----------------
+def _baseline(engine: Engine) -> None:
+    # Tables that did not exist yet in older databases (no-op on up-to-date ones).
+    from database.schema_v1 import metadata
+    metadata.create_all(bind=engine)
+
+
+def _users_mfa(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _add_column(conn, "users", "mfa_enabled", "BOOLEAN DEFAULT FALSE")
+        _add_column(conn, "users", "totp_enabled", "BOOLEAN DEFAULT FALSE")
+        _add_column(conn, "users", "totp_secret", "VARCHAR(64)")
+
+
+def _users_kdf_iterations(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _add_column(conn, "users", "kdf_iterations", "INTEGER")
+
+
+def _passwords_sync_and_reuse(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _add_column(conn, "passwords", "change_seq", "INTEGER NOT NULL DEFAULT 0")
+        _add_column(conn, "passwords", "fingerprint", "VARCHAR(64)")
+        _create_indexes(conn, "passwords")
+
+
+def _otp_code_indexes(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _create_indexes(conn, "otp_codes")
+
+
+def _activity_action_type(engine: Engine) -> None:
+    # Frozen copy of src.security.audit.action_type: a step must not change when app code does.
+    def action_type(action):
+        return (action or "").split(":", 1)[0][:50]
+
+    with engine.begin() as conn:
+        _add_column(conn, "activity_logs", "action_type", "VARCHAR(50)")
+    _backfill(engine, "activity_logs", "action_type", "action", action_type)
+    with engine.begin() as conn:
+        _create_indexes(conn, "activity_logs")
+
+
+def _sync_pruning(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _add_column(conn, "sync_state", "pruned_seq", "INTEGER NOT NULL DEFAULT 0")
+        _create_table(conn, "sync_cursors")
+
+
+def _activity_retention_index(engine: Engine) -> None:
+    with engine.begin() as conn:
+        _create_index(conn, "activity_logs", "ix_activity_logs_type_created_id")
+
+
+MIGRATIONS: list[tuple[str, Callable[[Engine], None]]] = [
+    ("baseline: create missing tables", _baseline),
+    ("users: mfa_enabled, totp_enabled, totp_secret", _users_mfa),
+    ("users: kdf_iterations", _users_kdf_iterations),
+    ("passwords: change_seq, fingerprint + indexes", _passwords_sync_and_reuse),
+    ("otp_codes: lookup / expiry indexes", _otp_code_indexes),
+    ("activity_logs: action_type (backfilled) + indexes", _activity_action_type),
+    ("sync_state: pruned_seq, sync_cursors", _sync_pruning),
+    ("activity_logs: (action_type, created_at, id) index for retention", _activity_retention_index),
+]
+HEAD = len(MIGRATIONS)
+
+
+# ----------------- engine -----------------
+def current_version(engine: Engine) -> Optional[int]:
+    """Stored schema version, or None if the database is unversioned (or empty)."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def _stamp(engine: Engine, version: int) -> None:
+    from database.models import SchemaVersion
+
+    with engine.begin() as conn:
+        SchemaVersion.__table__.create(conn, checkfirst=True)
+        res = conn.execute(
+            update(SchemaVersion).where(SchemaVersion.id == 1)
+            .values(version=version, updated_at=datetime.utcnow())
+        )
+        if res.rowcount == 0:
+            conn.execute(SchemaVersion.__table__.insert().values(id=1, version=version, updated_at=datetime.utcnow()))
+
+
+@contextmanager
+def _migration_lock(engine: Engine) -> Iterator[None]:
+    """Hold a lock across processes for the whole upgrade.
+
+    The steps run on their own connections, so the lock must not block
+    their writes: a session-level advisory lock on PostgreSQL / MySQL, and
+    for SQLite a write transaction on a separate `<database>.migrate-lock`
+    file (released by the OS if the process dies).
+    """
+    name = engine.dialect.name
+    if name == "sqlite":
+        path = engine.url.database
+        if not path or path == ":memory:":
+            yield
+            return
+        lock = sqlite3.connect(f"{path}.migrate-lock", timeout=LOCK_TIMEOUT, isolation_level=None)
+        try:
+            lock.execute("BEGIN IMMEDIATE")
+            yield
+        finally:
+            lock.close()
+    elif name == "postgresql":
+        with engine.connect() as conn:
+            key = conn.execute(text("SELECT hashtext(:n)"), {"n": LOCK_NAME}).scalar()
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": key})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+    elif name in ("mysql", "mariadb"):
+        with engine.connect() as conn:
+            got = conn.execute(text("SELECT GET_LOCK(:n, :t)"), {"n": LOCK_NAME, "t": LOCK_TIMEOUT}).scalar()
+            if got != 1:
+                raise RuntimeError("Timed out waiting for another process's schema upgrade.")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": LOCK_NAME})
+    else:
+        yield
+
+
+def migrate(engine: Engine, verbose: bool = False) -> int:
+    """Bring the schema to HEAD; returns the number of steps run."""
+    if current_version(engine) == HEAD:
+        return 0
+    with _migration_lock(engine):
+        # another process may have upgraded while we waited
+        return _migrate_locked(engine, verbose)
+
+
+def _migrate_locked(engine: Engine, verbose: bool) -> int:
+    version = current_version(engine)
+    if version == HEAD:
+        return 0
+    if version is not None and version > HEAD:
+        raise RuntimeError(f"Database schema v{version} is newer than this code (v{HEAD}); upgrade the app.")
+    if version is None:
+        if not inspect(engine).has_table("users"):
+            # Empty database: the models are the current schema.
+            from database.models import Base
+            Base.metadata.create_all(bind=engine)
+            _stamp(engine, HEAD)
+            return 0
+        version = 0
+    ran = 0
+    for number in range(version + 1, HEAD + 1):
+        name, step = MIGRATIONS[number - 1]
+        if verbose:
+            print(f"  v{number}: {name}")
+        step(engine)
+        _stamp(engine, number)
+        ran += 1
+    return ran
+
+
+def main(argv=None) -> None:
+    from database.engine import engine
+
+    ap = argparse.ArgumentParser(description="Database schema migrations.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="print the stored and latest versions")
+    sub.add_parser("upgrade", help="run pending migrations")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "upgrade":
+        n = migrate(engine, verbose=True)
+        print(f"✅ {n} migration(s) applied")
+    version = current_version(engine)
+    print(f"schema version: {version if version is not None else '(unversioned)'} / head {HEAD}")
+    if args.cmd == "status":
+        for number, (name, _) in enumerate(MIGRATIONS, 1):
+            mark = "x" if version is not None and number <= version else " "
+            print(f"  [{mark}] v{number}: {name}")
+
+
+if __name__ == "__main__":
+    main()
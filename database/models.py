@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 # database/models.py
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 
 from sqlalchemy import (
-    String, Integer, Boolean, DateTime, Text, ForeignKey,
-    TIMESTAMP, func
+    String, Integer, Boolean, Date, DateTime, Text, ForeignKey,
+    TIMESTAMP, Index, func
 )
 from sqlalchemy.orm import (
     declarative_base, relationship, Mapped, mapped_column
@@ -14,6 +14,17 @@ from sqlalchemy.orm import (
 Base = declarative_base()
 
 
+# ============================================================
+# SCHEMA VERSION (database/migrations.py)
+# ============================================================
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # single row, id = 1
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 # ============================================================
 # USER MODEL
 # ============================================================
@@ -25,6 +36,7 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(100), unique=True, nullable=False, index=True)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     salt: Mapped[str] = mapped_column(String(255), nullable=False)
+    kdf_iterations: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # legacy hex hashes only (NULL = 100,000)
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     last_login: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -63,6 +75,16 @@ class User(Base):
 # ============================================================
 class Password(Base):
     __tablename__ = "passwords"
+    __table_args__ = (
+        # keyset paging for GET /passwords/<user_id> (newest first)
+        Index("ix_passwords_user_updated", "user_id", "last_updated", "id"),
+        # delta sync: GET /passwords/<user_id>/changes?since=<seq>
+        Index("ix_passwords_user_seq", "user_id", "change_seq"),
+        # covering index for the /stats GROUP BY
+        Index("ix_passwords_user_stats", "user_id", "strength", "favorite", "trashed_at"),
+        # reuse detection: GROUP BY fingerprint per user
+        Index("ix_passwords_user_fingerprint", "user_id", "fingerprint"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
@@ -72,12 +94,16 @@ class Password(Base):
     site_icon: Mapped[Optional[str]] = mapped_column(String(10), default="🔒")
     username: Mapped[str] = mapped_column(String(255))
     encrypted_password: Mapped[str] = mapped_column(Text)
+    # keyed per-user HMAC of the plaintext (src/security/fingerprint.py)
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     category: Mapped[str] = mapped_column(String(50), default="personal", index=True)
     strength: Mapped[str] = mapped_column(String(20), default="medium", index=True)
 
     favorite: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     trashed_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP, nullable=True)
+    # per-user change sequence of the last write (see SyncState)
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     last_updated: Mapped[datetime] = mapped_column(
         TIMESTAMP,
@@ -112,6 +138,7 @@ class Password(Base):
             "strength": self.strength,
             "favorite": self.favorite,
             "trashed_at": self.trashed_at.isoformat() if self.trashed_at else None,
+            "change_seq": self.change_seq,
             "last_updated": (
                 self.last_updated.strftime("%Y-%m-%d %H:%M:%S") if self.last_updated else None
             ),
@@ -121,6 +148,104 @@ class Password(Base):
         }
 
 
+# ============================================================
+# DELTA SYNC (per-user change sequence + tombstones)
+# ============================================================
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # tombstones up to here are pruned; clients behind it must reload
+    pruned_seq: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class SyncCursor(Base):
+    """Last sequence each client synced to (bounds tombstone pruning)."""
+    __tablename__ = "sync_cursors"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    client_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PasswordTombstone(Base):
+    __tablename__ = "password_tombstones"
+    __table_args__ = (
+        Index("ix_password_tombstones_user_seq", "user_id", "change_seq"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    password_id: Mapped[int] = mapped_column(Integer)
+    change_seq: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# ============================================================
+# PASSWORD STATS (per-user counters maintained on every write)
+# ============================================================
+class PasswordStats(Base):
+    __tablename__ = "password_stats"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    active: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    weak: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    medium: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    strong: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    favorites: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    trashed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # strong=2 / medium=1 over active rows (score numerator)
+    points: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# ============================================================
+# RE-ENCRYPTION JOB CHECKPOINTS (src/security/reencrypt.py)
+# ============================================================
+class ReencryptCheckpoint(Base):
+    __tablename__ = "reencrypt_checkpoints"
+
+    job_key: Mapped[str] = mapped_column(String(50), primary_key=True)  # "all" / "user:<id>"
+    last_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    converted: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    done: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# ============================================================
+# SECURITY AUDIT RESULTS (src/security/security_audit.py)
+# ============================================================
+class PasswordAudit(Base):
+    __tablename__ = "password_audits"
+
+    password_id: Mapped[int] = mapped_column(
+        ForeignKey("passwords.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[int] = mapped_column(Integer, index=True, nullable=False)
+    audited_seq: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    strength: Mapped[str] = mapped_column(String(20), nullable=False)
+    pwned_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # NULL = not checked (yet)
+    audited_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SecurityAuditRun(Base):
+    __tablename__ = "security_audit_runs"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_seq: Mapped[int] = mapped_column(Integer, default=-1, nullable=False)
+    scanned: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
 # ============================================================
 # PASSWORD HISTORY
 # ============================================================
@@ -142,6 +267,12 @@ class PasswordHistory(Base):
 # ============================================================
 class OTPCode(Base):
     __tablename__ = "otp_codes"
+    __table_args__ = (
+        # live code lookup (src/auth/code_store.DbCodeStore)
+        Index("ix_otp_codes_user_purpose_expires", "user_id", "purpose", "expires_at"),
+        # expiry sweep
+        Index("ix_otp_codes_expires", "expires_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
@@ -156,6 +287,31 @@ class OTPCode(Base):
     user: Mapped["User"] = relationship(back_populates="otp_codes")
 
 
+# ============================================================
+# MAIL OUTBOX
+# ============================================================
+class MailOutbox(Base):
+    """Outgoing e-mail, sent by background workers (src/auth/mailer.py)."""
+    __tablename__ = "mail_outbox"
+    __table_args__ = (
+        # workers: next due messages
+        Index("ix_mail_outbox_due", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    to_email: Mapped[str] = mapped_column(String(255))
+    subject: Mapped[str] = mapped_column(String(255))
+    body: Mapped[str] = mapped_column(Text)
+    html: Mapped[bool] = mapped_column(Boolean, default=False)
+    status: Mapped[str] = mapped_column(String(16), default="pending")  # pending | sending | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    claim: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 # ============================================================
 # SESSION MODEL
 # ============================================================
@@ -234,14 +390,35 @@ class RecoveryCode(Base):
 # ============================================================
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # journal, newest first (keyset on created_at, id)
+        Index("ix_activity_logs_user_created", "user_id", "created_at", "id"),
+        # journal filtered by category
+        Index("ix_activity_logs_user_type_created", "user_id", "action_type", "created_at"),
+        # retention scan (src/security/log_retention.py), per TTL bucket
+        Index("ix_activity_logs_created", "created_at", "id"),
+        Index("ix_activity_logs_type_created_id", "action_type", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
     action: Mapped[str] = mapped_column(String(100))
+    # "password" for "password:add:github" (see src.security.audit.action_type)
+    action_type: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
     details: Mapped[Optional[str]] = mapped_column(Text)
     ip_address: Mapped[Optional[str]] = mapped_column(String(45))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     user: Mapped["User"] = relationship(back_populates="activity_logs")
+
+
+class ActivityDaily(Base):
+    """Per-day event counts of activity_logs rows removed by retention."""
+    __tablename__ = "activity_daily"
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    action_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Schema v1: the tables as they were when versioning was introduced.
+
+Frozen copy for the baseline migration step. Never edit it to follow
+database/models.py; schema changes go into new steps in migrations.py.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import (
+    TIMESTAMP, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, func,
+)
+
+metadata = MetaData()
+
+Table(
+    "activity_daily", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("action_type", String(50), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+Table(
+    "mail_outbox", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("to_email", String(255), nullable=False),
+    Column("subject", String(255), nullable=False),
+    Column("body", Text, nullable=False),
+    Column("html", Boolean, nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("claim", String(32), nullable=True),
+    Column("claimed_at", DateTime, nullable=True),
+    Column("last_error", String(255), nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_mail_outbox_due", "status", "next_attempt_at"),
+)
+
+Table(
+    "reencrypt_checkpoints", metadata,
+    Column("job_key", String(50), primary_key=True),
+    Column("last_id", Integer, nullable=False),
+    Column("converted", Integer, nullable=False),
+    Column("failed", Integer, nullable=False),
+    Column("done", Boolean, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "schema_version", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(50), nullable=False),
+    Column("email", String(100), nullable=False),
+    Column("password_hash", String(255), nullable=False),
+    Column("salt", String(255), nullable=False),
+    Column("kdf_iterations", Integer, nullable=True),
+    Column("email_verified", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("last_login", DateTime, nullable=True),
+    Column("mfa_enabled", Boolean, nullable=False),
+    Column("totp_enabled", Boolean, nullable=False),
+    Column("totp_secret", String(64), nullable=True),
+    Index("ix_users_email_verified", "email_verified"),
+    Index("ix_users_email", "email", unique=True),
+)
+
+Table(
+    "activity_logs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("action", String(100), nullable=False),
+    Column("action_type", String(50), nullable=True),
+    Column("details", Text, nullable=True),
+    Column("ip_address", String(45), nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_activity_logs_user_created", "user_id", "created_at", "id"),
+    Index("ix_activity_logs_created", "created_at", "id"),
+    Index("ix_activity_logs_user_type_created", "user_id", "action_type", "created_at"),
+    Index("ix_activity_logs_user_id", "user_id"),
+)
+
+Table(
+    "otp_codes", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("code", String(6), nullable=False),
+    Column("purpose", String(50), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("verified", Boolean, nullable=False),
+    Index("ix_otp_codes_user_purpose_expires", "user_id", "purpose", "expires_at"),
+    Index("ix_otp_codes_expires", "expires_at"),
+    Index("ix_otp_codes_user_id", "user_id"),
+)
+
+Table(
+    "password_stats", metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("active", Integer, nullable=False),
+    Column("weak", Integer, nullable=False),
+    Column("medium", Integer, nullable=False),
+    Column("strong", Integer, nullable=False),
+    Column("favorites", Integer, nullable=False),
+    Column("trashed", Integer, nullable=False),
+    Column("points", Integer, nullable=False),
+)
+
+Table(
+    "password_tombstones", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("password_id", Integer, nullable=False),
+    Column("change_seq", Integer, nullable=False),
+    Column("deleted_at", DateTime, nullable=False),
+    Index("ix_password_tombstones_user_seq", "user_id", "change_seq"),
+)
+
+Table(
+    "passwords", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("site_name", String(100), nullable=False),
+    Column("site_url", String(500), nullable=True),
+    Column("site_icon", String(10), nullable=True),
+    Column("username", String(255), nullable=False),
+    Column("encrypted_password", Text, nullable=False),
+    Column("fingerprint", String(64), nullable=True),
+    Column("category", String(50), nullable=False),
+    Column("strength", String(20), nullable=False),
+    Column("favorite", Boolean, nullable=False),
+    Column("trashed_at", TIMESTAMP, nullable=True),
+    Column("change_seq", Integer, nullable=False, server_default="0"),
+    Column("last_updated", TIMESTAMP, nullable=False, server_default=func.current_timestamp()),
+    Column("created_at", TIMESTAMP, nullable=False, server_default=func.current_timestamp()),
+    Index("ix_passwords_user_stats", "user_id", "strength", "favorite", "trashed_at"),
+    Index("ix_passwords_user_seq", "user_id", "change_seq"),
+    Index("ix_passwords_category", "category"),
+    Index("ix_passwords_favorite", "favorite"),
+    Index("ix_passwords_user_fingerprint", "user_id", "fingerprint"),
+    Index("ix_passwords_strength", "strength"),
+    Index("ix_passwords_user_updated", "user_id", "last_updated", "id"),
+)
+
+Table(
+    "recovery_codes", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("code_hash", String(128), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("used_at", DateTime, nullable=True),
+    Index("ix_recovery_codes_code_hash", "code_hash"),
+    Index("ix_recovery_codes_user_id", "user_id"),
+)
+
+Table(
+    "security_audit_runs", metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("last_seq", Integer, nullable=False),
+    Column("scanned", Integer, nullable=False),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+Table(
+    "sessions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("session_token", String(255), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("device_info", String(255), nullable=True),
+    Index("ix_sessions_user_id", "user_id"),
+)
+
+Table(
+    "sync_state", metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("seq", Integer, nullable=False),
+)
+
+Table(
+    "trusted_devices", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("device_fingerprint", String(128), nullable=False),
+    Column("device_name", String(255), nullable=True),
+    Column("trusted_until", DateTime, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("last_used", DateTime, nullable=False),
+    Index("ix_trusted_devices_device_fingerprint", "device_fingerprint"),
+    Index("ix_trusted_devices_trusted_until", "trusted_until"),
+    Index("ix_trusted_devices_user_id", "user_id"),
+)
+
+Table(
+    "user_devices", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("device_name", String(255), nullable=False),
+    Column("ip_address", String(45), nullable=True),
+    Column("last_used", DateTime, nullable=False),
+    Index("ix_user_devices_user_id", "user_id"),
+)
+
+Table(
+    "password_audits", metadata,
+    Column("password_id", Integer, ForeignKey("passwords.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("audited_seq", Integer, nullable=False),
+    Column("strength", String(20), nullable=False),
+    Column("pwned_count", Integer, nullable=True),
+    Column("audited_at", DateTime, nullable=False),
+    Index("ix_password_audits_user_id", "user_id"),
+)
+
+Table(
+    "password_history", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("password_id", Integer, ForeignKey("passwords.id", ondelete="CASCADE"), nullable=False),
+    Column("old_encrypted_password", Text, nullable=False),
+    Column("changed_at", DateTime, nullable=False),
+    Index("ix_password_history_password_id", "password_id"),
+)
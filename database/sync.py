@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""database/sync.py
+
+Per-user change sequence for delta sync (see SyncState / PasswordTombstone).
+Every write that a client must pick up stamps the row with next_seq().
+
+Clients that pass an id have their cursor recorded in sync_cursors.
+Tombstones at or below the oldest cursor seen in the last
+SYNC_CURSOR_TTL_DAYS are pruned, and SyncState.pruned_seq remembers how far;
+a client asking for changes from behind that point has to reload.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from database.engine import insert_ignore
+from database.models import PasswordTombstone, SyncCursor, SyncState
+
+CURSOR_TTL = timedelta(days=int(os.getenv("SYNC_CURSOR_TTL_DAYS", "30")))
+
+
+def next_seq(db, user_id: int) -> int:
+    """Bump and return the user's change sequence inside the caller's transaction."""
+    bump = update(SyncState).where(SyncState.user_id == user_id).values(seq=SyncState.seq + 1)
+    if db.execute(bump).rowcount == 0:
+        # first write for this user; a concurrent first write makes this a no-op
+        db.execute(insert_ignore(SyncState).values(user_id=user_id, seq=0, pruned_seq=0))
+        db.execute(bump)
+    return db.execute(select(SyncState.seq).where(SyncState.user_id == user_id)).scalar_one()
+
+
+def current_seq(db, user_id: int) -> int:
+    return db.execute(select(SyncState.seq).where(SyncState.user_id == user_id)).scalar() or 0
+
+
+def pruned_seq(db, user_id: int) -> int:
+    return db.execute(select(SyncState.pruned_seq).where(SyncState.user_id == user_id)).scalar() or 0
+
+
+def record_cursor(db, user_id: int, client_id: str, seq: int) -> None:
+    """Remember that `client_id` is synced up to `seq` (caller commits)."""
+    now = datetime.utcnow()
+    res = db.execute(
+        update(SyncCursor)
+        .where(SyncCursor.user_id == user_id, SyncCursor.client_id == client_id)
+        .values(seq=seq, seen_at=now)
+    )
+    if res.rowcount == 0:
+        db.execute(insert_ignore(SyncCursor).values(user_id=user_id, client_id=client_id, seq=seq, seen_at=now))
+
+
+def prune_tombstones(db, user_id: int) -> int:
+    """Drop tombstones every live client has already seen; returns how many (caller commits)."""
+    db.execute(
+        delete(SyncCursor)
+        .where(SyncCursor.user_id == user_id, SyncCursor.seen_at < datetime.utcnow() - CURSOR_TTL)
+    )
+    floor = db.execute(select(func.min(SyncCursor.seq)).where(SyncCursor.user_id == user_id)).scalar()
+    if floor is None or floor <= pruned_seq(db, user_id):
+        return 0
+    res = db.execute(
+        delete(PasswordTombstone)
+        .where(PasswordTombstone.user_id == user_id, PasswordTombstone.change_seq <= floor)
+    )
+    db.execute(
+        update(SyncState)
+        .where(SyncState.user_id == user_id, SyncState.pruned_seq < floor)
+        .values(pruned_seq=floor)
+    )
+    return res.rowcount
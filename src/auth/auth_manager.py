@@ -5,53 +5,46 @@ import os
 from pathlib import Path
 import random
 import string
-import smtplib
 import hashlib
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 from database.engine import SessionLocal
 from database.models import User, OTPCode, ActivityLog, TrustedDevice, RecoveryCode
-from sqlalchemy import select, update
+from sqlalchemy import select, tuple_, update
+from src.auth.code_store import RESET, TWO_FA, VERIFY, get_code_store
+from src.auth.mailer import OUTBOX_ENABLED, get_mail_outbox, send_now, smtp_config_from_env
+from src.auth.hashing import HashingBusy, check_password, make_password, needs_rehash
 
 
 # ----------------- Password Hashing -----------------
 def hash_password(password: str, salt: str = None) -> tuple[str, str]:
     """
-    Hash password using PBKDF2-HMAC-SHA256
+    Hash password into a self-describing string (PASSWORD_HASH_SCHEME, on the bounded hashing pool)
+    `salt` is the account salt (users.salt, used by recovery codes and the client);
+    the hash string carries its own salt.
     Returns: (password_hash, salt)
+    Raises: HashingBusy if the pool is saturated
     """
     if salt is None:
         salt = os.urandom(32).hex()
-    
-    pwd_hash = hashlib.pbkdf2_hmac(
-        'sha256',
-        password.encode('utf-8'),
-        salt.encode('utf-8'),
-        100000  # 100,000 iterations
-    )
-    
-    return pwd_hash.hex(), salt
+    return make_password(password), salt
 
 
-def verify_password(stored_hash: str, salt: str, provided_password: str) -> bool:
+def verify_password(stored_hash: str, salt: str, provided_password: str, iterations: int = None) -> bool:
     """
-    Verify a password against its hash
+    Verify a password against its hash (constant-time comparison)
+    `salt` / `iterations` only matter for legacy bare hex hashes (None = 100,000)
     Returns: True if password matches
     """
-    pwd_hash, _ = hash_password(provided_password, salt)
-    return pwd_hash == stored_hash
+    return check_password(provided_password, stored_hash, salt, iterations)
 
 
 # ----------------- Auth Manager Class -----------------
 class AuthManager:
     def __init__(self):
         self.email_cfg = self._load_email_cfg()
-        # in-memory caches
-        self.pending_2fa: dict[object, dict] = {}
-        self.pending_reset: dict[str, dict] = {}
-        self.pending_verify: dict[str, dict] = {}
+        # pending 2FA / reset / verification codes (OTP_STORE=memory|db)
+        self.codes = get_code_store()
         self._last_password = None
         self.mfa_enabled_emails: set[str] = set()
         self.recovery_codes: dict[int, list[str]] = {}
@@ -63,25 +56,16 @@ class AuthManager:
         return email_or_key
 
     def _send_mail(self, to_email: str, subject: str, body: str, html: bool = False) -> bool:
+        """Queue the message on the mail outbox (or send inline with MAIL_OUTBOX=0)."""
         try:
             if not self.email_cfg.get("sender_email") or not self.email_cfg.get("sender_password"):
                 raise RuntimeError("SMTP credentials missing. Check SMTP_USER / SMTP_PASSWORD in .env.")
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.email_cfg['sender_name']} <{self.email_cfg['sender_email']}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'html' if html else 'plain'))
-            
-            if self.email_cfg.get("use_ssl"):
-                s = smtplib.SMTP_SSL(self.email_cfg["smtp_server"], self.email_cfg["smtp_port"])
+            if OUTBOX_ENABLED:
+                get_mail_outbox(self.email_cfg).enqueue(to_email, subject, body, html)
+                print(f"✅ Email queued for {to_email}")
             else:
-                s = smtplib.SMTP(self.email_cfg["smtp_server"], self.email_cfg["smtp_port"])
-                s.starttls()
-            s.login(self.email_cfg["sender_email"], self.email_cfg["sender_password"])
-            s.send_message(msg)
-            s.quit()
-            
-            print(f"✅ Email sent to {to_email}")
+                send_now(self.email_cfg, to_email, subject, body, html)
+                print(f"✅ Email sent to {to_email}")
             return True
         except Exception as e:
             print(f"❌ Email error: {e}")
@@ -95,21 +79,7 @@ class AuthManager:
             load_dotenv(project_root / ".env")
         except Exception:
             pass
-
-        def _get_bool(name: str, default: bool = False) -> bool:
-            val = os.getenv(name)
-            if val is None:
-                return default
-            return val.strip().lower() in {"1", "true", "yes", "y", "on"}
-
-        return {
-            "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
-            "smtp_port": int(os.getenv("SMTP_PORT", "587")),
-            "sender_email": os.getenv("SMTP_USER", ""),
-            "sender_password": os.getenv("SMTP_PASSWORD", ""),
-            "sender_name": os.getenv("SMTP_FROM_NAME", "Password Guardian"),
-            "use_ssl": _get_bool("SMTP_USE_SSL", False),
-        }
+        return smtp_config_from_env()
 
     def _gen_code(self, n=6) -> str:
         return ''.join(random.choice(string.digits) for _ in range(n))
@@ -138,6 +108,7 @@ class AuthManager:
                 "email": u.email,
                 "password_hash": u.password_hash,
                 "salt": u.salt,
+                "kdf_iterations": u.kdf_iterations,
                 "email_verified": u.email_verified,
             }
 
@@ -149,11 +120,22 @@ class AuthManager:
             s.execute(
                 update(User)
                 .where(User.email == k)
-                .values(password_hash=pw_hash, salt=salt)
+                .values(password_hash=pw_hash, salt=salt, kdf_iterations=None)
             )
             s.commit()
             return True
 
+    def _upgrade_hash(self, user_id: int, password: str) -> None:
+        """Re-hash with the current scheme/parameters; users.salt is kept (recovery codes use it)."""
+        pw_hash = make_password(password)
+        with SessionLocal() as s:
+            s.execute(
+                update(User)
+                .where(User.id == int(user_id))
+                .values(password_hash=pw_hash, kdf_iterations=None)
+            )
+            s.commit()
+
     def _create_user(self, username: str, email: str, password: str) -> int | None:
         pw_hash, salt = hash_password(password)
         k = self._key(email)
@@ -186,11 +168,7 @@ class AuthManager:
 
             code = self._gen_code()
             k = self._key(email)
-            self.pending_verify[k] = {
-                "code": str(code),
-                "expires": datetime.utcnow() + timedelta(minutes=15),
-                "user_id": user_id,
-            }
+            self.codes.put(user_id, VERIFY, code, timedelta(minutes=15))
             
             self._send_mail(
                 email,
@@ -207,18 +185,13 @@ class AuthManager:
 
     def verify_registration_code(self, email: str, code: str) -> bool:
         k = self._key(email)
-        entry = self.pending_verify.get(k)
-        
-        if not entry:
-            print(f"❌ No pending verification for {k}")
-            return False
+        u = self._user_by_email(email)
         
-        if datetime.utcnow() > entry["expires"]:
-            print(f"❌ Verification code expired for {k}")
-            self.pending_verify.pop(k, None)
+        if not u or self.codes.get(u["id"], VERIFY) is None:
+            print(f"❌ No pending (or expired) verification for {k}")
             return False
         
-        if str(entry["code"]) != str(code).strip():
+        if not self.codes.check(u["id"], VERIFY, code):
             print(f"❌ Invalid registration code for {k}")
             return False
         
@@ -227,7 +200,6 @@ class AuthManager:
             s.commit()
         
         print(f"✅ User verified: {k}")
-        self.pending_verify.pop(k, None)
         return True
 
     def authenticate(self, email: str, password: str, send_2fa: bool = True) -> dict:
@@ -259,11 +231,24 @@ class AuthManager:
                 }
             
             # Verify password using hashing
-            if not verify_password(u["password_hash"], u["salt"], password):
+            try:
+                ok = verify_password(u["password_hash"], u["salt"], password, u.get("kdf_iterations"))
+            except HashingBusy:
+                return {
+                    "error": "⏳ Serveur occupé, veuillez réessayer dans un instant.",
+                    "2fa_sent": False
+                }
+            if not ok:
                 return {
                     "error": "❌ Mot de passe incorrect.\n\nVeuillez réessayer.", 
                     "2fa_sent": False
                 }
+            if needs_rehash(u["password_hash"]):
+                # Scheme or parameters changed since this hash was made: re-hash while we have the password.
+                try:
+                    self._upgrade_hash(u["id"], password)
+                except Exception as e:
+                    print(f"⚠️ Password hash upgrade skipped: {e}")
 
             self._last_password = password
 
@@ -289,26 +274,7 @@ class AuthManager:
             return {"error": f"❌ Erreur: {e}", "2fa_sent": False}
 
     def verify_2fa_email(self, email: str, code: str) -> bool:
-        k = self._key(email)
-        entry = self.pending_2fa.get(k)
-        
-        if not entry:
-            print(f"❌ No pending 2FA for {k}")
-            return False
-        
-        if datetime.utcnow() > entry["expires"]:
-            print(f"❌ 2FA code expired for {k}")
-            self.pending_2fa.pop(k, None)
-            return False
-        
-        ok = (str(entry["code"]) == str(code).strip())
-        if ok:
-            print(f"✅ 2FA verified for {k}")
-            self.pending_2fa.pop(k, None)
-        else:
-            print(f"❌ Invalid 2FA code for {k}")
-        
-        return ok
+        return self.verify_2fa(email, code)
 
     def send_2fa_code(self, to_email: str, user_id: int | None = None, purpose: str = "sensitive_action") -> bool:
         u = self._user_by_email(to_email)
@@ -317,22 +283,9 @@ class AuthManager:
             return False
         
         code = self._gen_code()
-        expiry = datetime.utcnow() + timedelta(minutes=5)
         k = self._key(to_email)
-        
-        self.pending_2fa[k] = {
-            "code": str(code), 
-            "expires": expiry, 
-            "purpose": purpose, 
-            "user_id": u['id']
-        }
-        
-        if user_id is not None:
-            self.pending_2fa[user_id] = {
-                "code": str(code), 
-                "expires": expiry, 
-                "purpose": purpose
-            }
+        # One live code per user, checked by verify_2fa(user id or e-mail).
+        self.codes.put(u['id'], TWO_FA, code, timedelta(minutes=5))
         
         print(f"[DEV] 2FA code for {k} ({purpose}): {code}")
         
@@ -347,20 +300,18 @@ class AuthManager:
 
     def verify_2fa(self, user_id_or_email, code: str) -> bool:
         key = self._key(user_id_or_email) if isinstance(user_id_or_email, str) else user_id_or_email
-        entry = self.pending_2fa.get(key)
-        
-        if not entry:
-            print(f"❌ No 2FA code found for: {key}")
-            return False
+        if isinstance(key, str):
+            u = self._user_by_email(key)
+            user_id = u["id"] if u else None
+        else:
+            user_id = key
         
-        if datetime.utcnow() > entry["expires"]:
-            print(f"⏰ 2FA code expired for: {key}")
-            self.pending_2fa.pop(key, None)
+        if user_id is None or self.codes.get(user_id, TWO_FA) is None:
+            print(f"❌ No 2FA code found (or expired) for: {key}")
             return False
         
-        if str(entry["code"]) == str(code).strip():
+        if self.codes.check(user_id, TWO_FA, code):
             print(f"✅ 2FA code verified for: {key}")
-            self.pending_2fa.pop(key, None)
             return True
         
         print(f"❌ Invalid 2FA code for: {key}")
@@ -374,10 +325,7 @@ class AuthManager:
         
         code = self._gen_code()
         k = self._key(email)
-        self.pending_reset[k] = {
-            "code": str(code), 
-            "expires": datetime.utcnow() + timedelta(minutes=15)
-        }
+        self.codes.put(u['id'], RESET, code, timedelta(minutes=15))
         
         ok = self._send_mail(
             email,
@@ -391,14 +339,11 @@ class AuthManager:
         return ok
 
     def verify_reset_code(self, email: str, code: str) -> bool:
-        k = self._key(email)
-        entry = self.pending_reset.get(k)
-        
-        if not entry:
+        u = self._user_by_email(email)
+        if not u:
             return False
-        
-        return (str(entry["code"]) == str(code).strip() 
-                and datetime.utcnow() < entry["expires"])
+        # Not consumed here: update_password_with_code checks it again.
+        return self.codes.check(u["id"], RESET, code, consume=False)
 
     def update_password_with_code(self, email: str, code: str, new_password: str) -> bool:
         if not self.verify_reset_code(email, code):
@@ -407,7 +352,9 @@ class AuthManager:
         
         ok = self._set_password(email, new_password)
         if ok:
-            self.pending_reset.pop(self._key(email), None)
+            u = self._user_by_email(email)
+            if u:
+                self.codes.discard(u["id"], RESET)
             print(f"✅ Password updated for {email}")
         
         return ok
@@ -426,11 +373,7 @@ class AuthManager:
             return False
         
         code = self._gen_code()
-        self.pending_verify[k] = {
-            "code": str(code),
-            "expires": datetime.utcnow() + timedelta(minutes=15),
-            "user_id": u['id'],
-        }
+        self.codes.put(u['id'], VERIFY, code, timedelta(minutes=15))
         
         self._send_mail(
             email,
@@ -445,12 +388,24 @@ class AuthManager:
         return True
 
     # ---------- Audit logs ----------
-    def list_audit_logs(self, user_id: int, filter_key: str = "all") -> list[dict]:
+    def list_audit_logs(
+        self, user_id: int, filter_key: str = "all", limit: int = 100, before: tuple | None = None
+    ) -> list[dict]:
+        """
+        One page of the journal, newest first.
+        `filter_key` is an action type ("password", "vault", ...) or "all";
+        `before` is the (created_at, id) of the last row of the previous page.
+        """
         with SessionLocal() as s:
             q = select(ActivityLog).where(ActivityLog.user_id == int(user_id))
             if filter_key and filter_key != "all":
-                q = q.where(ActivityLog.action.like(f"{filter_key}:%"))
-            rows = s.execute(q.order_by(ActivityLog.created_at.desc())).scalars().all()
+                q = q.where(ActivityLog.action_type == filter_key)
+            if before is not None:
+                ts, last_id = before
+                # Row-value comparison, so the index range starts right after the cursor.
+                q = q.where(tuple_(ActivityLog.created_at, ActivityLog.id) < tuple_(ts, last_id))
+            q = q.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(int(limit))
+            rows = s.execute(q).scalars().all()
             return [
                 {
                     "id": r.id,
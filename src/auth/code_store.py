@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Short-lived one-time codes (2FA, password reset, e-mail verification).
+
+One live code per (user_id, purpose); issuing a new one replaces the old.
+Two backends behind the same interface:
+
+- MemoryCodeStore: dict + expiry min-heap. Expired codes are swept in
+  O(log n) each as new codes are issued, so the process never accumulates
+  stale entries. Single process only.
+- DbCodeStore: rows in `otp_codes`, looked up through the
+  (user_id, purpose, expires_at) index, so every worker process sees the
+  same codes.
+
+get_code_store() picks one from OTP_STORE=memory|db (default memory).
+"""
+
+from __future__ import annotations
+
+import heapq
+import hmac
+import itertools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+VERIFY = "verify"
+RESET = "reset"
+TWO_FA = "2fa"
+
+
+@dataclass
+class CodeEntry:
+    code: str
+    expires_at: datetime
+
+
+def _same(a: str, b: str) -> bool:
+    return hmac.compare_digest(str(a).strip().encode("utf-8"), str(b).strip().encode("utf-8"))
+
+
+class CodeStore(ABC):
+    @abstractmethod
+    def put(self, user_id: int, purpose: str, code: str, ttl: timedelta) -> None:
+        """Issue `code`, replacing any live code for (user_id, purpose)."""
+
+    @abstractmethod
+    def get(self, user_id: int, purpose: str) -> Optional[CodeEntry]:
+        """The live (unexpired) code, or None."""
+
+    @abstractmethod
+    def discard(self, user_id: int, purpose: str) -> None:
+        """Forget the code for (user_id, purpose), if any."""
+
+    @abstractmethod
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        """Drop expired codes; returns how many were removed."""
+
+    def check(self, user_id: int, purpose: str, code: str, consume: bool = True) -> bool:
+        """True if `code` matches the live code (constant-time); consumed on success by default."""
+        entry = self.get(user_id, purpose)
+        if entry is None or not _same(entry.code, code):
+            return False
+        if consume:
+            self.discard(user_id, purpose)
+        return True
+
+
+class MemoryCodeStore(CodeStore):
+    def __init__(self):
+        self._codes: dict[tuple[int, str], tuple[CodeEntry, int]] = {}
+        # (expires_at, token, key); stale items (replaced/discarded codes) are
+        # skipped when popped because their token no longer matches.
+        self._heap: list[tuple[datetime, int, tuple[int, str]]] = []
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def put(self, user_id: int, purpose: str, code: str, ttl: timedelta) -> None:
+        now = datetime.utcnow()
+        entry = CodeEntry(str(code), now + ttl)
+        key = (int(user_id), purpose)
+        with self._lock:
+            self._sweep_locked(now)
+            token = next(self._tokens)
+            self._codes[key] = (entry, token)
+            heapq.heappush(self._heap, (entry.expires_at, token, key))
+
+    def get(self, user_id: int, purpose: str) -> Optional[CodeEntry]:
+        key = (int(user_id), purpose)
+        with self._lock:
+            item = self._codes.get(key)
+            if item is None:
+                return None
+            if item[0].expires_at <= datetime.utcnow():
+                del self._codes[key]
+                return None
+            return item[0]
+
+    def discard(self, user_id: int, purpose: str) -> None:
+        with self._lock:
+            self._codes.pop((int(user_id), purpose), None)
+        # Its heap item is dropped lazily.
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        with self._lock:
+            return self._sweep_locked(now or datetime.utcnow())
+
+    def _sweep_locked(self, now: datetime) -> int:
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, token, key = heapq.heappop(heap)
+            item = self._codes.get(key)
+            if item is not None and item[1] == token:
+                del self._codes[key]
+                removed += 1
+        # Replaced codes leave items behind; rebuild once they dominate the heap.
+        if len(heap) > 64 and len(heap) > 2 * len(self._codes):
+            self._heap = [(e.expires_at, t, k) for k, (e, t) in self._codes.items()]
+            heapq.heapify(self._heap)
+        return removed
+
+
+class DbCodeStore(CodeStore):
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+
+    def put(self, user_id: int, purpose: str, code: str, ttl: timedelta) -> None:
+        from sqlalchemy import delete
+
+        from database.engine import SessionLocal
+        from database.models import OTPCode
+
+        self._maybe_sweep()
+        now = datetime.utcnow()
+        with SessionLocal() as s:
+            s.execute(delete(OTPCode).where(OTPCode.user_id == int(user_id), OTPCode.purpose == purpose))
+            s.add(OTPCode(user_id=int(user_id), purpose=purpose, code=str(code), created_at=now, expires_at=now + ttl))
+            s.commit()
+
+    def get(self, user_id: int, purpose: str) -> Optional[CodeEntry]:
+        from sqlalchemy import select
+
+        from database.engine import SessionLocal
+        from database.models import OTPCode
+
+        with SessionLocal() as s:
+            row = s.execute(
+                select(OTPCode.code, OTPCode.expires_at)
+                .where(
+                    OTPCode.user_id == int(user_id),
+                    OTPCode.purpose == purpose,
+                    OTPCode.expires_at > datetime.utcnow(),
+                    OTPCode.verified.is_(False),
+                )
+                .order_by(OTPCode.expires_at.desc())
+                .limit(1)
+            ).first()
+        return CodeEntry(row.code, row.expires_at) if row else None
+
+    def discard(self, user_id: int, purpose: str) -> None:
+        from sqlalchemy import delete
+
+        from database.engine import SessionLocal
+        from database.models import OTPCode
+
+        with SessionLocal() as s:
+            s.execute(delete(OTPCode).where(OTPCode.user_id == int(user_id), OTPCode.purpose == purpose))
+            s.commit()
+
+    def check(self, user_id: int, purpose: str, code: str, consume: bool = True) -> bool:
+        if not consume:
+            return super().check(user_id, purpose, code, consume=False)
+        from sqlalchemy import delete
+
+        from database.engine import SessionLocal
+        from database.models import OTPCode
+
+        entry = self.get(user_id, purpose)
+        if entry is None or not _same(entry.code, code):
+            return False
+        # The delete doubles as a claim: if another worker consumed the code first, we lose.
+        with SessionLocal() as s:
+            res = s.execute(
+                delete(OTPCode).where(
+                    OTPCode.user_id == int(user_id),
+                    OTPCode.purpose == purpose,
+                    OTPCode.code == entry.code,
+                    OTPCode.expires_at == entry.expires_at,
+                )
+            )
+            s.commit()
+        return res.rowcount > 0
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        from sqlalchemy import delete
+
+        from database.engine import SessionLocal
+        from database.models import OTPCode
+
+        with SessionLocal() as s:
+            res = s.execute(delete(OTPCode).where(OTPCode.expires_at <= (now or datetime.utcnow())))
+            s.commit()
+        self._last_sweep = time.monotonic()
+        return res.rowcount or 0
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+
+_store: Optional[CodeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_code_store() -> CodeStore:
+    """Process-wide store (OTP_STORE=memory|db)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                kind = os.getenv("OTP_STORE", "memory").strip().lower()
+                if kind == "db":
+                    _store = DbCodeStore()
+                elif kind == "memory":
+                    _store = MemoryCodeStore()
+                else:
+                    raise ValueError(f"Unknown OTP_STORE: {kind}")
+    return _store
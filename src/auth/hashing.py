@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""Login password hashing: self-describing hash strings + a bounded worker pool.
+
+PBKDF2 at 100k+ iterations costs tens of milliseconds of pure CPU. Done
+inline, a burst of logins queues up behind one another; here hashes run on
+a bounded worker pool:
+
+- "thread" pool (default): hashlib.pbkdf2_hmac releases the GIL, so threads
+  scale across cores without pickling or process start-up.
+- "process" pool: full isolation, for builds where hashlib keeps the GIL.
+
+Backpressure: at most `workers + max_queue` hashes are admitted; callers
+beyond that wait up to `queue_timeout` seconds, then get HashingBusy
+instead of piling up. `stats()` exposes queue depth and latency.
+
+Stored hashes carry their own parameters:
+
+    pbkdf2_sha256$<iterations>$<salt>$<hex digest>
+    $argon2id$v=19$m=<KiB>,t=<passes>,p=<lanes>$<salt b64>$<hash b64>   (PHC)
+
+Bare hex digests from older releases are still accepted (salt from
+users.salt, iterations from users.kdf_iterations, NULL = 100,000). New
+hashes use PASSWORD_HASH_SCHEME (pbkdf2_sha256 | argon2id) with parameters
+from the environment or the calibration file written by
+
+    python -m src.auth.hashing calibrate --target-ms 250 [--scheme argon2id]
+
+and any hash with another scheme or weaker parameters is re-hashed on the
+next successful login (needs_rehash).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import InvalidHashError, VerificationError
+    ARGON2_AVAILABLE = True
+except ImportError:
+    PasswordHasher = None
+    ARGON2_AVAILABLE = False
+
+PBKDF2 = "pbkdf2_sha256"
+ARGON2ID = "argon2id"
+LEGACY = "legacy"
+
+LEGACY_ITERATIONS = 100_000
+MIN_ITERATIONS = 100_000
+# argon2-cffi defaults (RFC 9106 "second recommended" profile).
+ARGON2_DEFAULTS = {"time_cost": 3, "memory_cost": 65536, "parallelism": 4}
+CALIBRATION_FILE = os.getenv(
+    "KDF_CALIBRATION_FILE",
+    os.path.join(os.path.expanduser("~"), ".password_guardian", "kdf.json"),
+)
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing queue is full (login burst); retry later."""
+
+
+def pbkdf2_hex(password: str, salt: str, iterations: int) -> str:
+    # Top-level so it can be pickled for the process pool.
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations).hex()
+
+
+def pbkdf2_encoded(password: str, salt: str, iterations: int) -> str:
+    return f"{PBKDF2}${iterations}${salt}${pbkdf2_hex(password, salt, iterations)}"
+
+
+def argon2_encoded(password: str, time_cost: int, memory_cost: int, parallelism: int) -> str:
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism).hash(password)
+
+
+def argon2_verify(encoded: str, password: str) -> bool:
+    # libargon2 compares in constant time.
+    try:
+        return PasswordHasher().verify(encoded, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def _load_calibration(scheme: str = PBKDF2) -> dict:
+    try:
+        with open(CALIBRATION_FILE, encoding="utf-8") as f:
+            return json.load(f).get(scheme, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def target_scheme() -> str:
+    scheme = os.getenv("PASSWORD_HASH_SCHEME", PBKDF2).strip().lower()
+    if scheme not in (PBKDF2, ARGON2ID):
+        raise ValueError(f"Unknown PASSWORD_HASH_SCHEME: {scheme}")
+    if scheme == ARGON2ID and not ARGON2_AVAILABLE:
+        raise RuntimeError("argon2-cffi is required for PASSWORD_HASH_SCHEME=argon2id")
+    return scheme
+
+
+def target_iterations() -> int:
+    """Iterations for new hashes: env override, else calibration file, else the legacy count."""
+    env = os.getenv("PBKDF2_ITERATIONS")
+    if env:
+        return max(MIN_ITERATIONS, int(env))
+    return max(MIN_ITERATIONS, int(_load_calibration().get("iterations", LEGACY_ITERATIONS)))
+
+
+def target_argon2_params() -> dict:
+    """Argon2id parameters: ARGON2_TIME_COST / ARGON2_MEMORY_KIB / ARGON2_PARALLELISM, else calibration, else defaults."""
+    cal = _load_calibration(ARGON2ID)
+    params = {k: int(cal.get(k, v)) for k, v in ARGON2_DEFAULTS.items()}
+    for key, env in (("time_cost", "ARGON2_TIME_COST"), ("memory_cost", "ARGON2_MEMORY_KIB"),
+                     ("parallelism", "ARGON2_PARALLELISM")):
+        if os.getenv(env):
+            params[key] = int(os.getenv(env))
+    return params
+
+
+def identify(encoded: str) -> str:
+    if encoded.startswith(f"${ARGON2ID}$"):
+        return ARGON2ID
+    if encoded.startswith(f"{PBKDF2}$"):
+        return PBKDF2
+    return LEGACY
+
+
+def _argon2_params(encoded: str) -> dict:
+    # $argon2id$v=19$m=65536,t=3,p=4$salt$hash
+    fields = dict(kv.split("=", 1) for kv in encoded.split("$")[3].split(","))
+    return {"time_cost": int(fields["t"]), "memory_cost": int(fields["m"]), "parallelism": int(fields["p"])}
+
+
+def needs_rehash(encoded: str) -> bool:
+    """True if `encoded` is not in the target scheme (legacy hex always is) or uses weaker parameters."""
+    scheme = identify(encoded or "")
+    target = target_scheme()
+    if scheme != target:
+        return True
+    if scheme == PBKDF2:
+        return int(encoded.split("$")[1]) < target_iterations()
+    current = _argon2_params(encoded)
+    return any(current[k] < v for k, v in target_argon2_params().items())
+
+
+class HashingService:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: float = 2.0,
+        mode: str = "thread",
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self.mode = mode
+        pool_cls = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+        self._pool = pool_cls(max_workers=self.workers)
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_ms = 0.0
+        self._peak = 0
+
+    # ---- metrics ----
+    @property
+    def queue_depth(self) -> int:
+        """Hashes not running yet: waiting for admission + admitted beyond the worker count."""
+        return self._waiting + max(0, self._in_flight - self.workers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "queue_depth": self._waiting + max(0, self._in_flight - self.workers),
+                "peak_in_flight": self._peak,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_ms": round(self._total_ms / self._completed, 2) if self._completed else 0.0,
+            }
+
+    # ---- submission ----
+    def submit(self, fn, *args) -> Future:
+        """Run `fn(*args)` on the pool (top-level function for the process pool)."""
+        with self._lock:
+            self._waiting += 1
+        admitted = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not admitted:
+                self._rejected += 1
+        if not admitted:
+            raise HashingBusy("Too many concurrent logins, please retry")
+        with self._lock:
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+        started = time.perf_counter()
+        try:
+            fut = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release(started)
+            raise
+        fut.add_done_callback(lambda _f: self._release(started))
+        return fut
+
+    def _release(self, started: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_ms += (time.perf_counter() - started) * 1000
+        self._slots.release()
+
+    def call(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def hash(self, password: str, salt: str, iterations: int) -> str:
+        return self.call(pbkdf2_hex, password, salt, iterations)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_service: Optional[HashingService] = None
+_service_lock = threading.Lock()
+
+
+def get_hashing_service() -> HashingService:
+    """Process-wide service (HASH_POOL=thread|process, HASH_WORKERS, HASH_QUEUE_MAX, HASH_QUEUE_TIMEOUT)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = HashingService(
+                    workers=int(os.getenv("HASH_WORKERS", "0")) or None,
+                    max_queue=int(os.getenv("HASH_QUEUE_MAX")) if os.getenv("HASH_QUEUE_MAX") else None,
+                    queue_timeout=float(os.getenv("HASH_QUEUE_TIMEOUT", "2")),
+                    mode=os.getenv("HASH_POOL", "thread").strip().lower(),
+                )
+    return _service
+
+
+# ----------------- Hash strings -----------------
+def make_password(password: str, scheme: Optional[str] = None) -> str:
+    """Encoded hash of `password` in `scheme` (default: PASSWORD_HASH_SCHEME), computed on the pool."""
+    scheme = scheme or target_scheme()
+    svc = get_hashing_service()
+    if scheme == ARGON2ID:
+        p = target_argon2_params()
+        return svc.call(argon2_encoded, password, p["time_cost"], p["memory_cost"], p["parallelism"])
+    if scheme == PBKDF2:
+        return svc.call(pbkdf2_encoded, password, os.urandom(16).hex(), target_iterations())
+    raise ValueError(f"Unknown hash scheme: {scheme}")
+
+
+def check_password(
+    password: str, encoded: str, salt: Optional[str] = None, iterations: Optional[int] = None
+) -> bool:
+    """Verify `password` against any supported hash string, in constant time.
+
+    `salt` / `iterations` are only used for legacy bare hex digests.
+    """
+    if not encoded:
+        return False
+    scheme = identify(encoded)
+    svc = get_hashing_service()
+    if scheme == ARGON2ID:
+        if not ARGON2_AVAILABLE:
+            raise RuntimeError("argon2-cffi is required to verify argon2id hashes")
+        return svc.call(argon2_verify, encoded, password)
+    if scheme == PBKDF2:
+        try:
+            _, iters, salt, digest = encoded.split("$", 3)
+            iterations = int(iters)
+        except ValueError:
+            return False
+    else:
+        if salt is None:
+            return False
+        digest = encoded
+    candidate = svc.hash(password, salt, iterations or LEGACY_ITERATIONS)
+    return hmac.compare_digest(candidate.encode("ascii"), digest.encode("ascii"))
+
+
+# ----------------- Calibration -----------------
+def calibrate(target_ms: float = 250.0, samples: int = 3) -> int:
+    """Iterations that take about `target_ms` for one hash on this machine."""
+    probe = 50_000
+    best = float("inf")
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        pbkdf2_hex("calibration", "salt", probe)
+        best = min(best, time.perf_counter() - t0)
+    per_iter_ms = best * 1000 / probe
+    iterations = int(target_ms / per_iter_ms) // 10_000 * 10_000
+    return max(MIN_ITERATIONS, iterations)
+
+
+def calibrate_argon2(target_ms: float = 250.0, memory_cost: Optional[int] = None, parallelism: Optional[int] = None) -> dict:
+    """Argon2id passes (time_cost) that take about `target_ms` at a fixed memory cost."""
+    memory_cost = memory_cost or ARGON2_DEFAULTS["memory_cost"]
+    parallelism = parallelism or ARGON2_DEFAULTS["parallelism"]
+    probe = 4
+    t0 = time.perf_counter()
+    argon2_encoded("calibration", probe, memory_cost, parallelism)
+    per_pass_ms = (time.perf_counter() - t0) * 1000 / probe
+    time_cost = max(ARGON2_DEFAULTS["time_cost"], int(target_ms / per_pass_ms))
+    return {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism}
+
+
+def save_calibration(params, target_ms: float, scheme: str = PBKDF2) -> None:
+    """Store `params` (PBKDF2 iterations, or an Argon2id parameter dict) for `scheme`."""
+    os.makedirs(os.path.dirname(os.path.abspath(CALIBRATION_FILE)), exist_ok=True)
+    try:
+        with open(CALIBRATION_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    entry = {"iterations": int(params)} if scheme == PBKDF2 else dict(params)
+    entry.update(target_ms=target_ms, calibrated_at=datetime.utcnow().isoformat())
+    data[scheme] = entry
+    tmp = CALIBRATION_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, CALIBRATION_FILE)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Login password hashing parameters.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("calibrate", help="pick parameters for a latency budget and save them")
+    c.add_argument("--target-ms", type=float, default=250.0)
+    c.add_argument("--scheme", choices=[PBKDF2, ARGON2ID], default=PBKDF2)
+    c.add_argument("--memory-kib", type=int, help="argon2id memory cost (default 65536)")
+    c.add_argument("--dry-run", action="store_true", help="print only, don't save")
+    sub.add_parser("show", help="print the current target")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "calibrate":
+        if args.scheme == ARGON2ID:
+            if not ARGON2_AVAILABLE:
+                raise SystemExit("argon2-cffi is not installed")
+            params = calibrate_argon2(args.target_ms, args.memory_kib)
+            t0 = time.perf_counter()
+            argon2_encoded("check", params["time_cost"], params["memory_cost"], params["parallelism"])
+            label = "t={time_cost} m={memory_cost} KiB p={parallelism}".format(**params)
+        else:
+            params = calibrate(args.target_ms)
+            t0 = time.perf_counter()
+            pbkdf2_hex("check", "salt", params)
+            label = f"{params} iterations"
+        took = (time.perf_counter() - t0) * 1000
+        print(f"{args.scheme}: {label} ≈ {took:.0f} ms per hash (target {args.target_ms:.0f} ms)")
+        if not args.dry_run:
+            save_calibration(params, args.target_ms, args.scheme)
+            print(f"✅ saved to {CALIBRATION_FILE}; older hashes upgrade on next login")
+    else:
+        print(f"scheme: {target_scheme()} ({CALIBRATION_FILE})")
+        print(f"  {PBKDF2}: {target_iterations()} iterations")
+        if ARGON2_AVAILABLE:
+            print("  {}: t={time_cost} m={memory_cost} KiB p={parallelism}".format(ARGON2ID, **target_argon2_params()))
+
+
+if __name__ == "__main__":
+    main()
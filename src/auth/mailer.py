@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""Outgoing mail: a persistent outbox drained by background SMTP workers.
+
+`AuthManager._send_mail` used to connect, STARTTLS, log in and send inline,
+so registration / 2FA / reset latency was the mail server's latency. Now it
+only inserts a row into `mail_outbox` and returns; workers:
+
+- claim due messages in batches (a claim token, so several processes can
+  drain the same table without sending twice); the token is checked again
+  right before each send, so a worker whose claim went stale and was taken
+  over skips the message instead of sending it a second time,
+- send each batch over a long-lived authenticated connection per worker
+  (NOOP-checked after idling, reopened when the server drops it),
+- retry transient failures (4xx, network) with exponential backoff and give
+  up after MAIL_MAX_ATTEMPTS; 5xx answers fail at once.
+
+Sent rows are deleted (they carry one-time codes). Rows that fail for good
+keep their error but lose the body, and anything older than MAIL_TTL (the
+longest code lifetime) is purged unsent: the code in it has expired anyway.
+`stats()` reports queue depth and throughput.
+
+Settings: MAIL_OUTBOX=0 sends inline as before, MAIL_WORKERS, MAIL_BATCH,
+MAIL_MAX_ATTEMPTS, SMTP_STARTTLS, SMTP_TIMEOUT.
+src/auth/smtp_server.py is a local stand-in server for tests.
+
+CLI:
+    python -m src.auth.mailer stats
+    python -m src.auth.mailer drain        # send everything due, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+OUTBOX_ENABLED = os.getenv("MAIL_OUTBOX", "1").strip().lower() in {"1", "true", "yes", "on"}
+STALE_CLAIM = timedelta(minutes=5)
+# verification / reset codes live 15 minutes (src/auth/auth_manager.py)
+MAIL_TTL = timedelta(minutes=15)
+
+
+def _get_bool(name: str, default: bool = False) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def smtp_config_from_env() -> dict:
+    return {
+        "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        "smtp_port": int(os.getenv("SMTP_PORT", "587")),
+        "sender_email": os.getenv("SMTP_USER", ""),
+        "sender_password": os.getenv("SMTP_PASSWORD", ""),
+        "sender_name": os.getenv("SMTP_FROM_NAME", "Password Guardian"),
+        "use_ssl": _get_bool("SMTP_USE_SSL", False),
+        "starttls": _get_bool("SMTP_STARTTLS", True),
+        "timeout": float(os.getenv("SMTP_TIMEOUT", "10")),
+    }
+
+
+def build_message(cfg: dict, to_email: str, subject: str, body: str, html: bool = False) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['From'] = f"{cfg['sender_name']} <{cfg['sender_email']}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html' if html else 'plain'))
+    return msg
+
+
+def open_smtp(cfg: dict) -> smtplib.SMTP:
+    """Connected and logged-in SMTP client."""
+    timeout = cfg.get("timeout", 10)
+    if cfg.get("use_ssl"):
+        s = smtplib.SMTP_SSL(cfg["smtp_server"], cfg["smtp_port"], timeout=timeout)
+    else:
+        s = smtplib.SMTP(cfg["smtp_server"], cfg["smtp_port"], timeout=timeout)
+        if cfg.get("starttls", True):
+            s.starttls()
+    if cfg.get("sender_password"):
+        s.login(cfg["sender_email"], cfg["sender_password"])
+    return s
+
+
+def send_now(cfg: dict, to_email: str, subject: str, body: str, html: bool = False) -> None:
+    """One-shot synchronous send (MAIL_OUTBOX=0)."""
+    s = open_smtp(cfg)
+    try:
+        s.send_message(build_message(cfg, to_email, subject, body, html))
+    finally:
+        try:
+            s.quit()
+        except smtplib.SMTPException:
+            pass
+
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class _Connection:
+    """One worker's SMTP connection, kept open between batches."""
+
+    def __init__(self, cfg: dict, outbox: "MailOutbox"):
+        self.cfg = cfg
+        self.outbox = outbox
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._used = 0.0
+
+    def get(self) -> smtplib.SMTP:
+        if self._smtp is not None and time.monotonic() - self._used > self.outbox.keepalive:
+            # Idle a while: make sure the server hasn't dropped us.
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._smtp is None:
+            self._smtp = open_smtp(self.cfg)
+            self.outbox._count("connections")
+        self._used = time.monotonic()
+        return self._smtp
+
+    def send(self, msg) -> None:
+        try:
+            self.get().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Stale connection: reconnect once.
+            self.close()
+            self.get().send_message(msg)
+        self._used = time.monotonic()
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def idle_close(self) -> None:
+        if self._smtp is not None and time.monotonic() - self._used > self.outbox.idle_timeout:
+            self.close()
+
+
+class MailOutbox:
+    def __init__(
+        self,
+        cfg: dict,
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        backoff: float = 5.0,
+        poll_interval: float = 5.0,
+        keepalive: float = 15.0,
+        idle_timeout: float = 60.0,
+        ttl: timedelta = MAIL_TTL,
+    ):
+        self.cfg = cfg
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.ttl = ttl
+        self._wake = threading.Condition()
+        self._pending_wakeups = 0
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._counters = {
+            "enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "expired": 0, "lost_claims": 0,
+            "connections": 0, "batches": 0,
+        }
+        self._queue_ms = 0.0
+        self._send_ms = 0.0
+
+    # ---- producer side ----
+    def enqueue(self, to_email: str, subject: str, body: str, html: bool = False) -> int:
+        from database.engine import SessionLocal
+        from database.models import MailOutbox as Row
+
+        with SessionLocal() as s:
+            row = Row(to_email=to_email, subject=subject, body=body, html=bool(html),
+                      status="pending", next_attempt_at=datetime.utcnow())
+            s.add(row)
+            s.commit()
+            mid = row.id
+        self._count("enqueued")
+        with self._wake:
+            self._pending_wakeups += 1
+            self._wake.notify()
+        return mid
+
+    # ---- workers ----
+    def start(self) -> "MailOutbox":
+        if self._threads:
+            return self
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"mail-outbox-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        conn = _Connection(self.cfg, self)
+        try:
+            while not self._stop.is_set():
+                if self.process_batch(conn):
+                    continue
+                conn.idle_close()
+                with self._wake:
+                    if self._pending_wakeups == 0 and not self._stop.is_set():
+                        self._wake.wait(self.poll_interval)
+                    self._pending_wakeups = max(0, self._pending_wakeups - 1)
+        finally:
+            conn.close()
+
+    def _claim(self) -> list:
+        from database.engine import SessionLocal
+        from database.models import MailOutbox as Row
+
+        now = datetime.utcnow()
+        due = or_(
+            and_(Row.status == "pending", Row.next_attempt_at <= now),
+            # A worker died mid-batch: take its messages over.
+            and_(Row.status == "sending", Row.claimed_at < now - STALE_CLAIM),
+        )
+        token = uuid.uuid4().hex
+        with SessionLocal() as s:
+            expired = s.execute(delete(Row).where(Row.created_at < now - self.ttl)).rowcount
+            s.commit()
+            self._count("expired", max(0, expired))
+            ids = select(Row.id).where(due).order_by(Row.next_attempt_at, Row.id).limit(self.batch_size)
+            ids = [r[0] for r in s.execute(ids).all()]
+            if not ids:
+                return []
+            s.execute(
+                update(Row).where(Row.id.in_(ids), due)
+                .values(status="sending", claim=token, claimed_at=now)
+            )
+            s.commit()
+            return s.execute(select(Row).where(Row.claim == token).order_by(Row.id)).scalars().all()
+
+    def _renew(self, row) -> bool:
+        """Compare-and-set on the claim token: False if another worker took the row over."""
+        from database.engine import SessionLocal
+        from database.models import MailOutbox as Row
+
+        with SessionLocal() as s:
+            res = s.execute(
+                update(Row).where(Row.id == row.id, Row.claim == row.claim, Row.status == "sending")
+                .values(claimed_at=datetime.utcnow())
+            )
+            s.commit()
+        return res.rowcount == 1
+
+    def process_batch(self, conn: Optional[_Connection] = None) -> int:
+        """Claim and send one batch; returns the number of messages handled."""
+        from database.engine import SessionLocal
+        from database.models import MailOutbox as Row
+
+        rows = self._claim()
+        if not rows:
+            return 0
+        token = rows[0].claim
+        own = conn is None
+        conn = conn or _Connection(self.cfg, self)
+        self._count("batches")
+        sent, retry, failed = [], [], []
+        try:
+            for row in rows:
+                if not self._renew(row):
+                    self._count("lost_claims")
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    conn.send(build_message(self.cfg, row.to_email, row.subject, row.body, row.html))
+                except Exception as e:
+                    if getattr(e, "smtp_code", None) == 421 or not isinstance(
+                        e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+                    ):
+                        # Connection-level trouble: start fresh next time.
+                        conn.close()
+                    attempts = (row.attempts or 0) + 1
+                    if _is_permanent(e) or attempts >= self.max_attempts:
+                        failed.append((row.id, attempts, str(e)[:255]))
+                    else:
+                        retry.append((row.id, attempts, str(e)[:255]))
+                    continue
+                sent.append(row.id)
+                with self._lock:
+                    self._send_ms += (time.perf_counter() - t0) * 1000
+                    self._queue_ms += (datetime.utcnow() - row.created_at).total_seconds() * 1000
+        finally:
+            if own:
+                conn.close()
+
+        now = datetime.utcnow()
+        mine = Row.claim == token
+        with SessionLocal() as s:
+            if sent:
+                # delivered: delete even if the claim was taken over meanwhile
+                s.execute(delete(Row).where(Row.id.in_(sent)))
+            for mid, attempts, err in retry:
+                s.execute(
+                    update(Row).where(Row.id == mid, mine).values(
+                        status="pending", attempts=attempts, claim=None, last_error=err,
+                        next_attempt_at=now + timedelta(seconds=self.backoff * 2 ** (attempts - 1)),
+                    )
+                )
+            for mid, attempts, err in failed:
+                s.execute(
+                    # keep the error for `stats()`, drop the one-time code
+                    update(Row).where(Row.id == mid, mine)
+                    .values(status="failed", attempts=attempts, claim=None, last_error=err, body="")
+                )
+            s.commit()
+        self._count("sent", len(sent))
+        self._count("retried", len(retry))
+        self._count("failed", len(failed))
+        for mid, _, err in failed:
+            print(f"❌ Email {mid} failed permanently: {err}")
+        return len(rows)
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Send everything due now (in this thread); True if nothing due is left."""
+        deadline = time.monotonic() + timeout
+        conn = _Connection(self.cfg, self)
+        try:
+            while time.monotonic() < deadline:
+                if not self.process_batch(conn):
+                    return True
+        finally:
+            conn.close()
+        return False
+
+    # ---- metrics ----
+    def _count(self, key: str, n: int = 1) -> None:
+        if n:
+            with self._lock:
+                self._counters[key] += n
+
+    def stats(self) -> dict:
+        from database.engine import SessionLocal
+        from database.models import MailOutbox as Row
+
+        with SessionLocal() as s:
+            by_status = dict(s.execute(select(Row.status, func.count()).group_by(Row.status)).all())
+            oldest = s.execute(
+                select(func.min(Row.created_at)).where(Row.status.in_(("pending", "sending")))
+            ).scalar()
+        with self._lock:
+            out = dict(self._counters)
+            sent = out["sent"]
+            out["avg_send_ms"] = round(self._send_ms / sent, 2) if sent else 0.0
+            out["avg_queue_ms"] = round(self._queue_ms / sent, 2) if sent else 0.0
+        out.update(
+            workers=len(self._threads),
+            pending=int(by_status.get("pending", 0)),
+            sending=int(by_status.get("sending", 0)),
+            dead=int(by_status.get("failed", 0)),
+            oldest_age_s=round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0.0,
+        )
+        return out
+
+
+_outbox: Optional[MailOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_mail_outbox(cfg: Optional[dict] = None) -> MailOutbox:
+    """Process-wide outbox with its workers started (MAIL_WORKERS, MAIL_BATCH, MAIL_MAX_ATTEMPTS)."""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = MailOutbox(
+                    cfg or smtp_config_from_env(),
+                    workers=int(os.getenv("MAIL_WORKERS", "2")),
+                    batch_size=int(os.getenv("MAIL_BATCH", "20")),
+                    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", "5")),
+                ).start()
+    return _outbox
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Mail outbox tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="queue depth and counters")
+    d = sub.add_parser("drain", help="send everything due, then exit")
+    d.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args(argv)
+
+    outbox = MailOutbox(smtp_config_from_env())
+    if args.cmd == "drain":
+        done = outbox.drain(args.timeout)
+        print("✅ outbox drained" if done else "⏳ timeout, messages still due")
+    for k, v in outbox.stats().items():
+        print(f"{k:>14}: {v}")
+
+
+if __name__ == "__main__":
+    main()
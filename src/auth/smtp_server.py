@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Local SMTP stand-in (tests, offline demos), in the spirit of aiosmtpd's Debugging server.
+
+Speaks enough SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+credentials), MAIL, RCPT, DATA, RSET, NOOP, QUIT. No TLS, so point the app
+at it with SMTP_SERVER=127.0.0.1 SMTP_PORT=<port> SMTP_STARTTLS=0.
+
+    with SMTPStandIn(fail_first=2) as srv:
+        ...  # srv.messages, srv.connections, srv.logins
+
+`fail_first` answers the first N DATA commands with a 451 (transient) error
+to exercise retries; recipients in `reject` get a 550 (permanent) answer;
+`delay` slows every reply down.
+
+CLI:
+    python -m src.auth.smtp_server --port 8025
+"""
+
+from __future__ import annotations
+
+import argparse
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+
+@dataclass
+class ReceivedMessage:
+    mail_from: str
+    rcpt_to: list = field(default_factory=list)
+    data: bytes = b""
+
+
+class SMTPStandIn:
+    """Threaded SMTP server on 127.0.0.1; records every accepted message."""
+
+    def __init__(self, port: int = 0, fail_first: int = 0, delay: float = 0.0, reject: Iterable[str] = ()):
+        self.fail_first = fail_first
+        self.delay = delay
+        self.reject = {r.lower() for r in reject}
+        self.messages: list[ReceivedMessage] = []
+        self.connections = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _handler(self):
+        srv = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str) -> None:
+                if srv.delay:
+                    time.sleep(srv.delay)
+                self.wfile.write((line + "\r\n").encode("ascii"))
+
+            def handle(self):
+                with srv._lock:
+                    srv.connections += 1
+                self.reply("220 localhost stand-in ESMTP")
+                msg: Optional[ReceivedMessage] = None
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    verb = line.split(" ", 1)[0].upper()
+                    arg = line[len(verb):].strip()
+                    if verb == "EHLO":
+                        self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n")
+                        self.reply("250 8BITMIME")
+                    elif verb == "HELO":
+                        self.reply("250 localhost")
+                    elif verb == "AUTH":
+                        if arg.upper().startswith("LOGIN"):
+                            if len(arg.split()) < 2:
+                                self.reply("334 VXNlcm5hbWU6")
+                                self.rfile.readline()
+                            self.reply("334 UGFzc3dvcmQ6")
+                            self.rfile.readline()
+                        with srv._lock:
+                            srv.logins += 1
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif verb == "MAIL":
+                        msg = ReceivedMessage(mail_from=arg.partition(":")[2].strip("<> "))
+                        self.reply("250 OK")
+                    elif verb == "RCPT":
+                        if msg is None:
+                            self.reply("503 need MAIL first")
+                            continue
+                        rcpt = arg.partition(":")[2].strip("<> ")
+                        if rcpt.lower() in srv.reject:
+                            self.reply("550 5.1.1 mailbox unavailable")
+                            continue
+                        msg.rcpt_to.append(rcpt)
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        if msg is None or not msg.rcpt_to:
+                            self.reply("503 need RCPT first")
+                            continue
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        chunks = []
+                        while True:
+                            chunk = self.rfile.readline()
+                            if not chunk or chunk in (b".\r\n", b".\n"):
+                                break
+                            chunks.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                        msg.data = b"".join(chunks)
+                        with srv._lock:
+                            if srv.fail_first > 0:
+                                srv.fail_first -= 1
+                                failed = True
+                            else:
+                                srv.messages.append(msg)
+                                failed = False
+                        self.reply("451 4.3.0 try again later" if failed else "250 OK queued")
+                        msg = None
+                    elif verb == "RSET":
+                        msg = None
+                        self.reply("250 OK")
+                    elif verb == "NOOP":
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 command not implemented")
+
+        return Handler
+
+    def start(self) -> "SMTPStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "SMTPStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Local SMTP stand-in that prints received mail.")
+    ap.add_argument("--port", type=int, default=8025)
+    args = ap.parse_args(argv)
+    srv = SMTPStandIn(port=args.port).start()
+    print(f"Listening on 127.0.0.1:{srv.port}  (Ctrl+C to stop)")
+    seen = 0
+    try:
+        while True:
+            time.sleep(0.5)
+            for m in srv.messages[seen:]:
+                print(f"--- {m.mail_from} -> {', '.join(m.rcpt_to)} ({len(m.data)} bytes)")
+            seen = len(srv.messages)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,10 @@ HTTP client used by the PyQt GUI to talk to Flask backend.
 
 from __future__ import annotations
 
-from typing import Tuple, List, Dict, Any, Optional
+import json
+import uuid
+import warnings
+from typing import Tuple, List, Dict, Any, Optional, Iterator, Sequence
 import requests
 
 
@@ -15,16 +18,73 @@ class APIClient:
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
         self.session = requests.Session()
+        # identifies this client's delta-sync cursor to the backend
+        self.client_id = uuid.uuid4().hex
 
     # ---------- PASSWORDS ----------
-    def get_passwords(self, user_id: int) -> Tuple[bool, str, List[Dict[str, Any]]]:
+    def iter_passwords(
+        self,
+        user_id: int,
+        page_size: int = 500,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the user's passwords page by page (keyset cursor, newest first).
+
+        Raises RuntimeError("<status>: <body>") if a page request fails.
+        """
+        cursor = None
+        while True:
+            params: Dict[str, Any] = {"limit": page_size}
+            if fields:
+                params["fields"] = ",".join(fields)
+            if cursor:
+                params["cursor"] = cursor
+            r = self.session.get(f"{self.base_url}/passwords/{user_id}", params=params, timeout=self.timeout)
+            if not r.ok:
+                raise RuntimeError(f"{r.status_code}: {r.text}")
+            data = r.json()
+            yield data.get("items", [])
+            cursor = data.get("next_cursor")
+            if not cursor:
+                return
+
+    def get_passwords(
+        self,
+        user_id: int,
+        fields: Optional[Sequence[str]] = None,
+        page_size: int = 500,
+    ) -> Tuple[bool, str, List[Dict[str, Any]]]:
+        try:
+            out: List[Dict[str, Any]] = []
+            for page in self.iter_passwords(user_id, page_size=page_size, fields=fields):
+                out.extend(page)
+            return True, "ok", out
+        except Exception as e:
+            return False, str(e), []
+
+    def get_changes(
+        self,
+        user_id: int,
+        since: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """Delta sync: {"seq", "changed": [...], "deleted": [ids]} after `since`.
+
+        With since=None only the current head "seq" is returned. "reset" is
+        set when `since` is too old to replay deletions: reload instead.
+        """
         try:
-            r = self.session.get(f"{self.base_url}/passwords/{user_id}", timeout=self.timeout)
+            params: Dict[str, Any] = {"client": self.client_id}
+            if since is not None:
+                params["since"] = int(since)
+            if fields:
+                params["fields"] = ",".join(fields)
+            r = self.session.get(f"{self.base_url}/passwords/{user_id}/changes", params=params, timeout=self.timeout)
             if r.ok:
                 return True, "ok", r.json()
-            return False, f"{r.status_code}: {r.text}", []
+            return False, f"{r.status_code}: {r.text}", {}
         except Exception as e:
-            return False, str(e), []
+            return False, str(e), {}
 
     def add_password(
         self,
@@ -55,6 +115,25 @@ class APIClient:
         except Exception as e:
             return False, str(e), {}
 
+    def bulk_upsert_passwords(
+        self,
+        user_id: int,
+        items: List[Dict[str, Any]],
+        mode: str = "merge",
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """One round trip for many items; mode is skip|overwrite|merge on (site_name, username)."""
+        try:
+            r = self.session.post(
+                f"{self.base_url}/passwords/bulk",
+                json={"user_id": user_id, "mode": mode, "items": items},
+                timeout=max(self.timeout, 120),
+            )
+            if r.ok:
+                return True, "ok", r.json()
+            return False, f"{r.status_code}: {r.text}", {}
+        except Exception as e:
+            return False, str(e), {}
+
     def update_password(self, pid: int, fields: Dict[str, Any]) -> Tuple[bool, str]:
         try:
             r = self.session.put(f"{self.base_url}/passwords/{pid}", json=fields, timeout=self.timeout)
@@ -121,6 +200,30 @@ class APIClient:
         except Exception as e:
             return False, str(e), {}
 
+    def run_security_audit(self, user_id: int, full: bool = False) -> Tuple[bool, str, Dict[str, Any]]:
+        """Audit changed rows (all rows if `full`); returns the refreshed summary."""
+        try:
+            r = self.session.post(
+                f"{self.base_url}/audit/{user_id}/run",
+                json={"full": bool(full)},
+                timeout=max(self.timeout, 120),
+            )
+            if r.ok:
+                return True, "ok", r.json()
+            return False, f"{r.status_code}: {r.text}", {}
+        except Exception as e:
+            return False, str(e), {}
+
+    def get_security_audit(self, user_id: int) -> Tuple[bool, str, Dict[str, Any]]:
+        """Stored audit summary plus per-password findings (`items`)."""
+        try:
+            r = self.session.get(f"{self.base_url}/audit/{user_id}", timeout=self.timeout)
+            if r.ok:
+                return True, "ok", r.json()
+            return False, f"{r.status_code}: {r.text}", {}
+        except Exception as e:
+            return False, str(e), {}
+
     # ---------- PROFILE ----------
     def get_profile(self, user_id: int) -> Tuple[bool, str, Dict[str, Any]]:
         try:
@@ -173,12 +276,47 @@ class APIClient:
             return False, str(e)
 
     # ---------- EXPORT / IMPORT ----------
+    def iter_export_vault(self, user_id: int) -> Iterator[Dict[str, Any]]:
+        """Stream the NDJSON export: yields the header dict, then one dict per password.
+
+        Raises RuntimeError on HTTP errors or if the stream ends before its trailer.
+        """
+        with self.session.get(
+            f"{self.base_url}/export/{user_id}",
+            params={"format": "ndjson"},
+            stream=True,
+            timeout=self.timeout,
+        ) as r:
+            if not r.ok:
+                raise RuntimeError(f"{r.status_code}: {r.text}")
+            lines = (ln for ln in r.iter_lines() if ln)
+            header = next(lines, None)
+            if header is None:
+                raise RuntimeError("Export stream truncated")
+            yield json.loads(header)
+            count = 0
+            for line in lines:
+                rec = json.loads(line)
+                if rec.get("end"):
+                    if int(rec.get("count", -1)) != count:
+                        raise RuntimeError("Export stream incomplete")
+                    return
+                count += 1
+                yield rec
+            raise RuntimeError("Export stream truncated")
+
     def export_vault(self, user_id: int) -> Tuple[bool, str, Dict[str, Any]]:
+        """Deprecated: collects the whole vault in memory. Use iter_export_vault()."""
+        warnings.warn(
+            "APIClient.export_vault() buffers the whole vault; use iter_export_vault()",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         try:
-            r = self.session.get(f"{self.base_url}/export/{user_id}", timeout=self.timeout)
-            if r.ok:
-                return True, "ok", r.json().get("vault", {})
-            return False, f"{r.status_code}: {r.text}", {}
+            it = self.iter_export_vault(user_id)
+            vault = dict(next(it))
+            vault["passwords"] = list(it)
+            return True, "ok", vault
         except Exception as e:
             return False, str(e), {}
 
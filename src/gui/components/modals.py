@@ -13,6 +13,7 @@ from datetime import datetime
 from src.auth.auth_manager import AuthManager, verify_password
 from src.backend.api_client import APIClient
 from src.gui.styles.styles import Styles
+from src.security.estimator import estimate_strength
 try:
     from src.security.audit import log_action
 except Exception:  # fallback if module is missing
@@ -33,51 +34,16 @@ class PasswordStrengthChecker:
     """Password strength checking utilities"""
 
     @staticmethod
-    def check_strength(password):
-        """Check password strength - Returns: (strength_level, score, feedback)"""
+    def check_strength(password, user_inputs=()):
+        """Check password strength - Returns: (strength_level, score 0-4, feedback)
+
+        Same estimator as the backend/audit (src/security/estimator.py);
+        `user_inputs` (email, name...) are treated as easy-to-guess words.
+        """
         if not password:
             return "weak", 0, ["Password is empty"]
-
-        score = 0
-        feedback = []
-
-        # Length check
-        length = len(password)
-        if length >= 12:
-            score += 2
-        elif length >= 8:
-            score += 1
-        else:
-            feedback.append("Utilisez au moins 8 caractères")
-
-        # Character variety
-        if re.search(r'[a-z]', password):
-            score += 1
-        else:
-            feedback.append("Ajoutez des minuscules")
-
-        if re.search(r'[A-Z]', password):
-            score += 1
-        else:
-            feedback.append("Ajoutez des majuscules")
-
-        if re.search(r'\d', password):
-            score += 1
-        else:
-            feedback.append("Ajoutez des chiffres")
-
-        if re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-            score += 1
-        else:
-            feedback.append("Ajoutez des caractères spéciaux")
-
-        # Determine strength level
-        if score >= 5:
-            return "strong", score, ["Mot de passe fort !"]
-        elif score >= 3:
-            return "medium", score, feedback or ["Bon mot de passe"]
-        else:
-            return "weak", score, feedback or ["Mot de passe faible"]
+        est = estimate_strength(password, user_inputs)
+        return est.label, est.score, est.feedback
 
     @staticmethod
     def generate_strong_password(length=16):
@@ -101,7 +67,7 @@ class PasswordStrengthWidget(QWidget):
 
         # Progress bar
         self.progress = QProgressBar()
-        self.progress.setMaximum(6)
+        self.progress.setMaximum(5)
         self.progress.setValue(0)
         self.progress.setTextVisible(False)
         self.progress.setFixedHeight(8)
@@ -124,11 +90,12 @@ class PasswordStrengthWidget(QWidget):
         self.label.setStyleSheet(f"color: {Styles.TEXT_MUTED}; font-size: 12px; background: transparent;")
         layout.addWidget(self.label)
 
-    def update_strength(self, password):
-        """Update strength indicator based on password"""
-        strength, score, feedback = PasswordStrengthChecker.check_strength(password)
+    def update_strength(self, password, user_inputs=()):
+        """Update strength indicator based on password (cheap enough for every keystroke)"""
+        strength, score, feedback = PasswordStrengthChecker.check_strength(password, user_inputs)
 
-        self.progress.setValue(score)
+        # score is 0-4; keep one visible segment for any non-empty password
+        self.progress.setValue(score + 1 if password else 0)
 
         colors = {
             'weak': Styles.WEAK_COLOR,
@@ -144,6 +111,7 @@ class PasswordStrengthWidget(QWidget):
         else:
             self.label.setText(f"{strength.capitalize()}: {', '.join(feedback)}")
             self.label.setStyleSheet(f"color: {color}; font-size: 12px; font-weight: bold; background: transparent;")
+        return strength
 
 
 class AnimatedButton(QPushButton):
@@ -556,13 +524,10 @@ class RegisterModal(QDialog):
 
     def on_password_changed(self, password):
         """Called when password text changes"""
-        self.strength_widget.update_strength(password)
-
-        if password:
-            strength, _, _ = PasswordStrengthChecker.check_strength(password)
-            self.weak_password_container.setVisible(strength == "weak")
-        else:
-            self.weak_password_container.setVisible(False)
+        # The user's own name / email count as easy guesses.
+        user_inputs = (self.name_input.text(), self.email_input.text())
+        strength = self.strength_widget.update_strength(password, user_inputs)
+        self.weak_password_container.setVisible(bool(password) and strength == "weak")
 
     def generate_strong_password(self):
         """Generate a strong password and fill it in"""
@@ -2059,7 +2024,7 @@ class EditProfileModal(QDialog):
         if not user:
             QMessageBox.warning(self, "Erreur", "Utilisateur introuvable")
             return
-        if not verify_password(user.get('password_hash'), user.get('salt'), current_pwd):
+        if not verify_password(user.get('password_hash'), user.get('salt'), current_pwd, user.get('kdf_iterations')):
             QMessageBox.warning(self, "Erreur", "Mot de passe actuel incorrect")
             return
 
@@ -2381,10 +2346,15 @@ class DeviceSessionsModal(QDialog):
 
 
 class AuditLogModal(QDialog):
+    PAGE_SIZE = 100
+
     def __init__(self, user_id: int, auth_manager: AuthManager, parent=None):
         super().__init__(parent)
         self.user_id = user_id
         self.auth = auth_manager
+        self._cursor = None
+        self._exhausted = False
+        self._loading = False
         self.setWindowTitle("Journal")
         self.setFixedSize(720, 520)
         self.setModal(True)
@@ -2458,6 +2428,8 @@ class AuditLogModal(QDialog):
         self.list_layout.setContentsMargins(0, 0, 0, 0)
         self.list_layout.setSpacing(10)
         self.scroll.setWidget(self.list_container)
+        # Next page when the user gets near the bottom.
+        self.scroll.verticalScrollBar().valueChanged.connect(self._on_scroll)
         root.addWidget(self.scroll, 1)
 
         close_btn = QPushButton("Fermer")
@@ -2476,42 +2448,67 @@ class AuditLogModal(QDialog):
             w = self.list_layout.itemAt(i).widget()
             if w:
                 w.setParent(None)
+        self._cursor = None
+        self._exhausted = False
         if not hasattr(self.auth, "list_audit_logs"):
             self.list_layout.addWidget(QLabel("Journal indisponible."))
             return
-        logs = self.auth.list_audit_logs(self.user_id, self._filter_key())
-        if not logs:
+        if not self._load_page():
             self.list_layout.addWidget(QLabel("Aucun journal disponible."))
-            return
+
+    def _on_scroll(self, value: int):
+        bar = self.scroll.verticalScrollBar()
+        if value >= bar.maximum() - 200:
+            self._load_page()
+
+    def _load_page(self) -> int:
+        """Append the next page of cards; returns how many rows were added."""
+        if self._loading or self._exhausted:
+            return 0
+        self._loading = True
+        try:
+            logs = self.auth.list_audit_logs(
+                self.user_id, self._filter_key(), limit=self.PAGE_SIZE, before=self._cursor
+            )
+        finally:
+            self._loading = False
+        if len(logs) < self.PAGE_SIZE:
+            self._exhausted = True
+        if logs:
+            self._cursor = (logs[-1]["created_at"], logs[-1]["id"])
         for row in logs:
-            action = row.get("action", "-")
-            when = row.get("created_at")
-            ts = when.strftime("%d/%m/%Y %H:%M") if when else "-"
-            details = row.get("details") or ""
-
-            card = QFrame()
-            card.setStyleSheet("""
-                QFrame {
-                    background: rgba(255,255,255,0.03);
-                    border: 1px solid rgba(255,255,255,0.08);
-                    border-radius: 12px;
-                }
-            """)
-            row_l = QHBoxLayout(card)
-            row_l.setContentsMargins(12, 10, 12, 10)
-            row_l.setSpacing(12)
-
-            icon = QLabel("📄")
-            icon.setStyleSheet("font-size:18px;")
-
-            text_col = QVBoxLayout()
-            title = QLabel(action.replace(":", " • "))
-            title.setStyleSheet("font-weight:600; font-size:13px;")
-            sub = QLabel(f"{ts}  {details}")
-            sub.setStyleSheet(f"color:{Styles.TEXT_SECONDARY}; font-size:11px;")
-            text_col.addWidget(title)
-            text_col.addWidget(sub)
-
-            row_l.addWidget(icon)
-            row_l.addLayout(text_col, 1)
-            self.list_layout.addWidget(card)
+            self.list_layout.addWidget(self._card(row))
+        return len(logs)
+
+    def _card(self, row: dict) -> QFrame:
+        action = row.get("action", "-")
+        when = row.get("created_at")
+        ts = when.strftime("%d/%m/%Y %H:%M") if when else "-"
+        details = row.get("details") or ""
+
+        card = QFrame()
+        card.setStyleSheet("""
+            QFrame {
+                background: rgba(255,255,255,0.03);
+                border: 1px solid rgba(255,255,255,0.08);
+                border-radius: 12px;
+            }
+        """)
+        row_l = QHBoxLayout(card)
+        row_l.setContentsMargins(12, 10, 12, 10)
+        row_l.setSpacing(12)
+
+        icon = QLabel("📄")
+        icon.setStyleSheet("font-size:18px;")
+
+        text_col = QVBoxLayout()
+        title = QLabel(action.replace(":", " • "))
+        title.setStyleSheet("font-weight:600; font-size:13px;")
+        sub = QLabel(f"{ts}  {details}")
+        sub.setStyleSheet(f"color:{Styles.TEXT_SECONDARY}; font-size:11px;")
+        text_col.addWidget(title)
+        text_col.addWidget(sub)
+
+        row_l.addWidget(icon)
+        row_l.addLayout(text_col, 1)
+        return card
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 import threading
-import json
 import os
-from datetime import datetime, timedelta
 from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QFrame, QLabel,
@@ -31,8 +29,8 @@ from src.auth.auth_manager import AuthManager, verify_password
 from src.security.encryption import (
     encrypt_for_storage,
     decrypt_any,
-    encrypt_vault_payload,
-    decrypt_vault_payload,
+    encrypt_vault_stream,
+    read_vault_file,
 )
 
 
@@ -197,6 +195,15 @@ class UserProfileWidget(QWidget):
 
 # ----------------------------- Main Window -----------------------------
 class MainWindow(QMainWindow):
+    audit_finished = pyqtSignal()
+
+    # Columns the list needs; ciphertexts are fetched on demand (reveal).
+    LIST_FIELDS = (
+        "id", "site_name", "site_url", "site_icon", "username", "category",
+        "strength", "favorite", "trashed_at", "last_updated", "created_at",
+    )
+    IMPORT_BATCH = 500  # vault records per /passwords/bulk request
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.api_client = APIClient("http://127.0.0.1:5000")
@@ -204,6 +211,8 @@ class MainWindow(QMainWindow):
         # State
         self.current_user = None
         self._all_passwords = []
+        self._sync_seq = None
+        self._audit_running = False
         self._locked_user = None
         self._lock_timeout_ms = 3 * 60 * 1000
         self._lock_timer = QTimer(self)
@@ -213,6 +222,7 @@ class MainWindow(QMainWindow):
         # UI
         self._build_ui()
         self._wire_basic_signals()
+        self.audit_finished.connect(self._on_audit_finished)
         self._install_inactivity_monitor()
         self._auth_flow()
 
@@ -449,6 +459,7 @@ class MainWindow(QMainWindow):
         self._locked_user = self.current_user
         self.current_user = None
         self._all_passwords = []
+        self._sync_seq = None
         self.password_list.load_passwords([])
         self._show_passwords_page()
         self._show_lock_dialog()
@@ -530,7 +541,7 @@ class MainWindow(QMainWindow):
             try:
                 u = self.auth._user_by_email(self._locked_user.get("email"))
                 if u:
-                    ok = verify_password(u["password_hash"], u["salt"], pwd.text())
+                    ok = verify_password(u["password_hash"], u["salt"], pwd.text(), u.get("kdf_iterations"))
             except Exception:
                 ok = False
             if ok:
@@ -877,13 +888,57 @@ class MainWindow(QMainWindow):
         if not self.current_user:
             return
         
-        ok, msg, data = self.api_client.get_passwords(self.current_user["id"])
-        self._all_passwords = data if ok else []
+        # Record the change head first: anything written while paging is
+        # simply re-applied by the next sync_passwords().
+        ok, _msg, head = self.api_client.get_changes(self.current_user["id"], fields=self.LIST_FIELDS)
+        self._sync_seq = head.get("seq") if ok else None
+
+        # Page through the vault; paint the first page right away so large
+        # vaults don't keep the window blank until everything is downloaded.
+        data = []
+        try:
+            pages = self.api_client.iter_passwords(self.current_user["id"], fields=self.LIST_FIELDS)
+            for i, page in enumerate(pages):
+                data.extend(page)
+                if i == 0:
+                    self._apply_passwords(data)
+                    QApplication.processEvents()
+        except Exception as e:
+            print(f"❌ Failed to load passwords: {e}")
+            data = []
+        self._apply_passwords(data)
+
+    def sync_passwords(self):
+        """Apply only the rows changed since the last load/sync (falls back to a full load)."""
+        if not self.current_user:
+            return
+        if self._sync_seq is None:
+            self.load_passwords()
+            return
+
+        ok, _msg, delta = self.api_client.get_changes(
+            self.current_user["id"], since=self._sync_seq, fields=self.LIST_FIELDS
+        )
+        if not ok or delta.get("reset") or int(delta.get("seq") or 0) < self._sync_seq:
+            # backend unreachable / database reset / deletions pruned: start over
+            self.load_passwords()
+            return
+
+        changed = delta.get("changed") or []
+        drop = set(delta.get("deleted") or []) | {p.get("id") for p in changed}
+        merged = changed + [p for p in self._all_passwords if p.get("id") not in drop]
+        # same order as a full load: newest first on (last_updated, id)
+        merged.sort(key=lambda p: (p.get("last_updated") or "", p.get("id") or 0), reverse=True)
+        self._sync_seq = int(delta.get("seq") or 0)
+        self._apply_passwords(merged)
+
+    def _apply_passwords(self, data: list):
+        self._all_passwords = data
         # Normalize trash status from backend (uses trashed_at)
         for p in self._all_passwords:
             if p.get("trashed_at"):
                 p["category"] = "trash"
-        
+
         visible = [p for p in self._all_passwords if p.get("category") != "trash"]
         self.password_list.load_passwords(visible)
 
@@ -1092,16 +1147,10 @@ class MainWindow(QMainWindow):
     def _export_encrypted_vault(self):
         if not self.current_user:
             return
-        ok, msg, vault = self.api_client.export_vault(self.current_user["id"])
-        if not ok:
-            self._show_error_dialog("Erreur", msg)
-            return
-
         passphrase = self._prompt_passphrase("Export chiffrÃ© (.pgvault)", confirm=True)
         if not passphrase:
             return
 
-        enc = encrypt_vault_payload(vault, passphrase)
         filename, _ = QFileDialog.getSaveFileName(
             self, "Exporter le coffre", "vault.pgvault", "Password Guardian Vault (*.pgvault)"
         )
@@ -1109,8 +1158,21 @@ class MainWindow(QMainWindow):
             return
         if not filename.lower().endswith(".pgvault"):
             filename += ".pgvault"
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(enc, f, indent=2)
+
+        # v2 container: records go straight from the NDJSON export stream into
+        # encrypted frames, so memory stays flat whatever the vault size.
+        tmp = filename + ".part"
+        try:
+            records = self.api_client.iter_export_vault(self.current_user["id"])
+            meta = next(records)
+            with open(tmp, "wb") as f:
+                encrypt_vault_stream(f, meta, records, passphrase)
+            os.replace(tmp, filename)
+        except Exception as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self._show_error_dialog("Erreur", str(e))
+            return
         QMessageBox.information(self, "Export", "âœ… Export chiffrÃ© terminÃ©.")
 
     def _import_encrypted_vault(self):
@@ -1126,96 +1188,57 @@ class MainWindow(QMainWindow):
         if not passphrase:
             return
 
+        f = None
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                blob = json.load(f)
-            vault = decrypt_vault_payload(blob, passphrase)
+            f = open(filename, "rb")
+            records = read_vault_file(f, passphrase)
+            next(records)  # header + first frame: a wrong passphrase fails here
         except Exception as e:
+            if f:
+                f.close()
             self._show_error_dialog("Erreur", f"Impossible de dÃ©chiffrer: {e}")
             return
 
-        items = vault.get("passwords") or []
-        if not isinstance(items, list):
-            self._show_error_dialog("Erreur", "Format de coffre invalide.")
-            return
+        with f:
+            mode = self._prompt_import_mode()
+            if not mode:
+                return
 
-        mode = self._prompt_import_mode()
-        if not mode:
-            return
+            # Records are decrypted as they are read and uploaded IMPORT_BATCH at
+            # a time; duplicate matching (site + username) happens server-side.
+            counts = {"added": 0, "updated": 0, "skipped": 0}
+            error = None
 
-        existing = {}
-        for p in self._all_passwords:
-            key = (str(p.get("site_name", "")).strip().lower(), str(p.get("username", "")).strip().lower())
-            if key[0] or key[1]:
-                existing[key] = p
-
-        imported = 0
-        updated = 0
-        skipped = 0
-
-        for it in items:
-            if not it.get("site_name") or not it.get("username") or not it.get("encrypted_password"):
-                continue
-            key = (str(it.get("site_name", "")).strip().lower(), str(it.get("username", "")).strip().lower())
-            match = existing.get(key)
-
-            if match:
-                if mode == "skip":
-                    skipped += 1
-                    continue
-                if mode == "overwrite":
-                    ok, msg = self.api_client.update_password(
-                        match["id"],
-                        {
-                            "site_name": it.get("site_name"),
-                            "site_url": it.get("site_url") or "",
-                            "site_icon": it.get("site_icon") or "ðŸ”’",
-                            "username": it.get("username"),
-                            "encrypted_password": it.get("encrypted_password"),
-                            "category": it.get("category") or "personal",
-                            "strength": it.get("strength") or "medium",
-                            "favorite": bool(it.get("favorite") or False),
-                        },
-                    )
-                    if ok:
-                        updated += 1
-                    else:
-                        skipped += 1
-                    continue
-
-                # merge
-                updates = {}
-                for field in ["site_url", "site_icon", "category", "strength"]:
-                    if not match.get(field) and it.get(field):
-                        updates[field] = it.get(field)
-                if not match.get("favorite") and it.get("favorite"):
-                    updates["favorite"] = True
-                if updates:
-                    ok, msg = self.api_client.update_password(match["id"], updates)
-                    if ok:
-                        updated += 1
-                    else:
-                        skipped += 1
-                else:
-                    skipped += 1
-                continue
-
-            ok, msg, _ = self.api_client.add_password(
-                user_id=self.current_user["id"],
-                site_name=str(it.get("site_name")),
-                username=str(it.get("username")),
-                encrypted_password=str(it.get("encrypted_password")),
-                category=str(it.get("category") or "personal"),
-                site_url=str(it.get("site_url") or ""),
-                site_icon=str(it.get("site_icon") or "ðŸ”’"),
-                strength=str(it.get("strength") or "medium"),
+            def upload(batch):
+                ok, msg, res = self.api_client.bulk_upsert_passwords(self.current_user["id"], batch, mode)
+                if not ok:
+                    return msg
+                for key in counts:
+                    counts[key] += int(res.get(key, 0))
+                return None
+
+            batch = []
+            try:
+                for item in records:
+                    batch.append(item)
+                    if len(batch) == self.IMPORT_BATCH:
+                        error, batch = upload(batch), []
+                        if error:
+                            break
+                if batch and not error:
+                    error = upload(batch)
+            except Exception as e:
+                error = f"Impossible de dÃ©chiffrer: {e}"
+        imported, updated, skipped = counts["added"], counts["updated"], counts["skipped"]
+        if error:
+            if imported or updated:
+                self.sync_passwords()
+            self._show_error_dialog(
+                "Erreur", f"{error}\n(dÃ©jÃ  importÃ©s: {imported + updated})"
             )
-            if ok:
-                imported += 1
-            else:
-                skipped += 1
+            return
 
-        self.load_passwords()
+        self.sync_passwords()
         QMessageBox.information(
             self,
             "Import terminÃ©",
@@ -1279,6 +1302,27 @@ class MainWindow(QMainWindow):
     def _show_statistics_page(self):
         self._render_stats_page()
         self.content_stack.setCurrentWidget(self.stats_page)
+        self._start_security_audit()
+
+    def _start_security_audit(self):
+        """Refresh audit results off the UI thread (incremental: only changed rows)."""
+        if self._audit_running or not self.current_user:
+            return
+        self._audit_running = True
+        uid = self.current_user["id"]
+
+        def _run():
+            try:
+                self.api_client.run_security_audit(uid)
+            finally:
+                self.audit_finished.emit()
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _on_audit_finished(self):
+        self._audit_running = False
+        if self.current_user and self.content_stack.currentWidget() is self.stats_page:
+            self._render_stats_page()
 
     def _show_passwords_page(self):
         self.content_stack.setCurrentWidget(self.password_list)
@@ -1316,24 +1360,13 @@ class MainWindow(QMainWindow):
         weak = sum(1 for p in passwords if p.get("strength") == "weak")
         favorites = sum(1 for p in passwords if p.get("favorite"))
 
-        pw_map = {}
-        for p in passwords:
-            tok = p.get("encrypted_password") or ""
-            pw_map[tok] = pw_map.get(tok, 0) + 1
-        reused = sum(1 for p in passwords if pw_map.get(p.get("encrypted_password") or "", 0) > 1)
-
-        old = 0
-        cutoff = datetime.utcnow() - timedelta(days=180)
-        for p in passwords:
-            ts = p.get("last_updated") or p.get("created_at") or ""
-            try:
-                dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
-                if dt < cutoff:
-                    old += 1
-            except Exception:
-                pass
-
-        pwned = 0
+        # Reuse / age / breaches come from the server-side audit (ciphertexts never match).
+        ok_stats, _msg, server_stats = self.api_client.get_stats(self.current_user["id"])
+        if not ok_stats:
+            server_stats = {}
+        reused = int(server_stats.get("reused", 0))
+        old = int(server_stats.get("old", 0))
+        pwned = int(server_stats.get("pwned", 0))
         score = int((strong * 2 + medium) / max(1, total * 2) * 100)
         score_color = Styles.STRONG_COLOR if score >= 80 else (
             Styles.MEDIUM_COLOR if score >= 50 else Styles.WEAK_COLOR
@@ -1566,7 +1599,7 @@ class MainWindow(QMainWindow):
                 }
             )
             if ok:
-                self.load_passwords()
+                self.sync_passwords()
                 QMessageBox.information(self, "Succès", "✅ Mot de passe mis à jour.")
             else:
                 self._show_error_dialog("Erreur", msg)
@@ -1672,7 +1705,7 @@ class MainWindow(QMainWindow):
                 
                 if ok:
                     print(f"âœ… Password added successfully: {response}")
-                    self.load_passwords()
+                    self.sync_passwords()
                     QMessageBox.information(
                         self, 
                         "SuccÃ¨s", 
@@ -1730,7 +1763,7 @@ class MainWindow(QMainWindow):
                 }
             )
             if ok:
-                self.load_passwords()
+                self.sync_passwords()
                 QMessageBox.information(self, "SuccÃƒÂ¨s", "Ã¢Å“â€¦ Mot de passe mis Ãƒ  jour.")
             else:
                 self._show_error_dialog("Erreur", msg)
@@ -1761,7 +1794,7 @@ class MainWindow(QMainWindow):
             
             ok, msg = self.api_client.delete_password(pid)
             if ok:
-                self.load_passwords()
+                self.sync_passwords()
                 QMessageBox.information(self, "Supprimé", "🗑️ Supprimé définitivement.")
             else:
                 self._show_error_dialog("Erreur", msg)
@@ -1781,7 +1814,7 @@ class MainWindow(QMainWindow):
             ok, msg = self.api_client.trash_password(pid)
             
             if ok:
-                self.load_passwords()
+                self.sync_passwords()
                 QMessageBox.information(self, "Corbeille", "🗑️ Déplacé vers la corbeille.")
             else:
                 self._show_error_dialog("Erreur", msg)
@@ -1807,7 +1840,7 @@ class MainWindow(QMainWindow):
         ok, msg = self.api_client.restore_password(pid)
         
         if ok:
-            self.load_passwords()
+            self.sync_passwords()
             QMessageBox.information(self, "Restauré", "✅ Restauré avec succès.")
         else:
             self._show_error_dialog("Erreur", msg)
@@ -1837,7 +1870,7 @@ class MainWindow(QMainWindow):
                 p["favorite"] = new_status
                 
                 # Reload to refresh UI
-                self.load_passwords()
+                self.sync_passwords()
                 
                 # Show confirmation
                 status_text = "ajouté aux favoris" if new_status else "retiré des favoris"
@@ -2102,5 +2135,6 @@ class MainWindow(QMainWindow):
             if w:
                 w.setParent(None)
         self._all_passwords = []
+        self._sync_seq = None
         self.password_list.load_passwords([])
         self._auth_flow()
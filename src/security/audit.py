@@ -3,35 +3,227 @@
 
 Centralizes security-relevant event logging so the app can show an
 "Audit Logs" view.
+
+Events are written behind: `log_action` appends to an in-memory buffer and
+a background thread stores it with one multi-row INSERT when AUDIT_BATCH
+events are waiting or every AUDIT_FLUSH_MS, whichever comes first, so an
+audit entry no longer costs its own commit on the request path. The buffer
+is flushed at interpreter exit. If the database refuses a batch, its events
+are retried one by one and only the refused ones are dropped.
+
+Durable mode (`durable=True`, or AUDIT_DURABLE=1 for every event) returns
+only once the event is committed; concurrent durable callers share one
+flush (group commit). AUDIT_BUFFER=0 writes each event synchronously.
 """
 
 from __future__ import annotations
 
+import atexit
+import os
+import threading
+from collections import deque
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
 from database.engine import SessionLocal
 from database.models import ActivityLog
 
+AUDIT_BUFFER = os.getenv("AUDIT_BUFFER", "1").strip().lower() in {"1", "true", "yes", "on"}
+AUDIT_DURABLE = os.getenv("AUDIT_DURABLE", "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def action_type(action: str) -> str:
+    """Category stored in activity_logs.action_type: "password" for "password:add:github"."""
+    return (action or "").split(":", 1)[0][:50]
+
+
+class AuditWriter:
+    def __init__(self, max_batch: int = 200, flush_interval: float = 1.0, max_buffer: int = 50_000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buf: deque[tuple[int, bool, dict]] = deque()   # (seq, durable, event)
+        self._seq = 0          # events accepted
+        self._flushed = 0      # events up to this seq are committed (or dropped)
+        self._lost: set[int] = set()   # durable events refused by the database or shed
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._closed = False
+        self._stats = {"written": 0, "batches": 0, "failures": 0, "dropped": 0, "rejected": 0}
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def log(
+        self,
+        user_id: int,
+        action: str,
+        details: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        durable: bool = False,
+    ) -> bool:
+        """Queue one event; with `durable`, wait until it is committed (returns False if that failed)."""
+        event = {
+            "user_id": user_id,
+            "action": action,
+            "action_type": action_type(action),
+            "details": details,
+            "ip_address": ip_address,
+            "created_at": datetime.utcnow(),
+        }
+        with self._lock:
+            if self._closed:
+                durable = True
+            if len(self._buf) >= self.max_buffer:
+                # The database has been unreachable for a while: shed the oldest events.
+                self._shed([self._buf.popleft()])
+            self._seq += 1
+            seq = self._seq
+            self._buf.append((seq, durable, event))
+            if len(self._buf) >= self.max_batch:
+                self._wake.notify()
+        if not durable:
+            return True
+        self.flush()
+        with self._lock:
+            # Committed unless the flush failed and the event is still buffered, or it
+            # was refused or shed (a later flush may have moved _flushed past it).
+            if seq in self._lost:
+                self._lost.discard(seq)
+                return False
+            return self._flushed >= seq
+
+    def flush(self) -> bool:
+        """Write everything buffered so far; False if the database was unavailable (events are kept for the next try)."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buf = list(self._buf), deque()
+                upto = self._seq
+            if not batch:
+                return True
+            try:
+                with SessionLocal() as s:
+                    s.execute(insert(ActivityLog), [e for _, _, e in batch])
+                    s.commit()
+                written, pending = len(batch), []
+            except Exception:
+                # One bad event must not hold back the others: retry one by one.
+                written, pending = self._insert_each(batch)
+            with self._lock:
+                self._stats["written"] += written
+                if not pending:
+                    self._flushed = upto
+                    self._stats["batches"] += 1
+                    return True
+                self._stats["failures"] += 1
+                keep = min(len(pending), max(0, self.max_buffer - len(self._buf)))
+                self._shed(pending[:len(pending) - keep])
+                self._buf.extendleft(reversed(pending[len(pending) - keep:]))
+            return False
+
+    def _shed(self, events: list) -> None:
+        # caller holds self._lock
+        self._stats["dropped"] += len(events)
+        self._lost.update(seq for seq, durable, _ in events if durable)
+
+    def _insert_each(self, batch: list) -> tuple[int, list]:
+        """Insert events one per transaction: (written, events left for a retry).
+
+        Events the database refuses (constraint violation, value too long) are
+        dropped; any other error means the database is unavailable, so this
+        and the remaining events are kept.
+        """
+        written = 0
+        for k, (seq, durable, event) in enumerate(batch):
+            try:
+                with SessionLocal() as s:
+                    s.execute(insert(ActivityLog), [event])
+                    s.commit()
+                written += 1
+            except (IntegrityError, DataError) as e:
+                with self._lock:
+                    self._stats["rejected"] += 1
+                    if durable:
+                        self._lost.add(seq)
+                print(f"⚠️ audit event rejected ({event['action']!r}): {getattr(e, 'orig', e)}")
+            except Exception:
+                return written, batch[k:]
+        return written, []
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._closed and len(self._buf) < self.max_batch:
+                    self._wake.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is left (later events are written synchronously)."""
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, buffered=len(self._buf))
+
+
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditWriter:
+    """Process-wide writer (AUDIT_BATCH, AUDIT_FLUSH_MS), flushed at exit."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    max_batch=int(os.getenv("AUDIT_BATCH", "200")),
+                    flush_interval=int(os.getenv("AUDIT_FLUSH_MS", "1000")) / 1000,
+                )
+                atexit.register(_writer.close)
+    return _writer
+
 
 def log_action(
     user_id: int,
     action: str,
     details: Optional[str] = None,
     ip_address: Optional[str] = None,
-) -> None:
+    durable: Optional[bool] = None,
+) -> bool:
+    """Record one event; False if it could not be stored (durable) or queued.
+
+    Never raises: callers that disclose secrets check the result and refuse
+    to answer when their audit entry was not committed.
+    """
     try:
+        if AUDIT_BUFFER:
+            return get_audit_writer().log(
+                user_id, action, details, ip_address,
+                durable=AUDIT_DURABLE if durable is None else durable,
+            )
         with SessionLocal() as s:
             s.add(
                 ActivityLog(
                     user_id=user_id,
                     action=action,
+                    action_type=action_type(action),
                     details=details,
                     ip_address=ip_address,
                     created_at=datetime.utcnow(),
                 )
             )
             s.commit()
+        return True
     except Exception:
         # Audit logging should never crash the app
-        return
+        return False
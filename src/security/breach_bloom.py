@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Bloom filter in front of the breach lookup.
+
+Most vault passwords are *not* in the corpus, so a small filter answers
+"definitely not breached" without touching the full index (or the network).
+Only possible hits fall through to the real source.
+
+The filter is keyed on the SHA-1 digest itself (already uniformly
+distributed), using double hashing: bit_i = (h1 + i*h2) mod m.
+
+File layout (little-endian):
+    MAGIC (8) | u32 k | u64 m (bits) | u64 n (keys) | bit array (m/8 bytes)
+
+CLI:
+    python -m src.security.breach_bloom build breach.idx breach.bloom --fp-rate 0.001
+    python -m src.security.breach_bloom build pwned-passwords-sha1.txt breach.bloom
+    python -m src.security.breach_bloom lookup breach.bloom <password>
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator
+
+from src.security.breach_index import MAGIC as INDEX_MAGIC, BreachIndex, _parse_dump
+
+MAGIC = b"PGBLOOM1"
+_HEADER = struct.Struct("<8sIQQ")
+_H = struct.Struct("<QQ")
+DEFAULT_FP_RATE = 0.001
+
+
+def bloom_params(n: int, fp_rate: float) -> tuple[int, int]:
+    """Optimal (m bits, k hashes) for `n` keys at the target false-positive rate."""
+    if not 0 < fp_rate < 1:
+        raise ValueError("fp_rate must be between 0 and 1")
+    n = max(n, 1)
+    m = math.ceil(-n * math.log(fp_rate) / (math.log(2) ** 2))
+    m = (m + 7) // 8 * 8
+    k = max(1, round(m / n * math.log(2)))
+    return m, k
+
+
+def _positions(digest: bytes, k: int, m: int) -> Iterator[int]:
+    h1, h2 = _H.unpack_from(digest, 0)
+    h2 |= 1
+    for i in range(k):
+        yield (h1 + i * h2) % m
+
+
+class BloomFilter:
+    """Read-only, memory-mapped Bloom filter; only the probed pages become resident."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._f.close()
+            raise ValueError(f"Empty Bloom filter: {path}")
+        magic, self.k, self.m, self.n = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or len(self._mm) != _HEADER.size + self.m // 8:
+            self.close()
+            raise ValueError(f"Not a breach Bloom filter: {path}")
+
+    @property
+    def fp_rate(self) -> float:
+        """Expected false-positive rate for the stored key count."""
+        return (1 - math.exp(-self.k * self.n / self.m)) ** self.k
+
+    def might_contain(self, digest: bytes) -> bool:
+        mm, base = self._mm, _HEADER.size
+        for bit in _positions(digest, self.k, self.m):
+            if not mm[base + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def __contains__(self, sha1_hex: str) -> bool:
+        return self.might_contain(bytes.fromhex(sha1_hex))
+
+    def close(self) -> None:
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __enter__(self) -> "BloomFilter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BloomGuardedSource:
+    """Pwned source that consults the filter before the wrapped source."""
+
+    def __init__(self, bloom: BloomFilter, inner):
+        self.bloom = bloom
+        self.inner = inner
+
+    def count(self, sha1_hex: str) -> int:
+        if sha1_hex not in self.bloom:
+            return 0
+        return self.inner.count(sha1_hex)
+
+
+def build_bloom(digests: Iterable[bytes], n: int, out_path: str,
+                fp_rate: float = DEFAULT_FP_RATE) -> tuple[int, int]:
+    """Write a filter sized for `n` keys; returns (m bits, k hashes)."""
+    m, k = bloom_params(n, fp_rate)
+    bits = bytearray(m // 8)
+    for digest in digests:
+        for bit in _positions(digest, k, m):
+            bits[bit >> 3] |= 1 << (bit & 7)
+    tmp_out = out_path + ".tmp"
+    with open(tmp_out, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, k, m, n))
+        out.write(bits)
+    os.replace(tmp_out, out_path)
+    return m, k
+
+
+def build_bloom_from_file(src_path: str, out_path: str,
+                          fp_rate: float = DEFAULT_FP_RATE) -> tuple[int, int, int]:
+    """Build from a breach index (preferred) or a raw SHA-1 dump; returns (n, m, k)."""
+    with open(src_path, "rb") as f:
+        is_index = f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+    if is_index:
+        with BreachIndex(src_path) as idx:
+            n = len(idx)
+            m, k = build_bloom(idx.digests(), n, out_path, fp_rate)
+        return n, m, k
+
+    with open(src_path, "rb") as f:
+        n = sum(1 for _ in _parse_dump(f))
+    with open(src_path, "rb") as f:
+        m, k = build_bloom((rec[:20] for rec in _parse_dump(f)), n, out_path, fp_rate)
+    return n, m, k
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Bloom filter for breach lookups.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build from a breach index or SHA-1 dump")
+    b.add_argument("source")
+    b.add_argument("bloom")
+    b.add_argument("--fp-rate", type=float, default=DEFAULT_FP_RATE)
+    q = sub.add_parser("lookup", help="check one password")
+    q.add_argument("bloom")
+    q.add_argument("password")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        n, m, k = build_bloom_from_file(args.source, args.bloom, args.fp_rate)
+        print(f"✅ {n} keys, {m // 8 / 1e6:.1f} MB, k={k} -> {args.bloom}")
+    else:
+        with BloomFilter(args.bloom) as bloom:
+            hit = hashlib.sha1(args.password.encode("utf-8")).hexdigest() in bloom
+        print("possibly pwned" if hit else "definitely not pwned")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Offline breached-password index (HIBP "Pwned Passwords" SHA-1 dump).
+
+The text dump (`<SHA1 hex>:<count>` per line, in any order) is compiled
+once into a compact binary file. Lookups memory-map that file and do a
+binary search, so they need no network and no load time, and only touch
+a few pages per lookup.
+
+File layout (little-endian):
+    MAGIC (8) | u32 version | u64 record count
+    fan-out table: 65537 x u64 record offsets, by first 2 hash bytes
+    records: 20-byte SHA-1 | u32 count, sorted by hash
+
+CLI:
+    python -m src.security.breach_index build pwned-passwords-sha1.txt breach.idx
+    python -m src.security.breach_index lookup breach.idx <password>
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator
+
+MAGIC = b"PGBREACH"
+VERSION = 1
+_HEADER = struct.Struct("<8sIQ")
+_FANOUT = 65537
+_FAN = struct.Struct("<QQ")
+_REC = struct.Struct("<20sI")
+_DATA_OFF = _HEADER.size + _FANOUT * 8
+
+
+class BreachIndex:
+    """Read-only, memory-mapped breach index; safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._f.close()
+            raise ValueError(f"Empty breach index: {path}")
+        magic, version, self.size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a breach index: {path}")
+        if len(self._mm) != _DATA_OFF + self.size * _REC.size:
+            self.close()
+            raise ValueError(f"Corrupted breach index: {path}")
+
+    def count_sha1(self, digest: bytes) -> int:
+        """Breach count for a raw 20-byte SHA-1 digest (0 if absent)."""
+        mm = self._mm
+        lo, hi = _FAN.unpack_from(mm, _HEADER.size + 8 * int.from_bytes(digest[:2], "big"))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = _DATA_OFF + mid * _REC.size
+            cur = mm[off:off + 20]
+            if cur < digest:
+                lo = mid + 1
+            elif cur > digest:
+                hi = mid
+            else:
+                return _REC.unpack_from(mm, off)[1]
+        return 0
+
+    def count(self, sha1_hex: str) -> int:
+        """Breach count for an upper/lower-case SHA-1 hex string (pwned source API)."""
+        return self.count_sha1(bytes.fromhex(sha1_hex))
+
+    def range(self, prefix: str) -> Iterator[tuple[str, int]]:
+        """(suffix hex, count) for every hash starting with a 5-hex-char prefix.
+
+        Same shape as the HIBP range API, so an index can back a local stand-in.
+        """
+        prefix = prefix.upper()
+        p20 = int(prefix, 16)
+        mm = self._mm
+        lo, hi = _FAN.unpack_from(mm, _HEADER.size + 8 * (p20 >> 4))
+        for i in range(lo, hi):
+            h, n = _REC.unpack_from(mm, _DATA_OFF + i * _REC.size)
+            if h[2] >> 4 == p20 & 0xF:
+                yield h.hex().upper()[5:], n
+
+    def digests(self) -> Iterator[bytes]:
+        """All 20-byte digests in sorted order (used to build the Bloom filter)."""
+        mm = self._mm
+        for off in range(_DATA_OFF, _DATA_OFF + self.size * _REC.size, _REC.size):
+            yield mm[off:off + 20]
+
+    def close(self) -> None:
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+            self._mm = None
+        self._f.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> "BreachIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _parse_dump(lines: Iterable[bytes]) -> Iterator[bytes]:
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(b"#"):
+            continue
+        h, _, n = line.partition(b":")
+        if len(h) != 40:
+            continue
+        yield _REC.pack(bytes.fromhex(h.decode("ascii")), min(int(n or 1), 0xFFFFFFFF))
+
+
+def _write_run(records: list, tmpdir: str) -> str:
+    records.sort()
+    fd, path = tempfile.mkstemp(suffix=".run", dir=tmpdir)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"".join(records))
+    return path
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(_REC.size * 4096)
+            if not buf:
+                return
+            for i in range(0, len(buf), _REC.size):
+                yield buf[i:i + _REC.size]
+
+
+def build_breach_index(src_path: str, out_path: str, run_records: int = 5_000_000) -> int:
+    """Compile a SHA-1 dump into an index; returns the number of records.
+
+    The dump is external-sorted in runs of `run_records` (24 bytes each), so
+    memory stays bounded even for the full ~1B-line HIBP corpus. Duplicate
+    hashes are merged (counts summed).
+    """
+    tmpdir = os.path.dirname(os.path.abspath(out_path))
+    runs: list[str] = []
+    try:
+        with open(src_path, "rb") as src:
+            chunk: list = []
+            for rec in _parse_dump(src):
+                chunk.append(rec)
+                if len(chunk) >= run_records:
+                    runs.append(_write_run(chunk, tmpdir))
+                    chunk = []
+            if chunk or not runs:
+                runs.append(_write_run(chunk, tmpdir))
+
+        fanout = [0] * _FANOUT
+        total = 0
+        tmp_out = out_path + ".tmp"
+        with open(tmp_out, "wb") as out:
+            out.write(b"\0" * _DATA_OFF)
+            prev_hash, prev_count = None, 0
+            for rec in heapq.merge(*(_read_run(p) for p in runs)):
+                h, n = _REC.unpack(rec)
+                if h == prev_hash:
+                    prev_count = min(prev_count + n, 0xFFFFFFFF)
+                    continue
+                if prev_hash is not None:
+                    out.write(_REC.pack(prev_hash, prev_count))
+                    fanout[int.from_bytes(prev_hash[:2], "big") + 1] += 1
+                    total += 1
+                prev_hash, prev_count = h, n
+            if prev_hash is not None:
+                out.write(_REC.pack(prev_hash, prev_count))
+                fanout[int.from_bytes(prev_hash[:2], "big") + 1] += 1
+                total += 1
+
+            for i in range(1, _FANOUT):
+                fanout[i] += fanout[i - 1]
+            out.seek(0)
+            out.write(_HEADER.pack(MAGIC, VERSION, total))
+            out.write(struct.pack(f"<{_FANOUT}Q", *fanout))
+        os.replace(tmp_out, out_path)
+        return total
+    finally:
+        for p in runs:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Offline breached-password index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="compile a SHA-1 dump (HASH:COUNT lines)")
+    b.add_argument("dump")
+    b.add_argument("index")
+    b.add_argument("--run-records", type=int, default=5_000_000)
+    q = sub.add_parser("lookup", help="check one password")
+    q.add_argument("index")
+    q.add_argument("password")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        n = build_breach_index(args.dump, args.index, run_records=args.run_records)
+        print(f"✅ {n} hashes written to {args.index}")
+    else:
+        with BreachIndex(args.index) as idx:
+            n = idx.count(hashlib.sha1(args.password.encode("utf-8")).hexdigest())
+        print(f"pwned {n} times" if n else "not found")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,12 @@
 import base64
 import json
 import hashlib
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
 
@@ -15,6 +20,34 @@ MASTER_PASSWORD = "YourSecretMasterPassword2024!".encode("utf-8")
 SALT = b"salt_password_guardian_2024"
 
 
+# ============================================================
+# LAZY KEYS
+# ============================================================
+# PBKDF2 (100k + 200k iterations) used to run at import time; keys are now
+# derived on first use, once per process, behind a lock.
+_KEY_LOCK = threading.Lock()
+_KEYS: dict = {}
+
+
+def _memoized(name: str, factory):
+    value = _KEYS.get(name)
+    if value is None:
+        with _KEY_LOCK:
+            value = _KEYS.get(name)
+            if value is None:
+                value = _KEYS[name] = factory()
+    return value
+
+
+def __getattr__(name: str):
+    # Backwards compatible module attributes (FERNET / AES_GCM_KEY).
+    if name == "FERNET":
+        return get_fernet()
+    if name == "AES_GCM_KEY":
+        return get_aes_gcm_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # ============================================================
 # FERNET KEY (used by backend)
 # ============================================================
@@ -26,7 +59,9 @@ def get_fernet_key():
     return base64.urlsafe_b64encode(kdf[:32])
 
 
-FERNET = Fernet(get_fernet_key())
+def get_fernet() -> Fernet:
+    """Process-wide Fernet instance (key derived on first call)."""
+    return _memoized("fernet", lambda: Fernet(get_fernet_key()))
 
 
 # ============================================================
@@ -39,7 +74,22 @@ def derive_key():
     return hashlib.pbkdf2_hmac("sha256", MASTER_PASSWORD, b"legacy_aes_gcm_salt", 200000)
 
 
-AES_GCM_KEY = derive_key()
+def get_aes_gcm_key() -> bytes:
+    """Process-wide legacy AES-GCM key (derived on first call)."""
+    return _memoized("aes_gcm", derive_key)
+
+
+# ============================================================
+# FINGERPRINT KEY (password reuse detection)
+# ============================================================
+def get_fingerprint_key() -> bytes:
+    """Secret for password fingerprints: FINGERPRINT_KEY env var, else derived from MASTER_PASSWORD."""
+    def _derive() -> bytes:
+        env = os.getenv("FINGERPRINT_KEY")
+        if env:
+            return env.encode("utf-8")
+        return hashlib.pbkdf2_hmac("sha256", MASTER_PASSWORD, b"password_fingerprint_salt", 100000)
+    return _memoized("fingerprint", _derive)
 
 
 def encrypt_aes_gcm(plaintext: str) -> str:
@@ -50,7 +100,7 @@ def encrypt_aes_gcm(plaintext: str) -> str:
     plaintext_bytes = plaintext.encode("utf-8")
     iv = get_random_bytes(12)
 
-    cipher = AES.new(AES_GCM_KEY, AES.MODE_GCM, nonce=iv)
+    cipher = AES.new(get_aes_gcm_key(), AES.MODE_GCM, nonce=iv)
     ciphertext, tag = cipher.encrypt_and_digest(plaintext_bytes)
 
     payload = iv + tag + ciphertext
@@ -71,7 +121,7 @@ def decrypt_aes_gcm(token: str) -> str:
         tag = decoded[12:28]
         ciphertext = decoded[28:]
 
-        cipher = AES.new(AES_GCM_KEY, AES.MODE_GCM, nonce=iv)
+        cipher = AES.new(get_aes_gcm_key(), AES.MODE_GCM, nonce=iv)
         plaintext = cipher.decrypt_and_verify(ciphertext, tag)
 
         return plaintext.decode("utf-8")
@@ -100,7 +150,7 @@ def decrypt_any(token: str) -> str:
     # -----------------------------
     if token.startswith("gAAAA"):
         try:
-            return FERNET.decrypt(token.encode("utf-8")).decode("utf-8")
+            return get_fernet().decrypt(token.encode("utf-8")).decode("utf-8")
         except Exception as e:
             raise ValueError(f"Fernet decryption failed: {e}")
 
@@ -124,7 +174,95 @@ def encrypt_for_storage(plaintext: str) -> str:
     Encrypt using FERNET (same as backend).
     """
     try:
-        return FERNET.encrypt(plaintext.encode("utf-8")).decode("utf-8")
+        return get_fernet().encrypt(plaintext.encode("utf-8")).decode("utf-8")
+    except Exception as e:
+        raise ValueError(f"Fernet encryption failed: {e}")
+
+
+# ============================================================
+# BATCH ENCRYPT / DECRYPT (whole-vault operations)
+# ============================================================
+# Formats are detected once per batch, cipher objects are shared by the whole
+# batch (Fernet / AESGCM are reusable across tokens), and large batches are
+# split across a thread pool: cryptography releases the GIL inside OpenSSL.
+BATCH_CHUNK = 512
+BATCH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _decrypt_fernet_chunk(tokens: list, strict: bool) -> list:
+    f = get_fernet()
+    out = []
+    for t in tokens:
+        try:
+            out.append(f.decrypt(t.encode("utf-8")).decode("utf-8"))
+        except Exception as e:
+            if strict:
+                raise ValueError(f"Fernet decryption failed: {e}")
+            out.append(None)
+    return out
+
+
+def _decrypt_gcm_chunk(tokens: list, strict: bool) -> list:
+    aes = _memoized("aes_gcm_aead", lambda: AESGCM(get_aes_gcm_key()))
+    out = []
+    for t in tokens:
+        try:
+            raw = base64.b64decode(t[len("gcm1:"):])
+            # stored as iv | tag | ciphertext; AESGCM wants ciphertext | tag
+            out.append(aes.decrypt(raw[:12], raw[28:] + raw[12:28], None).decode("utf-8"))
+        except Exception as e:
+            if strict:
+                raise ValueError(f"AES-GCM decryption failed: {e}")
+            out.append(None)
+    return out
+
+
+def _encrypt_fernet_chunk(plaintexts: list) -> list:
+    f = get_fernet()
+    return [f.encrypt(p.encode("utf-8")).decode("utf-8") for p in plaintexts]
+
+
+def _run_batched(fn, items: list, workers: int) -> list:
+    if workers <= 1 or len(items) <= BATCH_CHUNK:
+        return fn(items)
+    chunks = [items[i:i + BATCH_CHUNK] for i in range(0, len(items), BATCH_CHUNK)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [x for part in pool.map(fn, chunks) for x in part]
+
+
+def decrypt_many(tokens, strict: bool = True, workers: int | None = None) -> list:
+    """Batch version of decrypt_any; results keep the input order.
+
+    With strict=False, tokens that fail to decrypt yield None instead of
+    raising ValueError.
+    """
+    workers = BATCH_WORKERS if workers is None else workers
+    tokens = [t.decode("utf-8", errors="ignore") if isinstance(t, bytes) else (t or "") for t in tokens]
+    out: list = [None] * len(tokens)
+    groups: dict = {"fernet": [], "gcm": []}
+    for i, t in enumerate(tokens):
+        if t.startswith("gAAAA"):
+            groups["fernet"].append(i)
+        elif t.startswith("gcm1:"):
+            groups["gcm"].append(i)
+        elif strict:
+            raise ValueError("Empty token cannot be decrypted" if not t else "Unknown encryption format.")
+
+    for kind, fn in (("fernet", _decrypt_fernet_chunk), ("gcm", _decrypt_gcm_chunk)):
+        idx = groups[kind]
+        if not idx:
+            continue
+        plain = _run_batched(lambda chunk: fn(chunk, strict), [tokens[i] for i in idx], workers)
+        for i, p in zip(idx, plain):
+            out[i] = p
+    return out
+
+
+def encrypt_many(plaintexts, workers: int | None = None) -> list:
+    """Batch version of encrypt_for_storage (Fernet); results keep the input order."""
+    workers = BATCH_WORKERS if workers is None else workers
+    try:
+        return _run_batched(_encrypt_fernet_chunk, list(plaintexts), workers)
     except Exception as e:
         raise ValueError(f"Fernet encryption failed: {e}")
 
@@ -156,20 +294,48 @@ def _argon2_key(
     )
 
 
-def encrypt_vault_payload(vault: dict, passphrase: str) -> dict:
-    if not passphrase:
-        raise ValueError("Passphrase required")
-
-    salt = get_random_bytes(16)
-    nonce = get_random_bytes(12)
-    kdf_params = {
+def _vault_kdf_params() -> dict:
+    return {
         "name": "argon2id",
         "time_cost": 3,
         "memory_cost": 65536,
         "parallelism": 2,
         "hash_len": 32,
     }
-    key = _argon2_key(passphrase, salt, **kdf_params)
+
+
+# Accepted Argon2 parameters when reading a file (inclusive ranges); the header
+# is not authenticated until the key exists, so it must not pick the cost.
+VAULT_KDF_LIMITS = {
+    "time_cost": (1, 10),
+    "memory_cost": (8 * 1024, 256 * 1024),   # KiB: 8 MiB .. 256 MiB
+    "parallelism": (1, 8),
+}
+
+
+def _vault_key(passphrase: str, salt: bytes, kdf: dict) -> bytes:
+    if not isinstance(kdf, dict) or kdf.get("name", "argon2id") != "argon2id":
+        raise ValueError("Unsupported vault KDF")
+    try:
+        params = {k: int(kdf.get(k, v)) for k, v in _vault_kdf_params().items() if k != "name"}
+    except (TypeError, ValueError):
+        raise ValueError("Invalid vault KDF parameters")
+    for name, (low, high) in VAULT_KDF_LIMITS.items():
+        if not low <= params[name] <= high:
+            raise ValueError(f"Vault KDF {name} out of range ({params[name]})")
+    if params["hash_len"] not in (16, 24, 32) or len(salt) < 8:
+        raise ValueError("Invalid vault KDF parameters")
+    return _argon2_key(passphrase, salt, **params)
+
+
+def encrypt_vault_payload(vault: dict, passphrase: str) -> dict:
+    if not passphrase:
+        raise ValueError("Passphrase required")
+
+    salt = get_random_bytes(16)
+    nonce = get_random_bytes(12)
+    kdf_params = _vault_kdf_params()
+    key = _vault_key(passphrase, salt, kdf_params)
 
     cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
     plaintext = json.dumps(vault, ensure_ascii=True).encode("utf-8")
@@ -198,14 +364,156 @@ def decrypt_vault_payload(blob: dict, passphrase: str) -> dict:
     tag = base64.b64decode(blob.get("tag", ""))
     ciphertext = base64.b64decode(blob.get("ciphertext", ""))
 
-    key = _argon2_key(
-        passphrase,
-        salt,
-        time_cost=int(kdf.get("time_cost", 3)),
-        memory_cost=int(kdf.get("memory_cost", 65536)),
-        parallelism=int(kdf.get("parallelism", 2)),
-        hash_len=int(kdf.get("hash_len", 32)),
-    )
+    key = _vault_key(passphrase, salt, kdf)
     cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
     plaintext = cipher.decrypt_and_verify(ciphertext, tag)
     return json.loads(plaintext.decode("utf-8"))
+
+
+# ============================================================
+# VAULT EXPORT v2 (streamed, chunked AES-GCM frames)
+# ============================================================
+# File layout:
+#   VAULT_V2_MAGIC | u32 header_len | header JSON (kdf, salt, nonce_prefix, chunk_size)
+#   frames: u8 flags | u32 len | ciphertext+tag   (flags bit 0 = last frame)
+# Plaintext is NDJSON: vault metadata line, then one line per password.
+# Each frame is its own AES-GCM message: nonce = nonce_prefix(8) || counter(4),
+# AAD = sha256(header) || counter || flags, so frames can't be reordered,
+# dropped, truncated or moved to another file.
+VAULT_V2_MAGIC = b"PGVAULT\x02"
+VAULT_CHUNK_SIZE = 64 * 1024
+_FRAME = struct.Struct(">BI")
+_FRAME_LAST = 0x01
+_TAG_LEN = 16
+_MAX_FRAME = 16 * 1024 * 1024
+
+
+def _frame_aad(header_digest: bytes, counter: int, flags: int) -> bytes:
+    return header_digest + struct.pack(">IB", counter, flags)
+
+
+def _frame_nonce(prefix: bytes, counter: int) -> bytes:
+    if counter > 0xFFFFFFFF:
+        raise ValueError("Vault too large for one container")
+    return prefix + struct.pack(">I", counter)
+
+
+def encrypt_vault_stream(out, meta: dict, records, passphrase: str, chunk_size: int = VAULT_CHUNK_SIZE) -> int:
+    """Write a v2 .pgvault to binary file `out`; returns the number of records.
+
+    `records` can be any iterable (e.g. APIClient.iter_export_vault), so memory
+    stays bounded by `chunk_size` whatever the vault size.
+    """
+    if not passphrase:
+        raise ValueError("Passphrase required")
+
+    salt = get_random_bytes(16)
+    prefix = get_random_bytes(8)
+    kdf_params = _vault_kdf_params()
+    header = json.dumps({
+        "format": "pgvault",
+        "version": 2,
+        "kdf": kdf_params,
+        "salt": base64.b64encode(salt).decode("utf-8"),
+        "nonce_prefix": base64.b64encode(prefix).decode("utf-8"),
+        "chunk_size": chunk_size,
+    }).encode("utf-8")
+    out.write(VAULT_V2_MAGIC + struct.pack(">I", len(header)) + header)
+
+    key = _vault_key(passphrase, salt, kdf_params)
+    digest = hashlib.sha256(header).digest()
+    counter = 0
+
+    def _emit(chunk: bytes, flags: int) -> None:
+        nonlocal counter
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_frame_nonce(prefix, counter))
+        cipher.update(_frame_aad(digest, counter, flags))
+        ct, tag = cipher.encrypt_and_digest(chunk)
+        out.write(_FRAME.pack(flags, len(ct) + _TAG_LEN) + ct + tag)
+        counter += 1
+
+    buf = bytearray(json.dumps(meta, ensure_ascii=True).encode("utf-8") + b"\n")
+    count = 0
+    for rec in records:
+        buf += json.dumps(rec, ensure_ascii=True).encode("utf-8") + b"\n"
+        count += 1
+        while len(buf) > chunk_size:
+            _emit(bytes(buf[:chunk_size]), 0)
+            del buf[:chunk_size]
+    _emit(bytes(buf), _FRAME_LAST)
+    return count
+
+
+def _read_exact(inp, n: int) -> bytes:
+    data = inp.read(n)
+    if len(data) != n:
+        raise ValueError("Vault file truncated")
+    return data
+
+
+def decrypt_vault_stream(inp, passphrase: str):
+    """Yield the metadata dict, then each password dict, from a v2 .pgvault.
+
+    `inp` must be positioned at the start of the file (magic included).
+    """
+    if not passphrase:
+        raise ValueError("Passphrase required")
+    if _read_exact(inp, len(VAULT_V2_MAGIC)) != VAULT_V2_MAGIC:
+        raise ValueError("Invalid vault format")
+    (header_len,) = struct.unpack(">I", _read_exact(inp, 4))
+    if header_len > 64 * 1024:
+        raise ValueError("Invalid vault format")
+    header = _read_exact(inp, header_len)
+    hdr = json.loads(header.decode("utf-8"))
+    if hdr.get("format") != "pgvault" or hdr.get("version") != 2:
+        raise ValueError("Invalid vault format")
+
+    key = _vault_key(passphrase, base64.b64decode(hdr.get("salt", "")), hdr.get("kdf") or {})
+    prefix = base64.b64decode(hdr.get("nonce_prefix", ""))
+    max_frame = min(_MAX_FRAME, int(hdr.get("chunk_size", VAULT_CHUNK_SIZE)) + _TAG_LEN)
+    digest = hashlib.sha256(header).digest()
+
+    pending = b""
+    counter = 0
+    while True:
+        flags, length = _FRAME.unpack(_read_exact(inp, _FRAME.size))
+        if length < _TAG_LEN or length > max_frame:
+            raise ValueError("Invalid vault frame")
+        frame = _read_exact(inp, length)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=_frame_nonce(prefix, counter))
+        cipher.update(_frame_aad(digest, counter, flags))
+        try:
+            chunk = cipher.decrypt_and_verify(frame[:-_TAG_LEN], frame[-_TAG_LEN:])
+        except ValueError:
+            raise ValueError("Vault decryption failed (wrong passphrase or corrupted file)")
+        counter += 1
+
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line:
+                yield json.loads(line.decode("utf-8"))
+        if flags & _FRAME_LAST:
+            break
+
+    if pending or inp.read(1):
+        raise ValueError("Invalid vault format")
+
+
+def read_vault_file(inp, passphrase: str):
+    """Yield the metadata dict, then each password dict, from a .pgvault opened in binary mode.
+
+    v2 (framed) files are decrypted frame by frame as records are consumed;
+    v1 (single JSON message) files can only be decrypted whole.
+    """
+    head = inp.read(len(VAULT_V2_MAGIC))
+    if head != VAULT_V2_MAGIC:
+        vault = decrypt_vault_payload(json.loads((head + inp.read()).decode("utf-8")), passphrase)
+        passwords = vault.pop("passwords", None) or []
+        if not isinstance(passwords, list):
+            raise ValueError("Invalid vault format")
+        yield vault
+        yield from passwords
+        return
+    inp.seek(0)
+    yield from decrypt_vault_stream(inp, passphrase)
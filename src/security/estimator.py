@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""Pattern-aware password strength estimator (zxcvbn-style).
+
+A password is matched against known patterns: ranked dictionary words
+(common passwords, names, words, plus the user's own inputs), including
+l33t and reversed forms, keyboard walks (azerty / qwerty / keypad),
+repeats, sequences, dates and years. A small dynamic program picks the
+cheapest way to cover the password with these matches and brute-force
+characters. The result is an estimated guess count (log10), scored 0-4.
+
+Dictionaries live in src/security/data/*.txt (one word per line, most
+common first); PG_DICTIONARY_DIR may add more lists. They are compiled on
+first use into {word: rank} hash maps plus a prefix set (the trie: substring
+scans stop as soon as no word starts with the current prefix). The compiled
+form is cached with marshal under ~/.password_guardian, so large lists are
+only parsed once.
+
+Scoring stays well under 1 ms per password, so it can run on every keystroke.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import math
+import os
+import re
+import string
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from functools import lru_cache
+from typing import Iterable, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".password_guardian")
+
+ESTIMATOR_SYMBOLS = string.punctuation
+# Guesses per character not explained by any pattern. Deliberately below the
+# real alphabet size, as in zxcvbn: attackers try likely characters first.
+BRUTEFORCE_CARDINALITY = 10
+# Only the first MAX_MATCH_LEN chars are scored (zxcvbn truncates too): the
+# matchers can then see the whole scored text, so a long tail of repeats is
+# never mistaken for brute-force characters, and cost stays bounded.
+MAX_MATCH_LEN = 64
+MIN_SUBMATCH_GUESSES = 50   # a multi-char match is never cheaper than this
+REF_YEAR = date.today().year
+
+# score thresholds on log10(guesses), as in zxcvbn
+_SCORE_LOG10 = (3, 6, 8, 10)
+LABELS = ("weak", "weak", "medium", "medium", "strong")
+
+_L33T = str.maketrans({
+    "4": "a", "@": "a", "8": "b", "(": "c", "{": "c", "3": "e", "6": "g", "9": "g",
+    "1": "i", "!": "i", "|": "l", "0": "o", "$": "s", "5": "s", "7": "t", "+": "t",
+    "2": "z", "%": "x",
+})
+
+
+# ============================================================
+# DICTIONARIES (lazy, compiled once)
+# ============================================================
+class _Dictionaries:
+    def __init__(self, ranked: dict[str, dict[str, int]]):
+        self.ranked = ranked
+        # word -> ((list name, rank), ...): one hash lookup per substring for all lists
+        self.lookup: dict[str, tuple] = {}
+        for name, words in ranked.items():
+            for w, rank in words.items():
+                self.lookup[w] = self.lookup.get(w, ()) + ((name, rank),)
+        self.prefixes = _prefixes(w for words in ranked.values() for w in words)
+        self.max_len = max((len(w) for words in ranked.values() for w in words), default=0)
+
+
+def _prefixes(words: Iterable[str]) -> set[str]:
+    return {w[:k] for w in words for k in range(1, len(w) + 1)}
+
+
+def _list_files() -> list[str]:
+    dirs = [DATA_DIR]
+    extra = os.getenv("PG_DICTIONARY_DIR")
+    if extra and os.path.isdir(extra):
+        dirs.append(extra)
+    files = []
+    for d in dirs:
+        files += sorted(os.path.join(d, f) for f in os.listdir(d) if f.endswith(".txt"))
+    return files
+
+
+def _parse(files: list[str]) -> dict[str, dict[str, int]]:
+    ranked: dict[str, dict[str, int]] = {}
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        words = ranked.setdefault(name, {})
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                w = line.strip().lower()
+                if w and not w.startswith("#") and w not in words:
+                    words[w] = len(words) + 1
+    return ranked
+
+
+def _compile() -> _Dictionaries:
+    files = _list_files()
+    sig = hashlib.sha1(
+        repr([(p, os.path.getmtime(p), os.path.getsize(p)) for p in files]).encode("utf-8")
+    ).hexdigest()[:16]
+    cache = os.path.join(CACHE_DIR, f"dictionaries-{sig}.marshal")
+    try:
+        with open(cache, "rb") as f:
+            return _Dictionaries(marshal.load(f))
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    ranked = _parse(files)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache + ".tmp", "wb") as f:
+            marshal.dump(ranked, f)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass  # read-only home: compile again next start
+    return _Dictionaries(ranked)
+
+
+_dicts: Optional[_Dictionaries] = None
+_dicts_lock = threading.Lock()
+
+
+def dictionaries() -> _Dictionaries:
+    global _dicts
+    if _dicts is None:
+        with _dicts_lock:
+            if _dicts is None:
+                _dicts = _compile()
+    return _dicts
+
+
+# ============================================================
+# KEYBOARD GRAPHS
+# ============================================================
+def _slanted(rows: list[str]) -> dict:
+    """Key positions for a staggered keyboard; each key is 'unshifted shifted'."""
+    pos, shifted = {}, set()
+    for r, row in enumerate(rows):
+        for c, key in enumerate(row.split(" ")):
+            pos.setdefault(key[0], (r, c))
+            if len(key) > 1:
+                pos.setdefault(key[1], (r, c))
+                shifted.add(key[1])
+    return {"pos": pos, "shifted": shifted,
+            "dirs": ((0, -1), (0, 1), (-1, 0), (-1, 1), (1, -1), (1, 0))}
+
+
+def _aligned(rows: list[str]) -> dict:
+    pos = {k: (r, c) for r, row in enumerate(rows) for c, k in enumerate(row.split(" ")) if k != "_"}
+    return {"pos": pos, "shifted": set(),
+            "dirs": tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)}
+
+
+_GRAPHS = {
+    "qwerty": _slanted([
+        "`~ 1! 2@ 3# 4$ 5% 6^ 7& 8* 9( 0) -_ =+",
+        "qQ wW eE rR tT yY uU iI oO pP [{ ]} \\|",
+        "aA sS dD fF gG hH jJ kK lL ;: '\"",
+        "zZ xX cC vV bB nN mM ,< .> /?",
+    ]),
+    "azerty": _slanted([
+        "² &1 é2 \"3 '4 (5 -6 è7 _8 ç9 à0 )° =+",
+        "aA zZ eE rR tT yY uU iI oO pP ^¨ $£",
+        "qQ sS dD fF gG hH jJ kK lL mM ù% *µ",
+        "<> wW xX cC vV bB nN ,? ;. :/ !§",
+    ]),
+    "keypad": _aligned([
+        "_ / * -",
+        "7 8 9 +",
+        "4 5 6 _",
+        "1 2 3 _",
+        "0 _ . _",
+    ]),
+}
+for _g in _GRAPHS.values():
+    _g["keys"] = len({p for p in _g["pos"].values()})
+    _g["degree"] = len(_g["dirs"]) * 0.75  # average, edge keys have fewer neighbours
+    # (key, next key) -> direction index, for the keys that are adjacent
+    _g["adj"] = {
+        (a, b): _g["dirs"].index((pb[0] - pa[0], pb[1] - pa[1]))
+        for a, pa in _g["pos"].items() for b, pb in _g["pos"].items()
+        if (pb[0] - pa[0], pb[1] - pa[1]) in _g["dirs"]
+    }
+
+
+# ============================================================
+# MATCHERS -> (i, j, pattern, log10 guesses, extra)
+# ============================================================
+def _upper_variations(word: str) -> float:
+    if word == word.lower():
+        return 1.0
+    if word.isupper() or (word[0].isupper() and word[1:].islower()) or (word[-1].isupper() and word[:-1].islower()):
+        return 2.0
+    upper = sum(1 for c in word if c.isupper())
+    lower = sum(1 for c in word if c.islower())
+    return float(sum(math.comb(upper + lower, k) for k in range(1, min(upper, lower) + 1)))
+
+
+def _dictionary_matches(pw: str, user_words: dict[str, int]) -> list:
+    d = dictionaries()
+    out = []
+    n = len(pw)
+    lower = pw.lower()
+    variants = [(lower, False, False)]
+    unleet = lower.translate(_L33T)
+    if unleet != lower:
+        variants.append((unleet, True, False))
+    if lower[::-1] != lower:
+        variants.append((lower[::-1], False, True))
+
+    max_len = max([d.max_len, *map(len, user_words)])
+    user_prefixes = _prefixes(user_words)
+    for text, leet, reverse in variants:
+        for i in range(n):
+            for j in range(i + 1, min(n, i + max_len) + 1):
+                sub = text[i:j]
+                if sub not in d.prefixes and sub not in user_prefixes:
+                    break
+                if j - i < 3:
+                    continue
+                hits = d.lookup.get(sub, ())
+                if sub in user_words:
+                    hits = (("user_inputs", user_words[sub]), *hits)
+                for name, rank in hits:
+                    a, b = (n - j, n - i - 1) if reverse else (i, j - 1)
+                    token = pw[a:b + 1]
+                    guesses = rank * _upper_variations(token)
+                    if leet:
+                        subs = sum(1 for x, y in zip(token.lower(), sub) if x != y)
+                        if not subs:
+                            continue
+                        guesses *= 2 ** min(subs, 8)
+                    if reverse:
+                        guesses *= 2
+                    out.append((a, b, "dictionary", math.log10(max(guesses, 1)),
+                                {"dictionary": name, "leet": leet, "reversed": reverse, "rank": rank}))
+    return out
+
+
+@lru_cache(maxsize=1024)
+def _walk_guesses(gname: str, length: int, turns: int) -> float:
+    s, deg = _GRAPHS[gname]["keys"], _GRAPHS[gname]["degree"]
+    guesses = 0.0
+    for k in range(2, length + 1):
+        for t in range(1, min(turns, k - 1) + 1):
+            guesses += math.comb(k - 1, t - 1) * s * deg ** t
+    return guesses
+
+
+def _spatial_matches(pw: str) -> list:
+    out = []
+    n = len(pw)
+    for gname, g in _GRAPHS.items():
+        adj = g["adj"]
+        i = 0
+        while i < n - 2:
+            j, turns, last_dir = i + 1, 0, None
+            while j < n:
+                d = adj.get((pw[j - 1], pw[j]))
+                if d is None:
+                    break
+                if d != last_dir:
+                    turns += 1
+                    last_dir = d
+                j += 1
+            length = j - i
+            if length >= 3:
+                guesses = _walk_guesses(gname, length, turns)
+                token = pw[i:j]
+                shifted = sum(1 for c in token if c in g["shifted"])
+                if shifted:
+                    unshifted = length - shifted
+                    guesses *= 2 if not unshifted else sum(
+                        math.comb(length, k) for k in range(1, min(shifted, unshifted) + 1))
+                out.append((i, j - 1, "spatial", math.log10(max(guesses, 1)), {"graph": gname}))
+                i = j - 1
+            else:
+                i += 1
+    return out
+
+
+def _sequence_matches(pw: str) -> list:
+    out = []
+    n = len(pw)
+    i = 0
+    while i < n - 2:
+        delta = ord(pw[i + 1]) - ord(pw[i])
+        j = i + 1
+        if 0 < abs(delta) <= 5:
+            while j + 1 < n and ord(pw[j + 1]) - ord(pw[j]) == delta:
+                j += 1
+        if j - i + 1 >= 3:
+            first = pw[i]
+            if first in "aAzZ019":
+                base = 4
+            elif first.isdigit():
+                base = 10
+            elif first.islower() or first.isupper():
+                base = 26
+            else:
+                base = 26 * 2 + 10 + len(ESTIMATOR_SYMBOLS)
+            guesses = base * (j - i + 1) * (2 if delta < 0 else 1)
+            out.append((i, j, "sequence", math.log10(guesses), {}))
+            i = j
+        else:
+            i += 1
+    return out
+
+
+_REPEAT_GREEDY = re.compile(r"(.+)\1+")
+_REPEAT_LAZY = re.compile(r"(.+?)\1+")
+
+
+def _repeat_matches(pw: str, user_words: dict[str, int]) -> list:
+    out = []
+    pos = 0
+    while pos < len(pw):
+        g = _REPEAT_GREEDY.search(pw, pos)
+        if not g:
+            break
+        lz = _REPEAT_LAZY.search(pw, pos)
+        if len(g.group(0)) > len(lz.group(0)):
+            m, base = g, _REPEAT_LAZY.fullmatch(g.group(0)).group(1)
+        else:
+            m, base = lz, lz.group(1)
+        count = len(m.group(0)) // len(base)
+        base_log = _guesses_log10(base, user_words)[0] if len(base) > 1 else math.log10(BRUTEFORCE_CARDINALITY)
+        out.append((m.start(), m.end() - 1, "repeat", base_log + math.log10(count), {"base": base}))
+        pos = m.end()
+    return out
+
+
+_YEAR = re.compile(r"(?<!\d)(19\d\d|20\d\d)(?!\d)")
+_DATE_SEP = re.compile(r"(?<!\d)(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})(?!\d)")
+_DATE_RUN = re.compile(r"(?<!\d)\d{4,8}(?!\d)")
+
+
+def _valid_date(a: int, b: int, c: int) -> Optional[int]:
+    """Year of a plausible (d, m, y) / (m, d, y) / (y, m, d) reading, else None."""
+    for day, month, year in ((a, b, c), (b, a, c), (c, b, a)):
+        if year < 100:
+            year += 2000 if year <= REF_YEAR % 100 + 5 else 1900
+        if 1 <= day <= 31 and 1 <= month <= 12 and 1900 <= year <= REF_YEAR + 30:
+            return year
+    return None
+
+
+def _date_matches(pw: str) -> list:
+    out = []
+    for m in _YEAR.finditer(pw):
+        span = max(abs(int(m.group(1)) - REF_YEAR), 20)
+        out.append((m.start(), m.end() - 1, "date", math.log10(span), {"year": True}))
+    for m in _DATE_SEP.finditer(pw):
+        year = _valid_date(int(m.group(1)), int(m.group(3)), int(m.group(4)))
+        if year is not None:
+            g = 365 * max(abs(year - REF_YEAR), 20) * 4
+            out.append((m.start(), m.end() - 1, "date", math.log10(g), {}))
+    for m in _DATE_RUN.finditer(pw):
+        s = m.group(0)
+        best = None
+        for k in range(1, len(s) - 1):
+            for k2 in range(k + 1, len(s)):
+                parts = (s[:k], s[k:k2], s[k2:])
+                if any(len(p) > 4 or len(p) == 3 for p in parts):
+                    continue
+                year = _valid_date(*(int(p) for p in parts))
+                if year is not None:
+                    g = 365 * max(abs(year - REF_YEAR), 20)
+                    best = g if best is None else min(best, g)
+        if best is not None:
+            out.append((m.start(), m.end() - 1, "date", math.log10(best), {}))
+    return out
+
+
+# ============================================================
+# ESTIMATE
+# ============================================================
+def _guesses_log10(pw: str, user_words: dict[str, int]) -> tuple[float, list]:
+    """Cheapest cover of `pw` by matches + brute force: (log10 guesses, matches used)."""
+    n = len(pw)
+    matches = (
+        _dictionary_matches(pw, user_words) + _spatial_matches(pw) + _sequence_matches(pw)
+        + _repeat_matches(pw, user_words) + _date_matches(pw)
+    )
+    by_end: dict[int, list] = {}
+    for m in matches:
+        by_end.setdefault(m[1], []).append(m)
+
+    bf = math.log10(BRUTEFORCE_CARDINALITY)
+    floor = math.log10(MIN_SUBMATCH_GUESSES)
+    best = [0.0] * (n + 1)
+    back: list = [None] * (n + 1)
+    for k in range(1, n + 1):
+        best[k], back[k] = best[k - 1] + bf, None
+        for m in by_end.get(k - 1, ()):
+            cost = best[m[0]] + max(m[3], floor)
+            if cost < best[k]:
+                best[k], back[k] = cost, m
+    used = []
+    k = n
+    while k > 0:
+        m = back[k]
+        if m is None:
+            k -= 1
+        else:
+            used.append(m)
+            k = m[0]
+    used.reverse()
+    # each additional pattern multiplies the attacker's search (zxcvbn's l! term)
+    return best[n] + math.log10(math.factorial(max(len(used), 1))), used
+
+
+@dataclass
+class Estimate:
+    guesses_log10: float
+    score: int                  # 0..4
+    label: str                  # weak / medium / strong
+    feedback: list[str] = field(default_factory=list)
+    patterns: list[str] = field(default_factory=list)
+
+
+_FEEDBACK = {
+    "passwords": "Mot de passe très courant",
+    "names": "Évitez les noms et prénoms",
+    "words": "Un mot du dictionnaire se devine vite",
+    "user_inputs": "Évitez votre nom ou votre email",
+    "spatial": "Évitez les suites de touches du clavier (azerty, 1234…)",
+    "repeat": "Évitez les répétitions (aaa, abcabc)",
+    "sequence": "Évitez les suites (abc, 6789)",
+    "date": "Évitez les dates et les années",
+    "leet": "Les substitutions (@ pour a, 0 pour o) n'aident pas beaucoup",
+}
+
+
+def _user_words(user_inputs: Iterable[str]) -> dict[str, int]:
+    words: dict[str, int] = {}
+    for s in user_inputs or ():
+        for part in re.split(r"[\s@._+-]+", str(s).lower()):
+            if len(part) >= 3 and part not in words:
+                words[part] = len(words) + 1
+    return words
+
+
+def estimate_strength(password: str, user_inputs: Iterable[str] = ()) -> Estimate:
+    """Estimate `password`; `user_inputs` (email, username...) count as rank-1 words.
+
+    Only the first MAX_MATCH_LEN characters are scored.
+    """
+    if not password:
+        return Estimate(0.0, 0, "weak", ["Entrez un mot de passe"])
+    log10, used = _guesses_log10(password[:MAX_MATCH_LEN], _user_words(user_inputs))
+    score = sum(1 for t in _SCORE_LOG10 if log10 >= t)
+
+    feedback, patterns = [], []
+    for m in used:
+        key = m[4].get("dictionary") if m[2] == "dictionary" else m[2]
+        patterns.append(key)
+        msg = _FEEDBACK.get(key)
+        if msg and msg not in feedback:
+            feedback.append(msg)
+        if m[4].get("leet") and _FEEDBACK["leet"] not in feedback:
+            feedback.append(_FEEDBACK["leet"])
+    if score < 3 and len(password) < 12:
+        feedback.append("Utilisez au moins 12 caractères")
+    if score >= 4:
+        feedback = ["Mot de passe fort !"]
+    elif not feedback:
+        feedback = ["Ajoutez des mots peu courants ou des caractères variés"]
+    return Estimate(log10, score, LABELS[score], feedback, patterns)
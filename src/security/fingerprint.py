@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Keyed password fingerprints for reuse detection.
+
+Ciphertexts use random IVs, so two identical passwords never compare
+equal. On write, the backend stores
+
+    fingerprint = HMAC-SHA256(user_key, plaintext)
+    user_key    = HMAC-SHA256(fingerprint secret, "user:<id>")
+
+Equal passwords of one user share a fingerprint, which makes reuse a
+GROUP BY on the (user_id, fingerprint) index. Keying per user means the
+same password in two accounts can't be correlated. Re-encrypting a row
+doesn't change its fingerprint.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, func, select, update
+
+from src.security.encryption import decrypt_many, get_fingerprint_key
+
+
+def _user_key(user_id: int) -> bytes:
+    return hmac.new(get_fingerprint_key(), f"user:{int(user_id)}".encode("utf-8"), hashlib.sha256).digest()
+
+
+def fingerprints_many(user_id: int, tokens: Iterable[str]) -> list[str]:
+    """Fingerprints for stored values of one user (batch-decrypted).
+
+    Values that aren't recognised ciphertexts (legacy plaintext rows) are
+    fingerprinted as they are.
+    """
+    tokens = [t or "" for t in tokens]
+    key = _user_key(user_id)
+    plain = decrypt_many(tokens, strict=False)
+    return [
+        hmac.new(key, (p if p is not None else t).encode("utf-8"), hashlib.sha256).hexdigest()
+        for t, p in zip(tokens, plain)
+    ]
+
+
+def password_fingerprint(user_id: int, token: str) -> str:
+    return fingerprints_many(user_id, [token])[0]
+
+
+def backfill_fingerprints(user_id: Optional[int] = None, batch_size: int = 500) -> int:
+    """Fill missing fingerprints in id-ordered batches; returns the number of rows updated."""
+    from database.engine import SessionLocal
+    from database.models import Password
+
+    table = Password.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        # not a user edit: keep last_updated
+        .values(fingerprint=bindparam("_fp"), last_updated=table.c.last_updated)
+    )
+    done = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as s:
+            q = (
+                select(Password.id, Password.user_id, Password.encrypted_password)
+                .where(Password.fingerprint.is_(None), Password.id > last_id)
+                .order_by(Password.id)
+                .limit(batch_size)
+            )
+            if user_id is not None:
+                q = q.where(Password.user_id == int(user_id))
+            rows = s.execute(q).all()
+            if not rows:
+                return done
+            by_user: dict[int, list] = {}
+            for r in rows:
+                by_user.setdefault(r.user_id, []).append(r)
+            params = []
+            for uid, urows in by_user.items():
+                fps = fingerprints_many(uid, [r.encrypted_password for r in urows])
+                params += [{"_id": r.id, "_fp": fp} for r, fp in zip(urows, fps)]
+            s.execute(stmt, params)
+            s.commit()
+            done += len(params)
+            last_id = rows[-1].id
+
+
+def reused_fingerprints(user_id: int):
+    """SELECT of the fingerprints shared by more than one active password of the user."""
+    from database.models import Password
+
+    return (
+        select(Password.fingerprint)
+        .where(Password.user_id == user_id, Password.trashed_at.is_(None), Password.fingerprint.is_not(None))
+        .group_by(Password.fingerprint)
+        .having(func.count() > 1)
+    )
+
+
+def reuse_counts(db, user_id: int) -> tuple[int, int]:
+    """(active passwords sharing a value with another one, number of such values)."""
+    dup = reused_fingerprints(user_id).add_columns(func.count().label("n")).subquery()
+    reused, groups = db.execute(select(func.coalesce(func.sum(dup.c.n), 0), func.count()).select_from(dup)).one()
+    return int(reused), int(groups)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache for HIBP k-anonymity range responses.
+
+A vault scan asks for the same 5-hex-char prefixes over and over; ranges are
+kept zlib-compressed in a small SQLite file with a TTL and a size-bounded
+LRU. Concurrent lookups of the same prefix share a single HTTP request.
+
+Config (env):
+    HIBP_CACHE          "0" disables the cache (default on)
+    HIBP_CACHE_PATH     default ~/.password_guardian/hibp_ranges.db
+    HIBP_CACHE_TTL      seconds, default 604800 (7 days)
+    HIBP_CACHE_MAX_MB   default 64
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Optional
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".password_guardian", "hibp_ranges.db")
+
+
+class _InFlight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class RangeCache:
+    """Thread-safe range cache; `get_or_fetch` is the only call most code needs."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = 7 * 86400,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _InFlight] = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ranges ("
+            " prefix TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_ranges_last_used ON ranges(last_used)")
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM ranges").fetchone()[0]
+
+    def get(self, prefix: str) -> Optional[str]:
+        """Cached range body, or None if absent/expired."""
+        prefix = prefix.upper()
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, fetched_at FROM ranges WHERE prefix = ?", (prefix,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            self._db.execute("UPDATE ranges SET last_used = ? WHERE prefix = ?", (now, prefix))
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, prefix: str, body: str) -> None:
+        prefix = prefix.upper()
+        blob = zlib.compress(body.encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM ranges WHERE prefix = ?", (prefix,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO ranges (prefix, body, size, fetched_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (prefix, blob, len(blob), now, now),
+            )
+            self._size += len(blob) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Drop least-recently-used ranges down to 90% of the budget.
+        target = int(self.max_bytes * 0.9)
+        cur = self._db.execute("SELECT prefix, size FROM ranges ORDER BY last_used")
+        doomed = []
+        for prefix, size in cur:
+            if self._size <= target:
+                break
+            doomed.append((prefix,))
+            self._size -= size
+        cur.close()
+        self._db.executemany("DELETE FROM ranges WHERE prefix = ?", doomed)
+
+    def get_or_fetch(self, prefix: str, fetch: Callable[[str], Optional[str]]) -> Optional[str]:
+        """Cached body, else `fetch(prefix)`; only one fetch per prefix runs at a time.
+
+        A None from `fetch` (HTTP error) is returned but not cached.
+        """
+        prefix = prefix.upper()
+        body = self.get(prefix)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        with self._lock:
+            waiter = self._inflight.get(prefix)
+            owner = waiter is None
+            if owner:
+                waiter = self._inflight[prefix] = _InFlight()
+        if not owner:
+            self.coalesced += 1
+            waiter.event.wait()
+            if waiter.error is not None:
+                raise waiter.error
+            return waiter.value
+
+        self.misses += 1
+        try:
+            body = fetch(prefix)
+            if body is not None:
+                self.put(prefix, body)
+            waiter.value = body
+            return body
+        except BaseException as e:
+            waiter.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(prefix, None)
+            waiter.event.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM ranges")
+            self._size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_default_cache: Optional[RangeCache] = None
+_default_lock = threading.Lock()
+
+
+def get_range_cache() -> Optional[RangeCache]:
+    """Process-wide cache from env config (None when HIBP_CACHE=0 or unusable)."""
+    global _default_cache
+    if os.getenv("HIBP_CACHE", "1").strip().lower() not in {"1", "true", "yes", "on"}:
+        return None
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                try:
+                    _default_cache = RangeCache(
+                        os.getenv("HIBP_CACHE_PATH", DEFAULT_PATH),
+                        ttl=float(os.getenv("HIBP_CACHE_TTL", 7 * 86400)),
+                        max_bytes=int(float(os.getenv("HIBP_CACHE_MAX_MB", 64)) * 1024 * 1024),
+                    )
+                except (OSError, sqlite3.Error):
+                    # A read-only home dir should not break breach checks.
+                    return None
+    return _default_cache
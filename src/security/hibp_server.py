@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the HIBP range API (tests, offline demos).
+
+Serves `GET /range/<prefix>` in the real API's `SUFFIX:COUNT` format from
+either a list of passwords or a compiled breach index. Point the client at
+it with HIBP_RANGE_URL=http://127.0.0.1:<port>/range/{prefix}.
+
+    with HIBPStandIn(passwords={"password": 42}) as srv:
+        HIBPRangeSource(url=srv.url).count(...)
+
+CLI:
+    python -m src.security.hibp_server breach.idx --port 8089
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Mapping, Optional
+
+_RANGE_RE = re.compile(r"^/range/([0-9A-Fa-f]{5})$")
+
+
+class HIBPStandIn:
+    """Threaded HTTP server on 127.0.0.1; counts requests per prefix."""
+
+    def __init__(self, passwords: Optional[Mapping[str, int]] = None,
+                 index_path: Optional[str] = None, port: int = 0, delay: float = 0.0):
+        self._ranges: dict[str, list[str]] = defaultdict(list)
+        for pw, n in (passwords or {}).items():
+            h = hashlib.sha1(pw.encode("utf-8")).hexdigest().upper()
+            self._ranges[h[:5]].append(f"{h[5:]}:{n}")
+        self._index = None
+        if index_path:
+            from src.security.breach_index import BreachIndex
+            self._index = BreachIndex(index_path)
+        self.delay = delay
+        self.requests: dict[str, int] = defaultdict(int)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/range/{{prefix}}"
+
+    def body(self, prefix: str) -> str:
+        prefix = prefix.upper()
+        lines = list(self._ranges.get(prefix, ()))
+        if self._index is not None:
+            lines += [f"{s}:{n}" for s, n in self._index.range(prefix)]
+        return "\r\n".join(lines)
+
+    def _handler(self):
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                m = _RANGE_RE.match(self.path)
+                if not m:
+                    self.send_error(400, "The hash prefix was not in a valid format")
+                    return
+                prefix = m.group(1).upper()
+                srv.requests[prefix] += 1
+                if srv.delay:
+                    threading.Event().wait(srv.delay)
+                data = srv.body(prefix).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "HIBPStandIn":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+        if self._index is not None:
+            self._index.close()
+
+    def __enter__(self) -> "HIBPStandIn":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Local stand-in for the HIBP range API.")
+    ap.add_argument("index", help="breach index built with src.security.breach_index")
+    ap.add_argument("--port", type=int, default=8089)
+    args = ap.parse_args(argv)
+    srv = HIBPStandIn(index_path=args.index, port=args.port)
+    print(f"Serving {srv.url}  (Ctrl+C to stop)")
+    try:
+        srv._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
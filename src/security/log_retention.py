@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""Retention for activity_logs: per-action TTLs, daily roll-ups, NDJSON.gz archives.
+
+TTLs (days) are matched on the longest action prefix, e.g.
+LOG_RETENTION_RULES="password:reveal=30,password=180,login=90"; anything
+unmatched keeps LOG_RETENTION_DAYS (365).
+
+The rules split the table into buckets, one per rule plus one per
+action_type for what its rules leave over (see _buckets). Each bucket has
+its own horizon and is walked in (created_at, id) order through the
+(action_type, created_at, id) index, so a run only reads rows that are
+actually expired, never the ones a longer TTL still keeps. Rows go in small
+batches with their own short transaction, so the live table is never
+locked for long. For every batch a run:
+
+1. deletes them by id, and starts the batch over if fewer rows were
+   deleted than read (a concurrent run took them),
+2. adds them to `activity_daily` (user_id, action_type, day) counters,
+3. stages them in a gzip'd NDJSON segment, on disk,
+
+then commits; a batch whose commit fails is cut from the segment again. A
+day's total is therefore activity_daily + the rows still live, and a row
+is archived once, by the run that deleted it.
+
+Archives go to LOG_ARCHIVE_DIR (~/.password_guardian/log_archive), one
+segment per run, rotated every `segment_rows` rows.
+
+CLI:
+    python -m src.security.log_retention run [--dry-run] [--no-archive] [--batch 500]
+    python -m src.security.log_retention rules
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, not_, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+DEFAULT_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "365"))
+# Frequent, low-value events are kept for less time.
+DEFAULT_RULES = {"password:reveal": 90, "password:favorite": 90}
+ARCHIVE_DIR = os.getenv(
+    "LOG_ARCHIVE_DIR",
+    os.path.join(os.path.expanduser("~"), ".password_guardian", "log_archive"),
+)
+MAX_CONFLICTS = 5
+
+
+def retention_rules(spec: Optional[str] = None) -> dict[str, int]:
+    """Prefix -> TTL in days: DEFAULT_RULES overridden by LOG_RETENTION_RULES (or `spec`)."""
+    rules = dict(DEFAULT_RULES)
+    spec = os.getenv("LOG_RETENTION_RULES", "") if spec is None else spec
+    for part in spec.split(","):
+        if "=" in part:
+            key, days = part.split("=", 1)
+            rules[key.strip()] = int(days)
+    return rules
+
+
+def ttl_days(action: str, rules: dict[str, int], default: int = DEFAULT_DAYS) -> int:
+    best, best_len = default, -1
+    for prefix, days in rules.items():
+        if (action == prefix or action.startswith(prefix + ":")) and len(prefix) > best_len:
+            best, best_len = days, len(prefix)
+    return best
+
+
+@dataclass
+class RetentionResult:
+    scanned: int = 0
+    deleted: int = 0
+    archived: int = 0
+    conflicts: int = 0      # batches lost to a concurrent run and read again
+    segments: list = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _SegmentWriter:
+    """gzip'd NDJSON segments, one gzip member per batch.
+
+    A batch is staged (written and fsync'd) before its transaction commits,
+    then kept with commit() or cut off again with discard(), so a batch that
+    is rolled back and read again is never archived twice. Segments rotate
+    at the first batch boundary past `max_rows` rows.
+    """
+
+    def __init__(self, directory: str, max_rows: int):
+        self.directory = directory
+        self.max_rows = max_rows
+        self.paths: list[str] = []
+        self._raw = None
+        self._tmp = None
+        self._rows = 0
+        self._mark = None      # file offset before the staged batch
+        self._staged = 0
+
+    def stage(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if self._raw is None:
+            self._open(rows[0])
+        self._mark = self._raw.tell()
+        lines = b"".join((json.dumps(row, separators=(",", ":")) + "\n").encode("utf-8") for row in rows)
+        self._raw.write(gzip.compress(lines))
+        # Before the rows are deleted: they must be on disk first.
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._staged = len(rows)
+
+    def commit(self) -> None:
+        self._rows += self._staged
+        self._mark, self._staged = None, 0
+        if self._rows >= self.max_rows:
+            self.close()
+
+    def discard(self) -> None:
+        if self._mark is None:
+            return
+        self._raw.truncate(self._mark)
+        self._raw.seek(self._mark)
+        os.fsync(self._raw.fileno())
+        self._mark, self._staged = None, 0
+
+    def _open(self, first: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"activity-{stamp}-{first['id']}.ndjson.gz")
+        self._tmp = path + ".partial"
+        self._raw = open(self._tmp, "wb")
+        self._rows = 0
+
+    def close(self) -> None:
+        if self._raw is None:
+            return
+        self.discard()
+        empty = self._raw.tell() == 0
+        self._raw.close()
+        self._raw = None
+        if empty:
+            os.remove(self._tmp)
+            return
+        final = self._tmp[: -len(".partial")]
+        os.replace(self._tmp, final)
+        self.paths.append(final)
+
+
+def _rollup(s, counts: Counter) -> None:
+    from database.models import ActivityDaily
+
+    for (uid, atype, day), n in counts.items():
+        key = (ActivityDaily.user_id == uid, ActivityDaily.action_type == atype, ActivityDaily.day == day)
+        bump = update(ActivityDaily).where(*key).values(count=ActivityDaily.count + n)
+        if s.execute(bump).rowcount:
+            continue
+        try:
+            # Another run may insert the same day concurrently: fall back to the update.
+            with s.begin_nested():
+                s.execute(insert(ActivityDaily).values(user_id=uid, action_type=atype, day=day, count=n))
+        except IntegrityError:
+            s.execute(bump)
+
+
+def _purge(s, rows: list, writer: Optional[_SegmentWriter]) -> bool:
+    """Delete, roll up and archive one batch in one transaction.
+
+    Returns False (rolled back) when another run got to some of the rows
+    first, or the commit failed: only rows this transaction actually deleted
+    are counted and archived.
+    """
+    from database.models import ActivityLog
+
+    from src.security.audit import action_type
+
+    counts = Counter((r.user_id, r.action_type or action_type(r.action or ""), r.created_at.date()) for r in rows)
+    records = [
+        {
+            "id": r.id,
+            "user_id": r.user_id,
+            "action": r.action,
+            "action_type": r.action_type,
+            "details": r.details,
+            "ip_address": r.ip_address,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in rows
+    ]
+    try:
+        gone = s.execute(
+            delete(ActivityLog).where(ActivityLog.id.in_([r["id"] for r in records]))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if gone != len(records):
+            s.rollback()
+            return False
+        _rollup(s, counts)
+        if writer is not None:
+            # Last step before the commit, on disk before it.
+            writer.stage(records)
+        s.commit()
+    except OperationalError:
+        # SQLite busy, or a stale WAL snapshot: another writer committed first.
+        s.rollback()
+        if writer is not None:
+            writer.discard()
+        return False
+    except Exception:
+        s.rollback()
+        if writer is not None:
+            writer.discard()
+        raise
+    if writer is not None:
+        writer.commit()
+    return True
+
+
+def _buckets(rules: dict[str, int], default_days: int) -> list[tuple[tuple, int]]:
+    """(where clauses, TTL days) pairs that split activity_logs by applicable TTL.
+
+    One bucket per rule, minus the rows a longer prefix of the same
+    action_type claims; one per ruled action_type for its unmatched rows;
+    one for every other action_type. Legacy rows without an action_type
+    get the shortest horizon and are checked one by one.
+    """
+    from database.models import ActivityLog
+
+    from src.security.audit import action_type
+
+    def matches(prefix):
+        return or_(ActivityLog.action == prefix, ActivityLog.action.startswith(prefix + ":", autoescape=True))
+
+    by_type: dict[str, list] = {}
+    for prefix, days in rules.items():
+        by_type.setdefault(action_type(prefix), []).append((prefix, days))
+    buckets = []
+    for atype, group in by_type.items():
+        claimed = []
+        for prefix, days in sorted(group, key=lambda g: -len(g[0])):  # longest prefix wins
+            buckets.append(((ActivityLog.action_type == atype, matches(prefix), *map(not_, claimed)), days))
+            claimed.append(matches(prefix))
+        if atype not in dict(group):
+            buckets.append(((ActivityLog.action_type == atype, *map(not_, claimed)), default_days))
+    buckets.append(((ActivityLog.action_type.notin_(list(by_type)),), default_days))
+    buckets.append(((ActivityLog.action_type.is_(None),), min([default_days, *rules.values()])))
+    return buckets
+
+
+def run_retention(
+    now: Optional[datetime] = None,
+    rules: Optional[dict[str, int]] = None,
+    default_days: int = DEFAULT_DAYS,
+    batch_size: int = 500,
+    archive: bool = True,
+    archive_dir: str = ARCHIVE_DIR,
+    segment_rows: int = 100_000,
+    pause: float = 0.0,
+    dry_run: bool = False,
+) -> RetentionResult:
+    """Archive, roll up and delete expired activity_logs rows.
+
+    Safe to run concurrently: a batch that loses a race is read again; after
+    MAX_CONFLICTS losses in a row the run stops and leaves the rest to the
+    other one.
+    """
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+
+    now = now or datetime.utcnow()
+    rules = retention_rules() if rules is None else rules
+    writer = _SegmentWriter(archive_dir, segment_rows) if archive and not dry_run else None
+    result = RetentionResult()
+    try:
+        for where, days in _buckets(rules, default_days):
+            horizon = now - timedelta(days=days)
+            cursor = None
+            conflicts = 0
+            while True:
+                with SessionLocal() as s:
+                    q = (
+                        select(ActivityLog)
+                        .where(*where, ActivityLog.created_at < horizon)
+                        .order_by(ActivityLog.created_at, ActivityLog.id)
+                        .limit(batch_size)
+                    )
+                    if cursor is not None:
+                        q = q.where(tuple_(ActivityLog.created_at, ActivityLog.id) > tuple_(*cursor))
+                    rows = s.execute(q).scalars().all()
+                    if not rows:
+                        break
+                    last = (rows[-1].created_at, rows[-1].id)  # rows expire on commit
+
+                    expired = [
+                        r for r in rows
+                        if r.created_at < now - timedelta(days=ttl_days(r.action or "", rules, default_days))
+                    ]
+                    if expired and not dry_run:
+                        if not _purge(s, expired, writer):
+                            conflicts += 1
+                            result.conflicts += 1
+                            if conflicts >= MAX_CONFLICTS:
+                                return result
+                            time.sleep(0.05 * conflicts)
+                            continue  # same cursor: read the batch again
+                        if writer is not None:
+                            result.archived += len(expired)
+                    conflicts = 0
+                    cursor = last
+                    result.scanned += len(rows)
+                    result.deleted += len(expired)
+                if pause:
+                    # Let the app's writers in between batches.
+                    time.sleep(pause)
+    finally:
+        if writer is not None:
+            writer.close()
+            result.segments = writer.paths
+    return result
+
+
+def retention_loop(interval_hours: float = 24.0) -> None:
+    """Background thread body for the backend: one run per interval."""
+    while True:
+        try:
+            res = run_retention(pause=0.05)
+            if res.deleted:
+                print(f"🧹 activity_logs retention: {res.deleted} row(s) archived/deleted")
+        except Exception as e:
+            print(f"⚠️ activity_logs retention failed: {e}")
+        time.sleep(interval_hours * 3600)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="activity_logs retention.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="archive, roll up and delete expired rows")
+    r.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    r.add_argument("--no-archive", action="store_true", help="delete without writing NDJSON segments")
+    r.add_argument("--batch", type=int, default=500)
+    r.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    sub.add_parser("rules", help="print the TTL rules")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "rules":
+        for prefix, days in sorted(retention_rules().items()):
+            print(f"{prefix:>20}: {days} days")
+        print(f"{'(default)':>20}: {DEFAULT_DAYS} days")
+        return
+    res = run_retention(
+        batch_size=args.batch, archive=not args.no_archive, archive_dir=args.archive_dir, dry_run=args.dry_run,
+    )
+    verb = "would be deleted" if args.dry_run else "deleted"
+    print(f"✅ scanned {res.scanned}, {res.deleted} {verb}, {res.archived} archived")
+    for path in res.segments:
+        print(f"   {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,22 @@
 Uni-project "pro" additions:
 - Password generator using `secrets`.
 - Strength scoring + entropy estimate (easy to justify in a report).
+- Breach check with pluggable sources (HIBP range API or offline index).
 """
 
 from __future__ import annotations
 
-import math
+import os
 import secrets
 import string
 import hashlib
+import threading
 import requests
 from dataclasses import dataclass
+from typing import Iterable, Optional, Protocol
+
+from src.security.estimator import estimate_strength
+from src.security.strength import SYMBOLS, entropy_from_profile, profile
 
 
 @dataclass(frozen=True)
@@ -25,9 +31,6 @@ class GeneratorOptions:
     use_symbols: bool = True
 
 
-SYMBOLS = "!@#$%^&*()-_=+[]{};:,.<>/"
-
-
 def generate_password(opts: GeneratorOptions | None = None) -> str:
     if opts is None:
         opts = GeneratorOptions()
@@ -58,64 +61,142 @@ def estimate_entropy_bits(password: str) -> float:
     """Rough entropy estimate based on character set size and length."""
     if not password:
         return 0.0
-
-    charset = 0
-    if any(c.islower() for c in password):
-        charset += 26
-    if any(c.isupper() for c in password):
-        charset += 26
-    if any(c.isdigit() for c in password):
-        charset += 10
-    if any(c in SYMBOLS for c in password):
-        charset += len(SYMBOLS)
-
-    if charset <= 1:
-        return 0.0
-
-    return len(password) * math.log2(charset)
+    return entropy_from_profile(profile(password))
 
 
 def strength_label(password: str) -> str:
-    """Simple, explainable scoring → weak/medium/strong."""
-    score = 0
-    if len(password) >= 8:
-        score += 1
-    if len(password) >= 12:
-        score += 1
-    if len(password) >= 16:
-        score += 1
-    if any(c.islower() for c in password):
-        score += 1
-    if any(c.isupper() for c in password):
-        score += 1
-    if any(c.isdigit() for c in password):
-        score += 1
-    if any(c in SYMBOLS for c in password):
-        score += 1
-
-    # Penalty for repetition
-    if len(set(password)) <= max(3, len(password) // 4):
-        score -= 1
-
-    if score <= 3:
-        return "weak"
-    if score <= 5:
-        return "medium"
-    return "strong"
-
-
-def check_pwned_password(password: str, timeout: int = 5) -> tuple[bool, int]:
-    """Check password against HIBP Pwned Passwords API (k-anonymity)."""
+    """weak/medium/strong from the pattern estimator (see estimator.py).
+
+    For whole vaults use strength.strength_labels.
+    """
+    return estimate_strength(password or "").label
+
+
+# ============================================================
+# BREACH CHECK (pluggable sources)
+# ============================================================
+class PwnedSource(Protocol):
+    def count(self, sha1_hex: str) -> int:
+        """Times this upper-case SHA-1 hex digest appears in the breach corpus."""
+
+
+class HIBPRangeSource:
+    """Online HIBP Pwned Passwords range API (k-anonymity: only 5 hex chars leave the host).
+
+    Range bodies go through `cache` (default: the shared on-disk RangeCache,
+    see src.security.hibp_cache); pass cache=False to always hit the network.
+    HIBP_RANGE_URL overrides the endpoint (e.g. a local HIBPStandIn).
+    """
+
+    URL = "https://api.pwnedpasswords.com/range/{prefix}"
+
+    def __init__(self, timeout: int = 5, session: requests.Session | None = None,
+                 cache=None, url: str | None = None):
+        self.timeout = timeout
+        self.session = session or requests
+        self.url = url or os.getenv("HIBP_RANGE_URL") or self.URL
+        if cache is None:
+            from src.security.hibp_cache import get_range_cache
+            cache = get_range_cache()
+        self.cache = cache if cache is not False else None
+
+    def _fetch(self, prefix: str) -> Optional[str]:
+        resp = self.session.get(self.url.format(prefix=prefix), timeout=self.timeout)
+        if resp.status_code != 200:
+            return None
+        return resp.text
+
+    def range(self, prefix: str) -> Optional[str]:
+        """Raw `SUFFIX:COUNT` body for a 5-char prefix (None on HTTP error)."""
+        if self.cache is None:
+            return self._fetch(prefix)
+        return self.cache.get_or_fetch(prefix, self._fetch)
+
+    def count(self, sha1_hex: str) -> int:
+        sha1_hex = sha1_hex.upper()
+        prefix, suffix = sha1_hex[:5], sha1_hex[5:]
+        body = self.range(prefix)
+        if not body:
+            return 0
+        for line in body.splitlines():
+            hash_suffix, count = line.split(":")
+            if hash_suffix == suffix:
+                return int(count)
+        return 0
+
+
+_pwned_source: Optional[PwnedSource] = None
+_pwned_lock = threading.Lock()
+
+
+def set_pwned_source(source: Optional[PwnedSource]) -> None:
+    """Use `source` for every check (None = back to PWNED_INDEX_PATH / online)."""
+    global _pwned_source
+    with _pwned_lock:
+        _pwned_source = source
+
+
+def get_pwned_source() -> Optional[PwnedSource]:
+    """Configured source; opens the offline index at PWNED_INDEX_PATH on first use."""
+    global _pwned_source
+    if _pwned_source is None:
+        path = os.getenv("PWNED_INDEX_PATH")
+        if path and os.path.exists(path):
+            with _pwned_lock:
+                if _pwned_source is None:
+                    from src.security.breach_index import BreachIndex
+                    _pwned_source = BreachIndex(path)
+    return _pwned_source
+
+
+_pwned_bloom = None
+
+
+def get_pwned_bloom():
+    """Bloom filter at PWNED_BLOOM_PATH (opened on first use), or None."""
+    global _pwned_bloom
+    if _pwned_bloom is None:
+        path = os.getenv("PWNED_BLOOM_PATH")
+        if path and os.path.exists(path):
+            with _pwned_lock:
+                if _pwned_bloom is None:
+                    from src.security.breach_bloom import BloomFilter
+                    _pwned_bloom = BloomFilter(path)
+    return _pwned_bloom
+
+
+def resolve_pwned_source(source: Optional[PwnedSource] = None, timeout: int = 5) -> PwnedSource:
+    """The source a check would use: `source`, else configured/online (+ Bloom filter)."""
+    if source is not None:
+        return source
+    src = get_pwned_source() or HIBPRangeSource(timeout=timeout)
+    bloom = get_pwned_bloom()
+    if bloom is None:
+        return src
+    from src.security.breach_bloom import BloomGuardedSource
+    return BloomGuardedSource(bloom, src)
+
+
+def check_pwned_password(
+    password: str, timeout: int = 5, source: Optional[PwnedSource] = None
+) -> tuple[bool, int]:
+    """Check a password against the breach corpus.
+
+    Uses `source`, else the configured one (set_pwned_source / PWNED_INDEX_PATH),
+    else the HIBP range API. A PWNED_BLOOM_PATH filter, if present, screens
+    out misses before the configured source is consulted.
+    """
     if not password:
         return False, 0
+    src = resolve_pwned_source(source, timeout)
     sha1_hash = hashlib.sha1(password.encode("utf-8")).hexdigest().upper()
-    prefix, suffix = sha1_hash[:5], sha1_hash[5:]
-    url = f"https://api.pwnedpasswords.com/range/{prefix}"
-    resp = requests.get(url, timeout=timeout)
-    if resp.status_code != 200:
-        return False, 0
-    for line in resp.text.splitlines():
-        hash_suffix, count = line.split(":")
-        if hash_suffix == suffix:
-            return True, int(count)
-    return False, 0
+    count = src.count(sha1_hash)
+    return count > 0, count
+
+
+def check_pwned_many(
+    passwords: Iterable[str], timeout: int = 5, source: Optional[PwnedSource] = None
+) -> list[tuple[bool, int]]:
+    """check_pwned_password for a whole vault, resolving the source once."""
+    src = resolve_pwned_source(source, timeout)
+    return [check_pwned_password(p, source=src) for p in passwords]
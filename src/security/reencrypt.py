@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Online re-encryption of legacy `gcm1:` tokens to the current (Fernet) format.
+
+The job walks `passwords` in id order, in batches, for one user or the whole
+table:
+- each batch is batch-decrypted / re-encrypted (decrypt_many / encrypt_many)
+- rows are only replaced if their ciphertext is unchanged since the batch
+  was read, so concurrent edits from the API win
+- replaced rows get a new change_seq, so delta sync hands synced clients
+  the new token
+- the batch and its checkpoint (last id) commit together, so a stopped
+  job resumes where it left off
+- a pause between batches keeps it from starving the live API
+- a finished job starts over if legacy rows have appeared since (e.g. an
+  import of old tokens); rows that failed to decrypt do not count
+
+CLI:
+    python -m src.security.reencrypt [--user-id N] [--batch 500] [--pause 0.05] [--reset]
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import bindparam, func, select, update
+
+from database.engine import SessionLocal
+from database.models import Password, ReencryptCheckpoint
+from database.sync import next_seq
+from src.security.encryption import decrypt_many, encrypt_many
+
+LEGACY_PREFIX = "gcm1:"
+
+
+@dataclass
+class ReencryptProgress:
+    job_key: str
+    total: int          # legacy rows left when the run started
+    scanned: int = 0
+    converted: int = 0
+    failed: int = 0     # undecryptable tokens, left as they are
+    skipped: int = 0    # rows changed concurrently, left to the API's value
+    last_id: int = 0
+    done: bool = False
+
+    @property
+    def percent(self) -> float:
+        return 100.0 if not self.total else min(100.0, 100.0 * self.scanned / self.total)
+
+
+class ReencryptJob:
+    def __init__(
+        self,
+        user_id: Optional[int] = None,
+        batch_size: int = 500,
+        pause: float = 0.05,
+        on_progress: Optional[Callable[[ReencryptProgress], None]] = None,
+    ):
+        self.user_id = user_id
+        self.batch_size = max(1, int(batch_size))
+        self.pause = max(0.0, float(pause))
+        self.on_progress = on_progress
+        self.job_key = "all" if user_id is None else f"user:{int(user_id)}"
+        self._stop = threading.Event()
+
+    # ---- helpers ----
+    def _legacy(self, q):
+        q = q.where(Password.encrypted_password.like(f"{LEGACY_PREFIX}%"))
+        if self.user_id is not None:
+            q = q.where(Password.user_id == int(self.user_id))
+        return q
+
+    def _checkpoint(self, s) -> ReencryptCheckpoint:
+        cp = s.get(ReencryptCheckpoint, self.job_key)
+        if cp is None:
+            cp = ReencryptCheckpoint(job_key=self.job_key, last_id=0, converted=0, failed=0, done=False)
+            s.add(cp)
+            s.commit()
+        return cp
+
+    def reset(self) -> None:
+        with SessionLocal() as s:
+            cp = self._checkpoint(s)
+            cp.last_id, cp.converted, cp.failed, cp.done = 0, 0, 0, False
+            cp.updated_at = datetime.utcnow()
+            s.commit()
+
+    def stop(self) -> None:
+        """Ask a running job to stop after the current batch (it stays resumable)."""
+        self._stop.set()
+
+    # ---- run ----
+    def run(self) -> ReencryptProgress:
+        table = Password.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("_id"), table.c.encrypted_password == bindparam("_old"))
+            # keep last_updated: re-encryption is not a user edit (age checks rely on it)
+            .values(
+                encrypted_password=bindparam("_new"),
+                change_seq=bindparam("_seq"),
+                last_updated=table.c.last_updated,
+            )
+        )
+
+        with SessionLocal() as s:
+            cp = self._checkpoint(s)
+            if cp.done:
+                left = s.execute(self._legacy(select(func.count()).select_from(Password))).scalar_one()
+                if left > cp.failed:
+                    cp.last_id, cp.failed, cp.done = 0, 0, False
+                    cp.updated_at = datetime.utcnow()
+                    s.commit()
+            progress = ReencryptProgress(
+                job_key=self.job_key,
+                total=s.execute(
+                    self._legacy(select(func.count()).select_from(Password)).where(Password.id > cp.last_id)
+                ).scalar_one(),
+                last_id=cp.last_id,
+                done=cp.done,
+            )
+        if progress.done:
+            self._report(progress)
+            return progress
+
+        while not self._stop.is_set():
+            with SessionLocal() as s:
+                rows = s.execute(
+                    self._legacy(select(Password.id, Password.user_id, Password.encrypted_password))
+                    .where(Password.id > progress.last_id)
+                    .order_by(Password.id)
+                    .limit(self.batch_size)
+                ).all()
+                cp = self._checkpoint(s)
+                if not rows:
+                    cp.done = True
+                    cp.updated_at = datetime.utcnow()
+                    s.commit()
+                    progress.done = True
+                    break
+
+                plain = decrypt_many([r.encrypted_password for r in rows], strict=False)
+                ok = [(r, p) for r, p in zip(rows, plain) if p is not None]
+                fresh = encrypt_many([p for _, p in ok])
+                seqs = {uid: next_seq(s, uid) for uid in sorted({r.user_id for r, _ in ok})}
+                params = [
+                    {"_id": r.id, "_old": r.encrypted_password, "_new": new, "_seq": seqs[r.user_id]}
+                    for (r, _), new in zip(ok, fresh)
+                ]
+                changed = s.execute(stmt, params).rowcount if params else 0
+                if changed < 0:  # driver doesn't report executemany rowcount
+                    changed = len(params)
+
+                progress.scanned += len(rows)
+                progress.converted += changed
+                progress.skipped += len(params) - changed
+                progress.failed += len(rows) - len(ok)
+                progress.last_id = rows[-1].id
+
+                cp.last_id = progress.last_id
+                cp.converted += changed
+                cp.failed += len(rows) - len(ok)
+                cp.updated_at = datetime.utcnow()
+                s.commit()
+
+            self._report(progress)
+            if self.pause:
+                time.sleep(self.pause)
+
+        self._report(progress)
+        return progress
+
+    def start(self) -> threading.Thread:
+        """Run in a daemon thread (e.g. from the backend process)."""
+        t = threading.Thread(target=self.run, name=f"reencrypt-{self.job_key}", daemon=True)
+        t.start()
+        return t
+
+    def _report(self, progress: ReencryptProgress) -> None:
+        if self.on_progress:
+            try:
+                self.on_progress(progress)
+            except Exception:
+                pass
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Re-encrypt legacy gcm1: passwords to Fernet.")
+    ap.add_argument("--user-id", type=int, default=None, help="only this user (default: whole table)")
+    ap.add_argument("--batch", type=int, default=500, help="rows per batch/commit")
+    ap.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    ap.add_argument("--reset", action="store_true", help="ignore the checkpoint and start over")
+    args = ap.parse_args(argv)
+
+    from database.engine import init_db
+    init_db()
+
+    def _print(p: ReencryptProgress) -> None:
+        print(
+            f"[{p.job_key}] {p.percent:5.1f}%  scanned={p.scanned} converted={p.converted} "
+            f"failed={p.failed} skipped={p.skipped} last_id={p.last_id}" + ("  done" if p.done else "")
+        )
+
+    job = ReencryptJob(args.user_id, batch_size=args.batch, pause=args.pause, on_progress=_print)
+    if args.reset:
+        job.reset()
+    try:
+        job.run()
+    except KeyboardInterrupt:
+        print("Interrupted; re-run to resume from the checkpoint.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Whole-vault security audit (weak / reused / old / pwned).
+
+A run streams a user's vault in id-ordered batches, batch-decrypts and
+batch-scores each batch (strength.strength_labels), checks breaches in a
+thread pool (lookups are mostly I/O: HIBP, or an mmap'd index), and upserts
+one row per password into `password_audits`.
+
+Runs are incremental: only rows whose change_seq moved past the last run's
+sequence (plus rows whose breach check is still pending) are re-audited.
+Reuse and age are not stored per row; they come from the fingerprint index
+and last_updated at read time, so they never go stale.
+
+Breach checks stay on the machine by default: they use the offline index
+(PWNED_INDEX_PATH / set_pwned_source) and are skipped without one.
+SECURITY_AUDIT_BREACHES=online opts in to the HIBP range API (only SHA-1
+prefixes leave the machine); "off" disables breach checks.
+
+CLI:
+    python -m src.security.security_audit <user_id> [--full] [--no-breaches] [--online]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from database.engine import count_if
+from src.security.encryption import decrypt_many
+from src.security.fingerprint import reused_fingerprints, reuse_counts
+from src.security.password_tools import get_pwned_source, resolve_pwned_source
+from src.security.strength import strength_labels
+
+OLD_DAYS = int(os.getenv("AUDIT_OLD_DAYS", "180"))
+# local (offline index only) | online (HIBP range API when there is no index) | off
+AUDIT_BREACHES = os.getenv("SECURITY_AUDIT_BREACHES", "local").strip().lower()
+if AUDIT_BREACHES in {"1", "true", "yes", "on"}:
+    AUDIT_BREACHES = "online"
+elif AUDIT_BREACHES in {"0", "false", "no"}:
+    AUDIT_BREACHES = "off"
+
+
+@dataclass
+class AuditSummary:
+    scanned: int = 0
+    total: int = 0
+    weak: int = 0
+    reused: int = 0
+    old: int = 0
+    pwned: int = 0
+    unchecked: int = 0
+    audited_at: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _breach_source(mode: str, timeout: int = 5):
+    """Breach source for `mode` (see AUDIT_BREACHES), or None to skip breach checks."""
+    if mode == "off" or (mode != "online" and get_pwned_source() is None):
+        return None
+    return resolve_pwned_source(None, timeout=timeout)
+
+
+def _breach_count(plain: str, source, offline: threading.Event) -> Optional[int]:
+    if source is None or offline.is_set():
+        return None
+    try:
+        return source.count(hashlib.sha1(plain.encode("utf-8")).hexdigest().upper())
+    except Exception:
+        # Network down: leave the rest of this run unchecked, the next run retries them.
+        offline.set()
+        return None
+
+
+def _commit_retrying(s, write: Callable[[], None], attempts: int = 3) -> None:
+    """write() + commit; an overlapping run on the same rows makes us redo it."""
+    for attempt in range(attempts):
+        try:
+            write()
+            s.commit()
+            return
+        except (IntegrityError, OperationalError):
+            s.rollback()
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def run_security_audit(
+    user_id: int,
+    full: bool = False,
+    check_breaches: Optional[bool] = None,
+    online: Optional[bool] = None,
+    batch_size: int = 500,
+    workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> AuditSummary:
+    """Audit a user's vault (only changed rows unless `full`); returns the summary.
+
+    `check_breaches=False` skips breach lookups; `online` overrides whether
+    the HIBP API may be used (default: SECURITY_AUDIT_BREACHES).
+    """
+    from database.engine import SessionLocal
+    from database.models import Password, PasswordAudit, SecurityAuditRun, SyncState
+
+    mode = AUDIT_BREACHES if online is None else ("online" if online else "local")
+    if check_breaches is not None:
+        mode = ("local" if mode == "off" else mode) if check_breaches else "off"
+    source = _breach_source(mode)
+    offline = threading.Event()
+    workers = workers or min(8, (os.cpu_count() or 1) * 2)
+    scanned = 0
+
+    with SessionLocal() as s:
+        run = s.get(SecurityAuditRun, user_id)
+        since = -1 if full or run is None else run.last_seq
+        # Rows written while we scan get a higher seq and are picked up next time.
+        head = s.execute(select(SyncState.seq).where(SyncState.user_id == user_id)).scalar() or 0
+
+        changed = or_(Password.change_seq > since, PasswordAudit.password_id.is_(None))
+        if source is not None:
+            changed = or_(changed, PasswordAudit.pwned_count.is_(None))
+        base = (
+            select(Password.id, Password.encrypted_password, Password.change_seq)
+            .outerjoin(PasswordAudit, PasswordAudit.password_id == Password.id)
+            .where(Password.user_id == user_id, changed)
+            .order_by(Password.id)
+            .limit(batch_size)
+        )
+
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                rows = s.execute(base.where(Password.id > last_id)).all()
+                if not rows:
+                    break
+                tokens = [r.encrypted_password or "" for r in rows]
+                # Non-ciphertexts are legacy plaintext rows; audit them as they are.
+                plains = [p if p is not None else t for t, p in zip(tokens, decrypt_many(tokens, strict=False))]
+                strengths = strength_labels(plains)
+                pwned_counts = list(pool.map(lambda p: _breach_count(p, source, offline), plains))
+                now = datetime.utcnow()
+                ids = [r.id for r in rows]
+                results = [
+                    {
+                        "password_id": r.id,
+                        "user_id": user_id,
+                        "audited_seq": r.change_seq or 0,
+                        "strength": strength,
+                        "pwned_count": pwned,
+                        "audited_at": now,
+                    }
+                    for r, strength, pwned in zip(rows, strengths, pwned_counts)
+                ]
+
+                def replace():
+                    s.execute(delete(PasswordAudit).where(PasswordAudit.password_id.in_(ids)))
+                    s.execute(insert(PasswordAudit), results)
+                _commit_retrying(s, replace)
+                scanned += len(rows)
+                last_id = rows[-1].id
+                if on_progress:
+                    on_progress(scanned)
+
+        def finish():
+            # Drop results of deleted passwords (SQLite does not enforce the FK cascade).
+            s.execute(
+                delete(PasswordAudit).where(
+                    PasswordAudit.user_id == user_id,
+                    PasswordAudit.password_id.not_in(select(Password.id).where(Password.user_id == user_id)),
+                )
+            )
+            run = s.get(SecurityAuditRun, user_id) or SecurityAuditRun(user_id=user_id)
+            run.last_seq = head
+            run.scanned = scanned
+            run.finished_at = datetime.utcnow()
+            s.add(run)
+        _commit_retrying(s, finish)
+
+        summary = audit_summary(s, user_id)
+    summary.scanned = scanned
+    return summary
+
+
+def audit_summary(
+    db,
+    user_id: int,
+    old_days: int = OLD_DAYS,
+    active: Optional[int] = None,
+    reused: Optional[int] = None,
+) -> AuditSummary:
+    """Dashboard counts over active (non-trashed) passwords, from stored results.
+
+    `active` and `reused` skip their queries when the caller already has
+    them (/stats: active from the PasswordStats counters, reused from
+    reuse_counts()).
+    """
+    from database.models import Password, PasswordAudit, SecurityAuditRun
+
+    live = (Password.user_id == user_id, Password.trashed_at.is_(None))
+    if active is None:
+        active = db.execute(select(func.count()).where(*live)).scalar_one()
+    if reused is None:
+        reused = reuse_counts(db, user_id)[0]
+    # age changes with the clock, so it can't be a counter; this is a range
+    # scan of the (user_id, last_updated) index instead of a pass over the vault
+    cutoff = datetime.utcnow() - timedelta(days=old_days)
+    old = db.execute(
+        select(func.count()).where(
+            *live,
+            or_(
+                Password.last_updated < cutoff,
+                and_(Password.last_updated.is_(None), Password.created_at < cutoff),
+            ),
+        )
+    ).scalar_one()
+    weak, pwned, unchecked = db.execute(
+        select(
+            count_if(PasswordAudit.strength == "weak"),
+            count_if(PasswordAudit.pwned_count > 0),
+            count_if(PasswordAudit.pwned_count.is_(None)),
+        )
+        .join(Password, Password.id == PasswordAudit.password_id)
+        .where(*live)
+    ).one()
+    run = db.get(SecurityAuditRun, user_id)
+    return AuditSummary(
+        total=int(active),
+        weak=int(weak),
+        reused=int(reused),
+        old=int(old),
+        pwned=int(pwned),
+        unchecked=int(unchecked),
+        audited_at=run.finished_at.isoformat() if run and run.finished_at else None,
+    )
+
+
+def audit_findings(db, user_id: int, old_days: int = OLD_DAYS) -> list[dict]:
+    """Per-password issues (active rows with at least one finding)."""
+    from database.models import Password, PasswordAudit
+
+    cutoff = datetime.utcnow() - timedelta(days=old_days)
+    reused_fps = reused_fingerprints(user_id)
+    rows = db.execute(
+        select(
+            Password.id, Password.site_name, Password.username,
+            func.coalesce(Password.last_updated, Password.created_at).label("changed"),
+            Password.fingerprint.in_(reused_fps).label("reused"),
+            PasswordAudit.strength, PasswordAudit.pwned_count,
+        )
+        .outerjoin(PasswordAudit, PasswordAudit.password_id == Password.id)
+        .where(Password.user_id == user_id, Password.trashed_at.is_(None))
+        .order_by(Password.id)
+    ).all()
+    out = []
+    for r in rows:
+        issues = []
+        if r.strength == "weak":
+            issues.append("weak")
+        if r.reused:
+            issues.append("reused")
+        if r.changed is not None and r.changed < cutoff:
+            issues.append("old")
+        if r.pwned_count:
+            issues.append("pwned")
+        if issues:
+            out.append({
+                "id": r.id,
+                "site_name": r.site_name,
+                "username": r.username,
+                "issues": issues,
+                "pwned_count": r.pwned_count or 0,
+            })
+    return out
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Run the vault security audit for one user.")
+    ap.add_argument("user_id", type=int)
+    ap.add_argument("--full", action="store_true", help="re-audit every row")
+    ap.add_argument("--no-breaches", action="store_true", help="skip breach lookups")
+    ap.add_argument("--online", action="store_true", help="allow HIBP range lookups without an offline index")
+    args = ap.parse_args(argv)
+    summary = run_security_audit(
+        args.user_id, full=args.full, check_breaches=False if args.no_breaches else None,
+        online=True if args.online else None,
+        on_progress=lambda n: print(f"\r{n} audited", end="", flush=True),
+    )
+    print()
+    for k, v in summary.to_dict().items():
+        print(f"{k:>10}: {v}")
+
+
+if __name__ == "__main__":
+    main()
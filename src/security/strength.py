@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Batch password strength scoring.
+
+`strength_label` / `estimate_entropy_bits` used to walk each password once
+per character class (`any(c.islower() ...)` x4). Here a password is reduced
+in one pass to a profile, (length, class mask, distinct chars), using a
+precomputed `str.translate` table that maps every ASCII character to its
+class. Entropy is plain arithmetic on the profile.
+
+Labels come from the pattern estimator (src/security/estimator.py).
+`strength_labels` scores each distinct password of a batch once, since
+vaults repeat passwords. Large batches can be spread over a process pool
+(`scoring_pool`, STRENGTH_WORKERS): the estimator is pure-Python pattern
+matching, so processes are what scale it, not NumPy or threads.
+
+CLI (re-score stored `strength` values after a policy change):
+    python -m src.security.strength rescore [--user-id N] [--batch 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import string
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence
+
+SYMBOLS = "!@#$%^&*()-_=+[]{};:,.<>/"
+
+STRENGTH_WORKERS = int(os.getenv("STRENGTH_WORKERS", "1"))
+POOL_CHUNK = 256   # distinct passwords per pool task
+
+LOWER, UPPER, DIGIT, SYMBOL = 1, 2, 4, 8
+# Class marker characters produced by the translate table.
+_MARK = {LOWER: "a", UPPER: "A", DIGIT: "0", SYMBOL: "!"}
+_MARK_BITS = {v: k for k, v in _MARK.items()}
+
+Profile = tuple  # (length, class mask, distinct characters)
+
+
+@lru_cache(maxsize=8)
+def _tables(symbols: str) -> dict:
+    """translate table: ASCII -> class marker, other ASCII -> deleted."""
+    trans = {}
+    for cp in range(128):
+        c = chr(cp)
+        bit = 0
+        if c in string.ascii_lowercase:
+            bit = LOWER
+        elif c in string.ascii_uppercase:
+            bit = UPPER
+        elif c in string.digits:
+            bit = DIGIT
+        elif c in symbols:
+            bit = SYMBOL
+        trans[cp] = _MARK[bit] if bit else None
+    return trans
+
+
+def _mask_slow(chars: Iterable[str], symbols: str) -> int:
+    """Non-ASCII characters (same rules as str.islower() & co.)."""
+    mask = 0
+    for c in chars:
+        if c.islower():
+            mask |= LOWER
+        elif c.isupper():
+            mask |= UPPER
+        elif c.isdigit():
+            mask |= DIGIT
+        elif c in symbols:
+            mask |= SYMBOL
+    return mask
+
+
+def char_classes(password: str, symbols: str = SYMBOLS) -> int:
+    """Bit mask of LOWER | UPPER | DIGIT | SYMBOL present in `password`."""
+    trans = _tables(symbols)
+    mask = 0
+    rest = []
+    for m in set(password.translate(trans)):
+        bit = _MARK_BITS.get(m)
+        if bit is not None:
+            mask |= bit
+        else:
+            rest.append(m)
+    return mask | _mask_slow(rest, symbols) if rest else mask
+
+
+def profile(password: str, symbols: str = SYMBOLS) -> Profile:
+    return len(password), char_classes(password, symbols), len(set(password))
+
+
+def entropy_from_profile(prof: Profile) -> float:
+    length, mask, _ = prof
+    charset = (
+        (26 if mask & LOWER else 0)
+        + (26 if mask & UPPER else 0)
+        + (10 if mask & DIGIT else 0)
+        + (len(SYMBOLS) if mask & SYMBOL else 0)
+    )
+    if not length or charset <= 1:
+        return 0.0
+    return length * math.log2(charset)
+
+
+def _label_chunk(passwords: Sequence[str]) -> list[str]:
+    from src.security.estimator import estimate_strength
+
+    return [estimate_strength(p).label for p in passwords]
+
+
+def scoring_pool(workers: Optional[int] = None) -> Optional[ProcessPoolExecutor]:
+    """Process pool for strength_labels (STRENGTH_WORKERS by default); None for one worker."""
+    workers = STRENGTH_WORKERS if workers is None else workers
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def strength_labels(passwords: Sequence[str], pool: Optional[Executor] = None) -> list[str]:
+    """weak/medium/strong for a whole list (same result as password_tools.strength_label).
+
+    Each distinct password is scored once; with `pool`, in chunks across its
+    workers. Results keep the input order.
+    """
+    items = [p or "" for p in passwords]
+    distinct = list(dict.fromkeys(items))
+    if pool is not None and len(distinct) > POOL_CHUNK:
+        chunks = [distinct[i:i + POOL_CHUNK] for i in range(0, len(distinct), POOL_CHUNK)]
+        labels = [x for part in pool.map(_label_chunk, chunks) for x in part]
+    else:
+        labels = _label_chunk(distinct)
+    by_password = dict(zip(distinct, labels))
+    return [by_password[p] for p in items]
+
+
+def rescore_strengths(user_id: Optional[int] = None, batch_size: int = 500, workers: Optional[int] = None) -> int:
+    """Recompute stored `strength` for every row; returns the number of rows changed.
+
+    Changed rows get a fresh change_seq (clients pick them up via delta sync)
+    but keep last_updated. Stats counters of touched users are dropped so
+    /stats rebuilds them from the aggregate. `workers` > 1 scores on a
+    process pool kept for the whole run.
+    """
+    from sqlalchemy import bindparam, delete, select, update
+
+    from database.engine import SessionLocal
+    from database.models import Password, PasswordStats
+    from database.sync import next_seq
+    from src.security.encryption import decrypt_many
+
+    table = Password.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        .values(strength=bindparam("_s"), change_seq=bindparam("_seq"), last_updated=table.c.last_updated)
+    )
+    changed = 0
+    last_id = 0
+    pool = scoring_pool(workers)
+    try:
+        while True:
+            with SessionLocal() as s:
+                q = (
+                    select(Password.id, Password.user_id, Password.encrypted_password, Password.strength)
+                    .where(Password.id > last_id)
+                    .order_by(Password.id)
+                    .limit(batch_size)
+                )
+                if user_id is not None:
+                    q = q.where(Password.user_id == int(user_id))
+                rows = s.execute(q).all()
+                if not rows:
+                    return changed
+                tokens = [r.encrypted_password or "" for r in rows]
+                plains = [p if p is not None else t for t, p in zip(tokens, decrypt_many(tokens, strict=False))]
+                by_user: dict[int, list] = {}
+                for r, label in zip(rows, strength_labels(plains, pool)):
+                    if (r.strength or "").lower() != label:
+                        by_user.setdefault(r.user_id, []).append({"_id": r.id, "_s": label})
+                for uid, params in by_user.items():
+                    seq = next_seq(s, uid)
+                    s.execute(stmt, [dict(p, _seq=seq) for p in params])
+                    changed += len(params)
+                if by_user:
+                    s.execute(delete(PasswordStats).where(PasswordStats.user_id.in_(list(by_user))))
+                s.commit()
+                last_id = rows[-1].id
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Batch password strength tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("rescore", help="recompute stored strength values")
+    r.add_argument("--user-id", type=int)
+    r.add_argument("--batch", type=int, default=500)
+    r.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes")
+    args = ap.parse_args(argv)
+    n = rescore_strengths(args.user_id, args.batch, args.workers)
+    print(f"✅ {n} password(s) re-scored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# Shared test setup: project root on sys.path, throwaway SQLite database.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Must be set before database.engine is first imported. HOME is redirected
+# so caches and calibration files (~/.password_guardian) stay out of the
+# developer's profile.
+_tmp = tempfile.mkdtemp(prefix="pg_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["HOME"] = _tmp
@@ -1,2 +1,353 @@
 # -*- coding: utf-8 -*-
 # Tests for authentication
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.auth.mailer import MailOutbox
+from src.auth.smtp_server import SMTPStandIn
+
+
+# ============================================================
+# MAIL OUTBOX
+# ============================================================
+@pytest.fixture
+def outbox_rows():
+    from database.engine import SessionLocal, init_db
+    from database.models import MailOutbox as Row
+
+    init_db()
+
+    def rows():
+        with SessionLocal() as s:
+            return s.query(Row).order_by(Row.id).all()
+
+    with SessionLocal() as s:
+        s.query(Row).delete()
+        s.commit()
+    return rows
+
+
+def _outbox(srv: SMTPStandIn, **kw) -> MailOutbox:
+    cfg = {
+        "smtp_server": "127.0.0.1",
+        "smtp_port": srv.port,
+        "sender_email": "noreply@example.com",
+        "sender_password": "secret",
+        "sender_name": "Password Guardian",
+        "use_ssl": False,
+        "starttls": False,
+        "timeout": 5,
+    }
+    return MailOutbox(cfg, backoff=0, **kw)
+
+
+def test_outbox_sends_over_one_connection(outbox_rows):
+    with SMTPStandIn() as srv:
+        outbox = _outbox(srv)
+        for i in range(5):
+            outbox.enqueue(f"user{i}@example.com", "Code", f"your code is {i}")
+        assert outbox.drain(timeout=10)
+    assert sorted(m.rcpt_to[0] for m in srv.messages) == [f"user{i}@example.com" for i in range(5)]
+    assert srv.connections == 1 and srv.logins == 1
+    assert outbox_rows() == []          # sent rows (one-time codes) are deleted
+    assert outbox.stats()["sent"] == 5
+
+
+def test_outbox_retries_transient_errors(outbox_rows):
+    with SMTPStandIn(fail_first=2) as srv:
+        outbox = _outbox(srv, max_attempts=5)
+        outbox.enqueue("a@example.com", "Code", "123456")
+        outbox.enqueue("b@example.com", "Code", "654321")
+        assert outbox.drain(timeout=10)
+    assert len(srv.messages) == 2
+    assert outbox.stats()["retried"] == 2
+    assert outbox_rows() == []
+
+
+def test_outbox_gives_up_on_permanent_errors(outbox_rows):
+    with SMTPStandIn(reject=["gone@example.com"]) as srv:
+        outbox = _outbox(srv)
+        outbox.enqueue("gone@example.com", "Code", "123456")
+        outbox.enqueue("ok@example.com", "Code", "654321")
+        assert outbox.drain(timeout=10)
+    assert [m.rcpt_to for m in srv.messages] == [["ok@example.com"]]
+    (row,) = outbox_rows()
+    assert (row.to_email, row.status, row.attempts, row.body) == ("gone@example.com", "failed", 1, "")
+    assert "550" in row.last_error
+
+
+def test_outbox_stops_after_max_attempts(outbox_rows):
+    with SMTPStandIn(fail_first=10) as srv:
+        outbox = _outbox(srv, max_attempts=3)
+        outbox.enqueue("a@example.com", "Code", "123456")
+        assert outbox.drain(timeout=10)
+    (row,) = outbox_rows()
+    assert (row.status, row.attempts, row.body) == ("failed", 3, "")
+    assert srv.messages == []
+
+
+def test_outbox_purges_expired_mail(outbox_rows):
+    from database.engine import SessionLocal
+    from database.models import MailOutbox as Row
+
+    with SMTPStandIn() as srv:
+        outbox = _outbox(srv)
+        old = outbox.enqueue("late@example.com", "Code", "123456")
+        with SessionLocal() as s:
+            s.get(Row, old).created_at = datetime.utcnow() - timedelta(hours=1)
+            s.commit()
+        outbox.enqueue("now@example.com", "Code", "654321")
+        assert outbox.drain(timeout=10)
+    assert [m.rcpt_to for m in srv.messages] == [["now@example.com"]]
+    assert outbox_rows() == []
+    assert outbox.stats()["expired"] == 1
+
+
+def test_outbox_skips_messages_taken_over(outbox_rows):
+    from sqlalchemy import update
+
+    from database.engine import SessionLocal
+    from database.models import MailOutbox as Row
+
+    with SMTPStandIn() as srv:
+        outbox = _outbox(srv)
+        outbox.enqueue("a@example.com", "Code", "123456")
+        claim = outbox._claim
+
+        def stalled_then_taken_over():
+            rows = claim()
+            with SessionLocal() as s:
+                s.execute(update(Row).values(claim="other-worker"))
+                s.commit()
+            return rows
+        outbox._claim = stalled_then_taken_over
+        assert outbox.process_batch() == 1
+    assert srv.messages == []
+    (row,) = outbox_rows()
+    assert (row.status, row.claim) == ("sending", "other-worker")
+    assert outbox.stats()["lost_claims"] == 1
+
+
+def test_outbox_workers_drain_in_background(outbox_rows):
+    import time
+
+    with SMTPStandIn() as srv:
+        outbox = _outbox(srv, workers=2).start()
+        try:
+            for i in range(10):
+                outbox.enqueue(f"u{i}@example.com", "Code", "x")
+            deadline = time.monotonic() + 10
+            while len(srv.messages) < 10 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            outbox.stop()
+    assert len(srv.messages) == 10
+    assert srv.connections <= 2
+
+
+# ============================================================
+# ONE-TIME CODE STORE
+# ============================================================
+@pytest.fixture(params=["memory", "db"])
+def code_store(request):
+    from src.auth.code_store import DbCodeStore, MemoryCodeStore
+
+    if request.param == "memory":
+        return MemoryCodeStore()
+    from database.engine import init_db
+    init_db()
+    store = DbCodeStore()
+    store.sweep(now=datetime.utcnow() + timedelta(days=365))  # start empty
+    return store
+
+
+def test_code_is_consumed_once(code_store):
+    from src.auth.code_store import TWO_FA
+
+    code_store.put(1, TWO_FA, "123456", timedelta(minutes=5))
+    assert not code_store.check(1, TWO_FA, "000000")
+    assert code_store.check(1, TWO_FA, " 123456 ", consume=False)
+    assert code_store.check(1, TWO_FA, "123456")
+    assert not code_store.check(1, TWO_FA, "123456")
+
+
+def test_new_code_replaces_old(code_store):
+    from src.auth.code_store import RESET, VERIFY
+
+    code_store.put(2, RESET, "111111", timedelta(minutes=5))
+    code_store.put(2, RESET, "222222", timedelta(minutes=5))
+    code_store.put(2, VERIFY, "333333", timedelta(minutes=5))
+    assert not code_store.check(2, RESET, "111111")
+    assert code_store.get(2, RESET).code == "222222"
+    assert code_store.get(2, VERIFY).code == "333333"
+
+
+def test_expired_codes_are_rejected_and_swept(code_store):
+    from src.auth.code_store import VERIFY
+
+    code_store.put(3, VERIFY, "123456", timedelta(seconds=-1))
+    code_store.put(4, VERIFY, "654321", timedelta(minutes=5))
+    assert code_store.get(3, VERIFY) is None
+    assert not code_store.check(3, VERIFY, "123456")
+    assert code_store.sweep(now=datetime.utcnow() + timedelta(minutes=10)) >= 1
+    assert code_store.get(4, VERIFY) is None
+
+
+def test_db_code_consumed_by_one_caller_only():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from database.engine import init_db
+    from src.auth.code_store import TWO_FA, DbCodeStore
+
+    init_db()
+    store = DbCodeStore()
+    store.put(5, TWO_FA, "123456", timedelta(minutes=5))
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: store.check(5, TWO_FA, "123456"), range(4)))
+    assert results.count(True) == 1
+
+
+def test_incomplete_code_store_cannot_be_built():
+    from src.auth.code_store import CodeStore
+
+    class NoSweep(CodeStore):
+        def put(self, user_id, purpose, code, ttl): ...
+        def get(self, user_id, purpose): ...
+        def discard(self, user_id, purpose): ...
+
+    with pytest.raises(TypeError):
+        NoSweep()
+
+
+# ============================================================
+# PASSWORD HASHES
+# ============================================================
+@pytest.fixture
+def fast_kdf(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_SCHEME", "pbkdf2_sha256")
+    monkeypatch.setenv("PBKDF2_ITERATIONS", "100000")
+    monkeypatch.setenv("ARGON2_TIME_COST", "1")
+    monkeypatch.setenv("ARGON2_MEMORY_KIB", "8192")
+    monkeypatch.setenv("ARGON2_PARALLELISM", "1")
+
+
+def test_pbkdf2_round_trip(fast_kdf):
+    from src.auth.hashing import PBKDF2, check_password, identify, make_password
+
+    encoded = make_password("correct horse")
+    assert identify(encoded) == PBKDF2 and encoded.startswith("pbkdf2_sha256$100000$")
+    assert check_password("correct horse", encoded)
+    assert not check_password("correct hors", encoded)
+    assert not check_password("correct horse", "pbkdf2_sha256$oops")
+    assert not check_password("correct horse", "")
+
+
+def test_legacy_hex_digest(fast_kdf):
+    from src.auth.hashing import LEGACY, check_password, identify, needs_rehash, pbkdf2_hex
+
+    legacy = pbkdf2_hex("hunter2", "usersalt", 100_000)
+    assert identify(legacy) == LEGACY
+    assert check_password("hunter2", legacy, salt="usersalt")
+    assert not check_password("hunter2", legacy)                  # no salt, no match
+    assert not check_password("hunter2", legacy, salt="other")
+    tuned = pbkdf2_hex("hunter2", "usersalt", 120_000)
+    assert check_password("hunter2", tuned, salt="usersalt", iterations=120_000)
+    assert needs_rehash(legacy)
+
+
+def test_needs_rehash_on_stronger_target(fast_kdf, monkeypatch):
+    from src.auth.hashing import make_password, needs_rehash
+
+    encoded = make_password("pw")
+    assert not needs_rehash(encoded)
+    monkeypatch.setenv("PBKDF2_ITERATIONS", "200000")
+    assert needs_rehash(encoded)
+    monkeypatch.setenv("PBKDF2_ITERATIONS", "100000")
+    monkeypatch.setenv("PASSWORD_HASH_SCHEME", "argon2id")
+    assert needs_rehash(encoded)
+
+
+def test_argon2id_round_trip_and_rehash(fast_kdf, monkeypatch):
+    pytest.importorskip("argon2")
+    from src.auth.hashing import ARGON2ID, check_password, identify, make_password, needs_rehash
+
+    monkeypatch.setenv("PASSWORD_HASH_SCHEME", "argon2id")
+    encoded = make_password("correct horse")
+    assert identify(encoded) == ARGON2ID
+    assert check_password("correct horse", encoded)
+    assert not check_password("wrong", encoded)
+    assert not needs_rehash(encoded)
+    monkeypatch.setenv("ARGON2_MEMORY_KIB", "16384")
+    assert needs_rehash(encoded)
+
+
+def test_hashing_pool_backpressure():
+    import threading
+
+    from src.auth.hashing import HashingBusy, HashingService
+
+    svc = HashingService(workers=1, max_queue=1, queue_timeout=0.1)
+    gate = threading.Event()
+    try:
+        running = svc.submit(gate.wait, 5)           # holds the only worker
+        queued = svc.submit(lambda: "queued")        # admitted, waits for the worker
+        assert svc.stats()["queue_depth"] == 1
+        with pytest.raises(HashingBusy):
+            svc.submit(lambda: "rejected")           # workers + max_queue reached
+        assert svc.stats()["rejected"] == 1 and svc.stats()["waiting"] == 0
+
+        gate.set()
+        assert running.result(timeout=5) is True and queued.result(timeout=5) == "queued"
+        assert svc.call(lambda: "after") == "after"  # slots were given back
+        stats = svc.stats()
+        assert (stats["completed"], stats["in_flight"], stats["peak_in_flight"]) == (3, 0, 2)
+    finally:
+        gate.set()
+        svc.shutdown()
+
+
+def test_make_password_surfaces_busy_pool(fast_kdf, monkeypatch):
+    import threading
+
+    import src.auth.hashing as hashing
+
+    svc = hashing.HashingService(workers=1, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(hashing, "_service", svc)
+    gate = threading.Event()
+    try:
+        svc.submit(gate.wait, 5)
+        with pytest.raises(hashing.HashingBusy):
+            hashing.make_password("pw")
+        gate.set()
+        assert hashing.check_password("pw", hashing.make_password("pw"))
+    finally:
+        gate.set()
+        svc.shutdown()
+
+
+def test_calibration_file_fallback(monkeypatch, tmp_path):
+    import src.auth.hashing as hashing
+
+    for env in ("PBKDF2_ITERATIONS", "ARGON2_TIME_COST", "ARGON2_MEMORY_KIB", "ARGON2_PARALLELISM"):
+        monkeypatch.delenv(env, raising=False)
+    path = tmp_path / "kdf.json"
+    monkeypatch.setattr(hashing, "CALIBRATION_FILE", str(path))
+
+    # no file, then an unreadable one: built-in defaults
+    assert hashing.target_iterations() == hashing.LEGACY_ITERATIONS
+    assert hashing.target_argon2_params() == hashing.ARGON2_DEFAULTS
+    path.write_text("{not json")
+    assert hashing.target_iterations() == hashing.LEGACY_ITERATIONS
+
+    hashing.save_calibration(250_000, 250.0)
+    hashing.save_calibration({"time_cost": 5, "memory_cost": 32768, "parallelism": 2}, 250.0, hashing.ARGON2ID)
+    assert hashing.target_iterations() == 250_000
+    assert hashing.target_argon2_params() == {"time_cost": 5, "memory_cost": 32768, "parallelism": 2}
+
+    hashing.save_calibration(10_000, 1.0)        # never below the floor
+    assert hashing.target_iterations() == hashing.MIN_ITERATIONS
+    monkeypatch.setenv("PBKDF2_ITERATIONS", "300000")
+    monkeypatch.setenv("ARGON2_PARALLELISM", "1")
+    assert hashing.target_iterations() == 300_000
+    assert hashing.target_argon2_params()["parallelism"] == 1
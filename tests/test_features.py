@@ -1,2 +1,1401 @@
 # -*- coding: utf-8 -*-
 # Tests for features
+import hashlib
+import time
+
+import pytest
+
+from src.security.estimator import MAX_MATCH_LEN, estimate_strength
+
+
+# ============================================================
+# STRENGTH ESTIMATOR
+# ============================================================
+@pytest.mark.parametrize("password", ["1" * 80, "a" * 100, "password" * 9, "a" * 70, "abc" * 40])
+def test_long_repeats_are_weak(password):
+    assert estimate_strength(password).label == "weak"
+
+
+def test_only_prefix_is_scored():
+    head = "xK9#mQ2$vL7@pN4!" * 4
+    assert estimate_strength(head).guesses_log10 == estimate_strength(head + "a" * 50).guesses_log10
+
+
+@pytest.mark.parametrize("password,label", [
+    ("password", "weak"),
+    ("azerty123", "weak"),
+    ("P@ssw0rd1", "weak"),
+    ("xK9#mQ2$vL7@pN4!", "strong"),
+])
+def test_labels(password, label):
+    assert estimate_strength(password).label == label
+
+
+def test_user_inputs_lower_the_score():
+    pw = "dupontmarcel"
+    alone = estimate_strength(pw).guesses_log10
+    assert estimate_strength(pw, ["marcel.dupont@example.com"]).guesses_log10 < alone
+
+
+def test_keystroke_budget():
+    samples = ["1" * MAX_MATCH_LEN, ("1234567890" * 7)[:MAX_MATCH_LEN], ("Tr0ub4dor&3monkey2019!" * 3)[:MAX_MATCH_LEN]]
+    for pw in samples:
+        estimate_strength(pw)
+        best = min(_timed(estimate_strength, pw) for _ in range(5))
+        assert best < 0.005, (pw, best)  # generous bound for slow CI; the target is < 1 ms
+
+
+def test_batch_labels_match_single_scoring(monkeypatch):
+    import src.security.strength as strength
+
+    pws = [f"{w}{i}" for i in range(40) for w in ("azerty", "xK9#mQ2$vL7@pN4!", "")] + [None, "azerty0"]
+    expected = [estimate_strength(p or "").label for p in pws]
+    assert strength.strength_labels(pws) == expected
+    monkeypatch.setattr(strength, "POOL_CHUNK", 16)
+    pool = strength.scoring_pool(2)
+    try:
+        assert strength.strength_labels(pws, pool) == expected
+    finally:
+        pool.shutdown()
+    assert strength.scoring_pool(1) is None
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+# ============================================================
+# AUDIT LOG
+# ============================================================
+@pytest.fixture(scope="module")
+def api():
+    from backend_api.app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def vault_entry(api):
+    from database.engine import SessionLocal
+    from database.models import Password, User
+
+    with SessionLocal() as s:
+        u = User(username="audit", email=f"audit{time.time_ns()}@example.com", password_hash="x", salt="x")
+        s.add(u)
+        s.flush()
+        p = Password(user_id=u.id, site_name="bank", username="me", encrypted_password="gcm2:secret")
+        s.add(p)
+        s.commit()
+        return u.id, p.id
+
+
+def _break_audit_db(monkeypatch):
+    import src.security.audit as audit
+
+    def unavailable():
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(audit, "SessionLocal", unavailable)
+
+
+def test_reveal_is_audited(api, vault_entry):
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+
+    uid, pid = vault_entry
+    res = api.get(f"/passwords/{pid}/reveal")
+    assert res.get_json()["encrypted_password"] == "gcm2:secret"
+    with SessionLocal() as s:
+        assert s.query(ActivityLog).filter_by(user_id=uid, action="password:reveal:bank").count() == 1
+
+
+@pytest.mark.parametrize("url", ["/passwords/{pid}/reveal", "/export/{uid}", "/export/{uid}?format=ndjson"])
+def test_secrets_withheld_when_audit_fails(api, vault_entry, monkeypatch, url):
+    uid, pid = vault_entry
+    _break_audit_db(monkeypatch)
+    res = api.get(url.format(uid=uid, pid=pid))
+    assert res.status_code == 500
+    assert b"gcm2:secret" not in res.get_data()
+
+
+def test_audit_writer_drops_only_refused_events(vault_entry, monkeypatch):
+    import src.security.audit as audit
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+
+    uid, _ = vault_entry
+    writer = audit.AuditWriter(max_batch=1000, flush_interval=60)
+    try:
+        real = audit.SessionLocal
+        _break_audit_db(monkeypatch)
+        writer.log(uid, "writer:a")
+        writer.log(None, "writer:bad")       # user_id is NOT NULL
+        writer.log(uid, "writer:b")
+        assert writer.flush() is False       # database down: everything kept
+        assert writer.stats()["buffered"] == 3
+
+        monkeypatch.setattr(audit, "SessionLocal", real)
+        assert writer.flush() is True
+        assert writer.stats()["rejected"] == 1
+        assert writer.log(None, "writer:bad", durable=True) is False
+        assert writer.log(uid, "writer:c", durable=True) is True
+    finally:
+        writer.close()
+    with SessionLocal() as s:
+        actions = {a for (a,) in s.query(ActivityLog.action).filter(ActivityLog.user_id == uid)}
+    assert {"writer:a", "writer:b", "writer:c"} <= actions
+
+
+def test_durable_event_shed_by_overflow_reports_failure(vault_entry, monkeypatch):
+    import src.security.audit as audit
+
+    uid, _ = vault_entry
+    writer = audit.AuditWriter(max_batch=1000, flush_interval=60, max_buffer=2)
+    real_session, real_flush = audit.SessionLocal, writer.flush
+    filled = []
+
+    def busy():
+        if not filled:
+            # other requests keep logging while the durable event's batch is out
+            filled.append(1)
+            writer.log(uid, "overflow:a")
+            writer.log(uid, "overflow:b")
+        raise RuntimeError("database is locked")
+
+    def flush():
+        monkeypatch.setattr(audit, "SessionLocal", busy)
+        assert real_flush() is False            # "durable" no longer fits: shed
+        monkeypatch.setattr(audit, "SessionLocal", real_session)
+        return real_flush()                     # commits the newer events, past its seq
+    monkeypatch.setattr(writer, "flush", flush)
+    try:
+        assert writer.log(uid, "durable", durable=True) is False
+        assert writer.stats()["dropped"] == 1
+    finally:
+        monkeypatch.setattr(writer, "flush", real_flush)
+        writer.close()
+
+
+@pytest.fixture
+def journal(vault_entry):
+    """30 events in 10 timestamps (3 per tie), spread over four action types."""
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+    from src.security.audit import action_type
+
+    uid, _ = vault_entry
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    actions = ["password:add:bank", "vault:export", "login:ok", "passwordless:link", "password:reveal:bank"]
+    with SessionLocal() as s:
+        s.execute(insert(ActivityLog), [
+            {"user_id": uid, "action": actions[i % 5], "action_type": action_type(actions[i % 5]),
+             "created_at": base + timedelta(minutes=i // 3)}
+            for i in range(30)
+        ])
+        s.commit()
+    yield uid
+    with SessionLocal() as s:    # old enough for the retention tests to pick up
+        s.query(ActivityLog).filter(ActivityLog.user_id == uid).delete()
+        s.commit()
+
+
+@pytest.mark.parametrize("filter_key", ["all", "password", "vault", "login"])
+def test_audit_journal_pages_match_like_filter(journal, filter_key):
+    from sqlalchemy import select
+
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+    from src.auth.auth_manager import AuthManager
+
+    uid = journal
+    q = select(ActivityLog.id).where(ActivityLog.user_id == uid)
+    if filter_key != "all":
+        q = q.where(ActivityLog.action.like(f"{filter_key}:%"))    # the filter before action_type
+    with SessionLocal() as s:
+        expected = s.execute(q.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc())).scalars().all()
+
+    manager = AuthManager()
+    for limit in (1, 4, 5):
+        seen, before = [], None
+        while True:
+            page = manager.list_audit_logs(uid, filter_key, limit=limit, before=before)
+            if not page:
+                break
+            assert len(page) <= limit
+            seen += [e["id"] for e in page]
+            before = (page[-1]["created_at"], page[-1]["id"])
+        assert seen == expected, limit
+    assert expected
+
+
+# ============================================================
+# LOG RETENTION
+# ============================================================
+def test_concurrent_retention_runs_archive_each_row_once(vault_entry, tmp_path):
+    import gzip
+    import json
+    import threading
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import func, insert, select
+
+    from database.engine import SessionLocal
+    from database.models import ActivityDaily, ActivityLog
+    from src.security.log_retention import run_retention
+
+    uid, _ = vault_entry
+    old = datetime.utcnow() - timedelta(days=400)
+    with SessionLocal() as s:
+        s.execute(insert(ActivityLog), [
+            {"user_id": uid, "action": "login:ok", "action_type": "login", "created_at": old + timedelta(seconds=i)}
+            for i in range(3000)
+        ])
+        s.commit()
+
+    results = []
+    runs = [
+        threading.Thread(target=lambda d=d: results.append(run_retention(batch_size=100, archive_dir=str(d))))
+        for d in (tmp_path / "a", tmp_path / "b")
+    ]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    run_retention(batch_size=100, archive_dir=str(tmp_path / "c"))  # whatever a run gave up on
+
+    archived = []
+    for path in tmp_path.rglob("*.ndjson.gz"):
+        with gzip.open(path, "rt") as f:
+            archived += [json.loads(line)["id"] for line in f]
+    with SessionLocal() as s:
+        left = s.query(ActivityLog).filter(ActivityLog.user_id == uid, ActivityLog.created_at < old + timedelta(days=1)).count()
+        rolled = s.execute(select(func.sum(ActivityDaily.count)).where(ActivityDaily.user_id == uid)).scalar()
+    assert left == 0
+    assert len(archived) == len(set(archived)) == 3000
+    assert rolled == 3000
+
+
+def test_retention_failed_commit_not_archived_twice(vault_entry, tmp_path, monkeypatch):
+    import gzip
+    import json
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+    from src.security.log_retention import run_retention
+
+    uid, _ = vault_entry
+    old = datetime.utcnow() - timedelta(days=400)
+    with SessionLocal() as s:
+        s.execute(insert(ActivityLog), [
+            {"user_id": uid, "action": "login:ok", "action_type": "login", "created_at": old + timedelta(seconds=i)}
+            for i in range(250)
+        ])
+        s.commit()
+
+    real_commit, calls = Session.commit, []
+
+    def flaky_commit(self):
+        calls.append(1)
+        if len(calls) == 2:          # the second batch's commit fails once
+            raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+        real_commit(self)
+    monkeypatch.setattr(Session, "commit", flaky_commit)
+    res = run_retention(batch_size=100, archive_dir=str(tmp_path))
+
+    archived = []
+    for path in res.segments:
+        with gzip.open(path, "rt") as f:
+            archived += [json.loads(line)["id"] for line in f]
+    assert res.conflicts == 1 and res.deleted == res.archived == 250
+    assert len(archived) == len(set(archived)) == 250
+
+
+def test_retention_reads_only_expired_rows(vault_entry, tmp_path):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+
+    from database.engine import SessionLocal
+    from database.models import ActivityLog
+    from src.security.log_retention import run_retention
+
+    uid, _ = vault_entry
+    now = datetime.utcnow()
+    rows = [  # (action, action_type, age in days, expired)
+        ("password:reveal:bank", "password", 60, True),
+        ("password:edit:bank", "password", 60, False),
+        ("password:edit:bank", "password", 200, True),
+        ("login:ok", "login", 60, False),
+        ("login:ok", "login", 400, True),
+        ("password:reveal:old", None, 60, True),       # written before action_type existed
+        ("password:edit:old", None, 60, False),
+    ]
+    with SessionLocal() as s:
+        s.execute(insert(ActivityLog), [
+            {"user_id": uid, "action": a, "action_type": t, "created_at": now - timedelta(days=d)}
+            for a, t, d, _ in rows
+        ])
+        s.commit()
+
+    res = run_retention(now=now, rules={"password:reveal": 30, "password": 180}, default_days=365,
+                        archive_dir=str(tmp_path))
+    with SessionLocal() as s:
+        left = sorted(s.query(ActivityLog.action).filter(ActivityLog.user_id == uid).all())
+    assert left == sorted((a,) for a, _, _, expired in rows if not expired)
+    assert res.deleted == 4
+    assert res.scanned == 5              # only the legacy bucket reads a row it keeps
+
+
+# ============================================================
+# SECURITY AUDIT
+# ============================================================
+class _FakeBreaches:
+    def __init__(self, pwned):
+        self.pwned = {hashlib.sha1(p.encode("utf-8")).hexdigest().upper() for p in pwned}
+        self.calls = 0
+
+    def count(self, sha1_hex):
+        self.calls += 1
+        return 42 if sha1_hex in self.pwned else 0
+
+
+def _add_passwords(uid, plains):
+    from database.engine import SessionLocal
+    from database.models import Password
+
+    with SessionLocal() as s:
+        s.add_all(Password(user_id=uid, site_name=f"site{i}", username="me", encrypted_password=p)
+                  for i, p in enumerate(plains))
+        s.commit()
+
+
+def test_audit_stays_offline_by_default(vault_entry, monkeypatch):
+    import src.security.password_tools as tools
+    from src.security import security_audit
+
+    def no_network(*a, **k):
+        raise AssertionError("HIBP contacted without consent")
+    monkeypatch.setattr(tools, "HIBPRangeSource", no_network)
+    monkeypatch.setattr(security_audit, "AUDIT_BREACHES", "local")
+    uid, _ = vault_entry
+    _add_passwords(uid, ["hunter2", "password"])
+
+    summary = security_audit.run_security_audit(uid)
+    assert summary.scanned == 3 and summary.unchecked == 3
+    # without a breach source, unchecked rows are not re-queued
+    assert security_audit.run_security_audit(uid).scanned == 0
+
+
+def test_audit_uses_local_index(vault_entry):
+    from src.security.password_tools import set_pwned_source
+    from src.security.security_audit import run_security_audit
+
+    uid, _ = vault_entry
+    _add_passwords(uid, ["hunter2", "Xq8#vL2!pN4$"])
+    fake = _FakeBreaches(["hunter2"])
+    set_pwned_source(fake)
+    try:
+        summary = run_security_audit(uid)
+    finally:
+        set_pwned_source(None)
+    assert summary.pwned == 1 and summary.unchecked == 0
+    assert fake.calls == 3
+
+
+def test_overlapping_audits(vault_entry):
+    import threading
+
+    from src.security.security_audit import run_security_audit
+
+    uid, _ = vault_entry
+    _add_passwords(uid, [f"pw{i}" for i in range(300)])
+    errors = []
+
+    def run():
+        try:
+            run_security_audit(uid, full=True, check_breaches=False, batch_size=50)
+        except Exception as e:
+            errors.append(e)
+    runs = [threading.Thread(target=run) for _ in range(3)]
+    for t in runs:
+        t.start()
+    for t in runs:
+        t.join()
+    assert not errors
+    assert run_security_audit(uid, check_breaches=False).total == 301
+
+
+# ============================================================
+# STATS
+# ============================================================
+def _stats(api, uid):
+    body = api.get(f"/stats/{uid}").get_json()
+    return {k: body[k] for k in ("total", "active", "weak", "medium", "strong", "favorites", "trashed", "score")}
+
+
+def test_stats_counters_match_aggregate(api, vault_entry, monkeypatch):
+    import backend_api.app as backend
+
+    uid, pid = vault_entry
+    for i, strength in enumerate(["weak", "strong", "strong", "medium"]):
+        api.post("/passwords", json={"user_id": uid, "site_name": f"s{i}", "username": "me",
+                                     "encrypted_password": "x", "strength": strength})
+    api.post(f"/passwords/{pid}/favorite")
+    monkeypatch.setattr(backend, "STATS_COUNTERS", False)
+    expected = _stats(api, uid)
+    monkeypatch.setattr(backend, "STATS_COUNTERS", True)
+    assert _stats(api, uid) == expected          # built by INSERT ... SELECT
+    api.post(f"/passwords/{pid}/favorite")
+    monkeypatch.setattr(backend, "STATS_COUNTERS", False)
+    expected = _stats(api, uid)
+    monkeypatch.setattr(backend, "STATS_COUNTERS", True)
+    assert _stats(api, uid) == expected          # kept up to date by the write
+
+    # a write while counters are off must not leave a stale row behind
+    monkeypatch.setattr(backend, "STATS_COUNTERS", False)
+    api.post("/passwords", json={"user_id": uid, "site_name": "late", "username": "me",
+                                 "encrypted_password": "x", "strength": "weak"})
+    expected = _stats(api, uid)
+    monkeypatch.setattr(backend, "STATS_COUNTERS", True)
+    assert _stats(api, uid) == expected
+
+
+def test_stats_served_when_counters_cannot_be_built(api, vault_entry, monkeypatch):
+    import backend_api.app as backend
+    from sqlalchemy.exc import OperationalError
+
+    def busy(db, user_id):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+    monkeypatch.setattr(backend, "_build_counters", busy)
+    uid, _ = vault_entry
+    res = api.get(f"/stats/{uid}")
+    assert res.status_code == 200 and res.get_json()["total"] == 1
+
+
+def test_stats_runs_reuse_query_once(api, vault_entry):
+    from sqlalchemy import event
+
+    from database.engine import engine
+
+    uid, _ = vault_entry
+    for site in ("a", "b", "c"):
+        api.post("/passwords", json={"user_id": uid, "site_name": site, "username": "me",
+                                     "encrypted_password": "same-password", "strength": "weak"})
+    api.get(f"/stats/{uid}")                      # counters built
+    statements = []
+
+    def seen(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", seen)
+    try:
+        body = api.get(f"/stats/{uid}").get_json()
+    finally:
+        event.remove(engine, "before_cursor_execute", seen)
+    assert sum("GROUP BY passwords.fingerprint" in q for q in statements) == 1
+    assert (body["reused"], body["reused_groups"]) == (3, 1)
+    assert api.get(f"/audit/{uid}").get_json()["reused"] == 3
+
+
+# ============================================================
+# HIBP RANGE CACHE
+# ============================================================
+def _sha1(pw):
+    return hashlib.sha1(pw.encode("utf-8")).hexdigest().upper()
+
+
+@pytest.fixture
+def hibp():
+    from src.security.hibp_server import HIBPStandIn
+
+    with HIBPStandIn(passwords={"password": 42, "hunter2": 7}) as srv:
+        yield srv
+
+
+def test_hibp_counts_through_cache(hibp, tmp_path):
+    from src.security.hibp_cache import RangeCache
+    from src.security.password_tools import HIBPRangeSource
+
+    cache = RangeCache(str(tmp_path / "ranges.db"))
+    source = HIBPRangeSource(url=hibp.url, cache=cache)
+    assert source.count(_sha1("password")) == 42
+    assert source.count(_sha1("password")) == 42
+    assert source.count(_sha1("not-in-the-corpus-x")) == 0
+    assert hibp.requests[_sha1("password")[:5]] == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # survives a restart
+    cache.close()
+    again = HIBPRangeSource(url=hibp.url, cache=RangeCache(str(tmp_path / "ranges.db")))
+    assert again.count(_sha1("password")) == 42
+    assert hibp.requests[_sha1("password")[:5]] == 1
+
+
+def test_hibp_cache_expires(hibp, tmp_path):
+    from src.security.hibp_cache import RangeCache
+    from src.security.password_tools import HIBPRangeSource
+
+    source = HIBPRangeSource(url=hibp.url, cache=RangeCache(str(tmp_path / "ranges.db"), ttl=0))
+    source.count(_sha1("hunter2"))
+    source.count(_sha1("hunter2"))
+    assert hibp.requests[_sha1("hunter2")[:5]] == 2
+
+
+def test_hibp_concurrent_lookups_share_one_request(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.security.hibp_cache import RangeCache
+    from src.security.hibp_server import HIBPStandIn
+    from src.security.password_tools import HIBPRangeSource
+
+    with HIBPStandIn(passwords={"password": 42}, delay=0.2) as srv:
+        cache = RangeCache(str(tmp_path / "ranges.db"))
+        source = HIBPRangeSource(url=srv.url, cache=cache)
+        with ThreadPoolExecutor(8) as pool:
+            counts = list(pool.map(lambda _: source.count(_sha1("password")), range(8)))
+    assert counts == [42] * 8
+    assert srv.requests[_sha1("password")[:5]] == 1
+    assert cache.coalesced == 7
+
+
+def test_hibp_cache_evicts_least_recently_used(tmp_path):
+    from src.security.hibp_cache import RangeCache
+
+    cache = RangeCache(str(tmp_path / "ranges.db"), max_bytes=4096)
+    noise = "".join(f"{hashlib.sha1(bytes([i])).hexdigest()[5:]}:{i}\r\n" for i in range(64))
+    for prefix in ("00000", "11111", "22222", "33333", "44444"):
+        cache.put(prefix, noise + prefix)
+        time.sleep(0.01)
+        cache.get("00000")          # keep the first one hot
+        time.sleep(0.01)
+    assert cache.get("00000") is not None
+    assert cache.get("11111") is None
+
+
+# ============================================================
+# MIGRATIONS
+# ============================================================
+# columns each step adds, as (table, column)
+_ADDED = [
+    ("users", "mfa_enabled"), ("users", "totp_enabled"), ("users", "totp_secret"),
+    ("users", "kdf_iterations"), ("passwords", "change_seq"), ("passwords", "fingerprint"),
+    ("activity_logs", "action_type"), ("sync_state", "pruned_seq"),
+]
+
+
+@pytest.fixture
+def scratch(tmp_path):
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _columns(engine, table):
+    from sqlalchemy import inspect
+
+    return {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def _make_legacy(engine):
+    """Current schema minus every migrated column and the version row."""
+    from sqlalchemy import inspect, text
+
+    from database.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in {t for t, _ in _ADDED}:
+            dropped = {c for t, c in _ADDED if t == table}
+            for index in inspect(conn).get_indexes(table):
+                if dropped & set(index["column_names"]):
+                    conn.execute(text(f"DROP INDEX {index['name']}"))
+            for column in dropped:
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+        conn.execute(text("DROP TABLE schema_version"))
+        conn.execute(text("DROP TABLE sync_cursors"))
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, password_hash, salt, email_verified, created_at) "
+            "VALUES (1, 'u', 'u@x', 'h', 's', 1, CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "INSERT INTO activity_logs (user_id, action, created_at) VALUES "
+            "(1, 'password:add:github', CURRENT_TIMESTAMP), (1, 'login', CURRENT_TIMESTAMP)"
+        ))
+
+
+def test_fresh_database_is_stamped_head(scratch):
+    from database.migrations import HEAD, current_version, migrate
+
+    assert current_version(scratch) is None
+    assert migrate(scratch) == 0
+    assert current_version(scratch) == HEAD
+    assert all(c in _columns(scratch, t) for t, c in _ADDED)
+
+
+def test_legacy_database_runs_every_step(scratch):
+    from sqlalchemy import inspect, text
+
+    from database.migrations import HEAD, current_version, migrate
+
+    _make_legacy(scratch)
+    assert current_version(scratch) is None
+    assert migrate(scratch) == HEAD
+    assert current_version(scratch) == HEAD
+    assert all(c in _columns(scratch, t) for t, c in _ADDED)
+    with scratch.connect() as conn:
+        types = conn.execute(text("SELECT action_type FROM activity_logs ORDER BY id")).scalars().all()
+        indexes = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert types == ["password", "login"]
+    assert {"ix_passwords_user_fingerprint", "ix_activity_logs_user_type_created",
+            "ix_activity_logs_type_created_id"} <= indexes
+    assert inspect(scratch).has_table("sync_cursors")
+    assert migrate(scratch) == 0
+
+
+def test_interrupted_upgrade_resumes(scratch):
+    from database.migrations import HEAD, _stamp, current_version, migrate
+
+    _make_legacy(scratch)
+    migrate(scratch)
+    _stamp(scratch, HEAD - 2)
+    assert migrate(scratch) == 2            # steps are idempotent on re-run
+    assert current_version(scratch) == HEAD
+
+
+def test_baseline_is_frozen_at_v1(scratch):
+    from sqlalchemy import inspect
+
+    from database.migrations import _baseline
+
+    _baseline(scratch)
+    assert not inspect(scratch).has_table("sync_cursors")      # added by a later step
+    assert "pruned_seq" not in _columns(scratch, "sync_state")
+
+
+def test_concurrent_upgrades_run_each_step_once(scratch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from sqlalchemy import create_engine
+
+    from database.migrations import HEAD, current_version, migrate
+
+    _make_legacy(scratch)
+    engines = [create_engine(scratch.url) for _ in range(3)]
+    try:
+        with ThreadPoolExecutor(len(engines)) as pool:
+            ran = list(pool.map(migrate, engines))
+    finally:
+        for e in engines:
+            e.dispose()
+    assert sorted(ran) == [0, 0, HEAD]
+    assert current_version(scratch) == HEAD
+
+
+def test_newer_schema_is_refused(scratch):
+    from database.migrations import HEAD, _stamp, migrate
+
+    migrate(scratch)
+    _stamp(scratch, HEAD + 1)
+    with pytest.raises(RuntimeError):
+        migrate(scratch)
+
+
+# ============================================================
+# RE-ENCRYPTION
+# ============================================================
+def _legacy_row(s, user_id, plain):
+    from database.models import Password
+    from src.security.encryption import encrypt_aes_gcm
+
+    p = Password(user_id=user_id, site_name="old", username="me", encrypted_password=encrypt_aes_gcm(plain))
+    s.add(p)
+    s.commit()
+    return p.id
+
+
+def test_reencrypt_bumps_change_seq_and_reopens(vault_entry):
+    from database.engine import SessionLocal
+    from database.models import Password
+    from database.sync import current_seq
+    from src.security.encryption import decrypt_any
+    from src.security.reencrypt import ReencryptJob
+
+    uid, _ = vault_entry
+    with SessionLocal() as s:
+        first = _legacy_row(s, uid, "one")
+    job = ReencryptJob(uid, pause=0)
+    assert job.run().converted == 1
+    with SessionLocal() as s:
+        row = s.get(Password, first)
+        assert not row.encrypted_password.startswith("gcm1:") and decrypt_any(row.encrypted_password) == "one"
+        assert row.change_seq == current_seq(s, uid) > 0
+        second = _legacy_row(s, uid, "two")
+
+    progress = ReencryptJob(uid, pause=0).run()
+    assert progress.done and progress.converted == 1
+    with SessionLocal() as s:
+        assert decrypt_any(s.get(Password, second).encrypted_password) == "two"
+        assert s.get(Password, second).change_seq == current_seq(s, uid)
+
+
+# ============================================================
+# DELTA SYNC
+# ============================================================
+def _changes(api, uid, since=None, client=None):
+    args = {k: v for k, v in (("since", since), ("client", client)) if v is not None}
+    return api.get(f"/passwords/{uid}/changes", query_string=args).get_json()
+
+
+def test_next_seq_when_first_row_already_exists(vault_entry):
+    from types import SimpleNamespace
+
+    from database.engine import SessionLocal
+    from database.models import SyncState
+    from database.sync import next_seq
+
+    uid, _ = vault_entry
+
+    class LosesRace:
+        """The first bump matches nothing; a concurrent first write then creates the row."""
+        def __init__(self, s):
+            self.s, self.first = s, True
+
+        def execute(self, stmt, *args, **kwargs):
+            if self.first:
+                self.first = False
+                self.s.add(SyncState(user_id=uid, seq=4))
+                self.s.flush()
+                return SimpleNamespace(rowcount=0)
+            return self.s.execute(stmt, *args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self.s, name)
+
+    with SessionLocal() as s:
+        assert next_seq(LosesRace(s), uid) == 5
+        s.commit()
+
+
+def test_tombstones_pruned_behind_every_client(api, vault_entry):
+    from database.engine import SessionLocal
+    from database.models import PasswordTombstone
+
+    uid, pid = vault_entry
+    head = _changes(api, uid, client="a")["seq"]
+    _changes(api, uid, client="b")
+    assert api.delete(f"/passwords/{pid}").status_code == 200
+
+    seen = _changes(api, uid, since=head, client="a")
+    assert seen["deleted"] == [pid]
+    with SessionLocal() as s:       # "b" has not seen the delete yet
+        assert s.query(PasswordTombstone).filter_by(user_id=uid).count() == 1
+
+    assert _changes(api, uid, since=head, client="b")["deleted"] == [pid]
+    with SessionLocal() as s:
+        assert s.query(PasswordTombstone).filter_by(user_id=uid).count() == 0
+
+    # a client that never registered cannot replay the delete any more
+    assert _changes(api, uid, since=head)["reset"] is True
+    assert "reset" not in _changes(api, uid, since=seen["seq"], client="a")
+
+
+# ============================================================
+# SQLITE PRAGMAS
+# ============================================================
+def test_pragmas_from_env_are_normalised(monkeypatch):
+    from database.engine import sqlite_pragmas
+
+    monkeypatch.setenv("SQLITE_JOURNAL_MODE", " wal ")
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "1")
+    monkeypatch.setenv("SQLITE_CACHE_SIZE", "-2000")
+    pragmas = sqlite_pragmas()
+    assert pragmas["journal_mode"] == "WAL" and pragmas["synchronous"] == "1"
+    assert pragmas["cache_size"] == "-2000"
+
+
+@pytest.mark.parametrize("env, value", [
+    ("SQLITE_JOURNAL_MODE", "WAL; DROP TABLE users"),
+    ("SQLITE_SYNCHRONOUS", "SOMETIMES"),
+    ("SQLITE_BUSY_TIMEOUT_MS", "5000 OR 1"),
+    ("SQLITE_CACHE_SIZE", "MEMORY"),
+])
+def test_bad_pragma_values_rejected(monkeypatch, env, value):
+    from database.engine import sqlite_pragmas
+
+    monkeypatch.setenv(env, value)
+    with pytest.raises(ValueError):
+        sqlite_pragmas()
+
+
+def test_apply_rejects_unknown_pragma():
+    import sqlite3
+
+    from database.engine import apply_sqlite_pragmas
+
+    conn = sqlite3.connect(":memory:")
+    with pytest.raises(ValueError):
+        apply_sqlite_pragmas(conn, {"writable_schema": "ON"})
+    apply_sqlite_pragmas(conn, {"temp_store": "memory"})
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+    conn.close()
+
+
+# ============================================================
+# VAULT FILES
+# ============================================================
+VAULT_META = {"format": "pgvault", "exported_at": "2026-01-01T00:00:00"}
+VAULT_ITEMS = [{"site_name": f"site{i}", "username": "bob", "password": "x" * i} for i in range(40)]
+
+
+@pytest.fixture
+def fast_kdf(monkeypatch):
+    from src.security import encryption
+
+    monkeypatch.setattr(encryption, "_vault_kdf_params", lambda: {
+        "name": "argon2id", "time_cost": 1, "memory_cost": 8192, "parallelism": 1, "hash_len": 32,
+    })
+
+
+def _v2_vault(chunk_size=256):
+    import io
+
+    from src.security.encryption import encrypt_vault_stream
+
+    buf = io.BytesIO()
+    assert encrypt_vault_stream(buf, VAULT_META, iter(VAULT_ITEMS), "pass", chunk_size=chunk_size) == 40
+    return buf.getvalue()
+
+
+def _read_all(data, passphrase="pass"):
+    import io
+
+    from src.security.encryption import read_vault_file
+
+    return list(read_vault_file(io.BytesIO(data), passphrase))
+
+
+def test_vault_v2_round_trip(fast_kdf):
+    import types
+
+    from src.security.encryption import read_vault_file
+
+    data = _v2_vault()
+    assert len(data) > 40 * 40  # spread over many 256-byte frames
+    assert isinstance(read_vault_file(None, "pass"), types.GeneratorType)
+    meta, *items = _read_all(data)
+    assert meta == VAULT_META and items == VAULT_ITEMS
+
+
+def test_vault_v1_file_still_readable(fast_kdf):
+    import json
+
+    from src.security.encryption import encrypt_vault_payload
+
+    blob = encrypt_vault_payload(dict(VAULT_META, passwords=VAULT_ITEMS), "pass")
+    meta, *items = _read_all(json.dumps(blob).encode("utf-8"))
+    assert meta == VAULT_META and items == VAULT_ITEMS
+
+
+@pytest.mark.parametrize("cut", [5, 40, -1, -20])
+def test_vault_truncated(fast_kdf, cut):
+    data = _v2_vault()
+    with pytest.raises(ValueError):
+        _read_all(data[:cut])
+
+
+def test_vault_tampered(fast_kdf):
+    data = _v2_vault()
+    for pos in (20, len(data) // 2, len(data) - 1):  # header, a middle frame, the last tag
+        bad = bytearray(data)
+        bad[pos] ^= 0x01
+        with pytest.raises(ValueError):
+            _read_all(bytes(bad))
+    with pytest.raises(ValueError):
+        _read_all(data, "wrong")
+
+
+@pytest.mark.parametrize("field, value", [
+    ("memory_cost", 4 * 1024 * 1024),
+    ("time_cost", 1000),
+    ("parallelism", 0),
+    ("hash_len", 1 << 20),
+    ("name", "scrypt"),
+])
+def test_vault_kdf_header_out_of_range(fast_kdf, monkeypatch, field, value):
+    import json
+    import struct
+
+    from src.security import encryption
+
+    data = _v2_vault()
+    start = len(encryption.VAULT_V2_MAGIC)
+    (header_len,) = struct.unpack(">I", data[start:start + 4])
+    header = json.loads(data[start + 4:start + 4 + header_len])
+    header["kdf"][field] = value
+    raw = json.dumps(header).encode("utf-8")
+    crafted = data[:start] + struct.pack(">I", len(raw)) + raw + data[start + 4 + header_len:]
+
+    # rejected before any key derivation is attempted
+    monkeypatch.setattr(encryption, "_argon2_key", lambda *a, **k: pytest.fail("KDF ran"))
+    with pytest.raises(ValueError):
+        _read_all(crafted)
+
+
+# ============================================================
+# BULK IMPORT
+# ============================================================
+BULK_ITEMS = [
+    {"site_name": "BANK", "username": "Me", "encrypted_password": "new", "site_url": "https://bank", "strength": "strong"},
+    {"site_name": "mail", "username": "me", "encrypted_password": "m1", "strength": "weak"},
+    {"site_name": "Mail", "username": "ME", "encrypted_password": "m2", "category": "work"},  # same key as the row above
+    {"site_name": "broken"},
+]
+
+
+@pytest.mark.parametrize("mode, statuses, bank, mail", [
+    ("skip", ["skipped", "added", "skipped", "invalid"],
+     ("gcm2:secret", None, "medium"), ("m1", "personal", "weak")),
+    ("overwrite", ["updated", "added", "updated", "invalid"],
+     ("new", "https://bank", "strong"), ("m2", "work", "medium")),
+    ("merge", ["updated", "added", "skipped", "invalid"],
+     ("gcm2:secret", "https://bank", "medium"), ("m1", "personal", "weak")),
+])
+def test_bulk_import_modes(api, vault_entry, mode, statuses, bank, mail):
+    from database.engine import SessionLocal
+    from database.models import Password
+
+    uid, pid = vault_entry
+    res = api.post("/passwords/bulk", json={"user_id": uid, "mode": mode, "items": BULK_ITEMS}).get_json()
+    assert res["ok"] is True
+    assert [r["status"] for r in res["results"]] == statuses
+    for status in ("added", "updated", "skipped", "invalid"):
+        assert res[status] == statuses.count(status)
+
+    with SessionLocal() as s:
+        rows = {p.site_name.lower(): p for p in s.query(Password).filter_by(user_id=uid)}
+        assert set(rows) == {"bank", "mail"}
+        got_bank, got_mail = rows["bank"], rows["mail"]
+        assert (got_bank.encrypted_password, got_bank.site_url, got_bank.strength) == bank
+        assert (got_mail.encrypted_password, got_mail.category, got_mail.strength) == mail
+        mail_id = got_mail.id
+    assert [r["id"] for r in res["results"]] == [pid, mail_id, mail_id, None]
+
+
+@pytest.mark.parametrize("mode", ["skip", "overwrite", "merge"])
+def test_bulk_import_counters_and_sync(api, vault_entry, monkeypatch, mode):
+    import backend_api.app as backend
+
+    uid, pid = vault_entry
+    _stats(api, uid)                              # counters row built before the import
+    head = _changes(api, uid)["seq"]
+
+    res = api.post("/passwords/bulk", json={"user_id": uid, "mode": mode, "items": BULK_ITEMS}).get_json()
+    counted = _stats(api, uid)
+    monkeypatch.setattr(backend, "STATS_COUNTERS", False)
+    assert counted == _stats(api, uid)
+    monkeypatch.setattr(backend, "STATS_COUNTERS", True)
+
+    # one sequence bump for the whole request; exactly the written rows are reported
+    delta = _changes(api, uid, since=head)
+    assert delta["seq"] == head + 1
+    written = {r["id"] for r in res["results"] if r["status"] in ("added", "updated")}
+    assert {p["id"] for p in delta["changed"]} == written
+
+    # replaying the file changes nothing in skip / merge mode
+    again = api.post("/passwords/bulk", json={"user_id": uid, "mode": mode, "items": BULK_ITEMS}).get_json()
+    if mode != "overwrite":
+        assert again["added"] == again["updated"] == 0
+        assert _changes(api, uid)["seq"] == head + 1
+    assert _stats(api, uid) == counted
+
+
+# ============================================================
+# PASSWORD LIST PAGING
+# ============================================================
+@pytest.fixture
+def tied_vault(api, vault_entry):
+    """12 passwords whose last_updated values tie in groups of 5, 4 and 3."""
+    from sqlalchemy import text
+
+    from database.engine import SessionLocal
+
+    uid, pid = vault_entry
+    api.delete(f"/passwords/{pid}")
+    for i in range(12):
+        api.post("/passwords", json={"user_id": uid, "site_name": f"s{i:02}", "username": "me",
+                                     "encrypted_password": "x"})
+    with SessionLocal() as s:
+        # the textual form CURRENT_TIMESTAMP writes on SQLite
+        s.execute(text(
+            "UPDATE passwords SET last_updated = CASE WHEN CAST(substr(site_name, 2) AS INTEGER) < 5 "
+            "THEN '2026-01-03 10:00:00' WHEN CAST(substr(site_name, 2) AS INTEGER) < 9 "
+            "THEN '2026-01-02 10:00:00' ELSE '2026-01-01 10:00:00' END WHERE user_id = :u"
+        ), {"u": uid})
+        s.commit()
+    return uid
+
+
+def test_keyset_pages_across_ties(api, tied_vault):
+    uid = tied_vault
+    full = [p["id"] for p in api.get(f"/passwords/{uid}").get_json()]
+    assert len(full) == 12
+
+    for limit in (1, 2, 3, 5, 7):
+        seen, cursor = [], None
+        while True:
+            args = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            page = api.get(f"/passwords/{uid}", query_string=args).get_json()
+            assert len(page["items"]) <= limit
+            seen += [p["id"] for p in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == full, limit
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",                              # not base64
+    "bm90LWEtY3Vyc29y",                 # "not-a-cursor": no separator
+    "MjAyNi0wMS0wMXx4",                 # "2026-01-01|x": id not a number
+    "MjAyNi0xMy00NSAxMDowMDowMHwx",     # "2026-13-45 10:00:00|1": no such date
+])
+def test_malformed_cursor_is_400(api, vault_entry, cursor):
+    uid, _ = vault_entry
+    res = api.get(f"/passwords/{uid}", query_string={"cursor": cursor})
+    assert res.status_code == 400 and res.get_json()["error"] == "Invalid cursor"
+
+
+def test_fields_projection(api, tied_vault):
+    uid = tied_vault
+    page = api.get(f"/passwords/{uid}", query_string={"fields": "site_name,favorite", "limit": 4}).get_json()
+    assert all(set(p) == {"id", "site_name", "favorite", "last_updated"} for p in page["items"])
+    rest = api.get(f"/passwords/{uid}", query_string={"fields": "site_name", "cursor": page["next_cursor"]})
+    assert len(rest.get_json()["items"]) == 8
+
+    res = api.get(f"/passwords/{uid}", query_string={"fields": "site_name,password_hash"})
+    assert res.status_code == 400 and "password_hash" in res.get_json()["error"]
+
+
+# ============================================================
+# NDJSON EXPORT
+# ============================================================
+@pytest.fixture
+def big_vault(api, vault_entry, monkeypatch):
+    import backend_api.app as backend
+    from sqlalchemy import insert
+
+    from database.engine import SessionLocal
+    from database.models import Password
+
+    monkeypatch.setattr(backend, "EXPORT_CHUNK_BYTES", 4096)
+    monkeypatch.setattr(backend, "EXPORT_BATCH", 50)
+    uid, _ = vault_entry
+    with SessionLocal() as s:
+        s.execute(insert(Password), [
+            {"user_id": uid, "site_name": f"site{i}", "username": "me", "encrypted_password": f"gcm2:{i}"}
+            for i in range(299)
+        ])
+        s.commit()
+    return uid
+
+
+class _StreamedGet:
+    """The parts of a streamed requests.Response iter_export_vault uses."""
+
+    def __init__(self, res, max_chunks=None):
+        import itertools
+
+        self.ok, self.status_code = res.status_code < 400, res.status_code
+        self._chunks = itertools.islice(res.response, max_chunks)   # connection lost after max_chunks
+        self.chunks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_lines(self):
+        pending = b""
+        for chunk in self._chunks:
+            self.chunks += 1
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+
+def _client_over(api, max_chunks=None):
+    from src.backend.api_client import APIClient
+
+    client = APIClient("http://backend")
+    gets = []
+
+    def get(url, params=None, stream=False, timeout=None):
+        res = api.get(url[len("http://backend"):], query_string=params, buffered=False)
+        gets.append(_StreamedGet(res, max_chunks))
+        return gets[-1]
+    client.session.get = get
+    return client, gets
+
+
+def test_ndjson_export_streams_records_and_trailer(api, big_vault):
+    import json
+
+    res = api.get(f"/export/{big_vault}", query_string={"format": "ndjson"}, buffered=False)
+    assert res.mimetype == "application/x-ndjson"
+    chunks = list(res.response)
+    assert len(chunks) > 1                          # sent as it is read, not in one piece
+    lines = [json.loads(ln) for ln in b"".join(chunks).splitlines()]
+    header, records, trailer = lines[0], lines[1:-1], lines[-1]
+    assert header["version"] == 1 and "exported_at" in header
+    assert trailer == {"end": True, "count": 300} == {"end": True, "count": len(records)}
+    assert {r["site_name"] for r in records} == {"bank"} | {f"site{i}" for i in range(299)}
+
+
+def test_iter_export_vault_checks_trailer(api, big_vault):
+    client, gets = _client_over(api)
+    it = client.iter_export_vault(big_vault)
+    assert next(it)["version"] == 1
+    assert sum(1 for _ in it) == 300
+    assert gets[0].chunks > 1
+
+    client, _ = _client_over(api, max_chunks=2)
+    it = client.iter_export_vault(big_vault)
+    next(it)
+    with pytest.raises(RuntimeError, match="truncated"):
+        for _ in it:
+            pass
+
+
+# ============================================================
+# BATCH ENCRYPTION
+# ============================================================
+def _mixed_tokens(n):
+    """n tokens alternating Fernet / legacy gcm1, plaintexts "p0".."p{n-1}"."""
+    from src.security.encryption import encrypt_aes_gcm, encrypt_for_storage
+
+    return [(encrypt_for_storage if i % 2 else encrypt_aes_gcm)(f"p{i}") for i in range(n)]
+
+
+def test_decrypt_many_keeps_input_order():
+    from src.security.encryption import decrypt_any, decrypt_many, encrypt_many
+
+    tokens = _mixed_tokens(20)
+    assert decrypt_many(tokens, workers=1) == [f"p{i}" for i in range(20)]
+    assert decrypt_many([t.encode() for t in tokens[:3]], workers=1) == ["p0", "p1", "p2"]
+
+    encrypted = encrypt_many([f"q{i}" for i in range(20)], workers=1)
+    assert [decrypt_any(t) for t in encrypted] == [f"q{i}" for i in range(20)]
+
+
+@pytest.mark.parametrize("bad", ["gAAAAAbroken", "gcm1:AAAA", "plain", ""])
+def test_decrypt_many_bad_token_fails_only_itself(bad):
+    from src.security.encryption import decrypt_many
+
+    tokens = _mixed_tokens(6)
+    tokens[3] = bad
+    out = decrypt_many(tokens, strict=False, workers=1)
+    assert out == ["p0", "p1", "p2", None, "p4", "p5"]
+    with pytest.raises(ValueError):
+        decrypt_many(tokens, workers=1)
+
+
+def test_batch_thread_pool_path(monkeypatch):
+    import src.security.encryption as encryption
+
+    pools = []
+
+    class CountingPool(encryption.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+    monkeypatch.setattr(encryption, "ThreadPoolExecutor", CountingPool)
+    monkeypatch.setattr(encryption, "BATCH_CHUNK", 8)
+
+    tokens = _mixed_tokens(60)
+    tokens[41] = "gcm1:broken"
+    out = encryption.decrypt_many(tokens, strict=False, workers=4)
+    assert out == [None if i == 41 else f"p{i}" for i in range(60)]
+    assert len(pools) == 2                          # Fernet and gcm1 groups, 30 tokens each
+    with pytest.raises(ValueError):
+        encryption.decrypt_many(tokens, workers=4)
+
+    encrypted = encryption.encrypt_many([f"q{i}" for i in range(60)], workers=4)
+    assert encryption.decrypt_many(encrypted, workers=4) == [f"q{i}" for i in range(60)]
+
+
+# ============================================================
+# PASSWORD FINGERPRINTS
+# ============================================================
+def test_fingerprint_keyed_per_user():
+    from src.security.encryption import encrypt_aes_gcm, encrypt_for_storage
+    from src.security.fingerprint import fingerprints_many, password_fingerprint
+
+    a, b, legacy = encrypt_for_storage("hunter2"), encrypt_for_storage("hunter2"), encrypt_aes_gcm("hunter2")
+    assert a != b                                            # random IVs
+    assert len({password_fingerprint(1, t) for t in (a, b, legacy)}) == 1
+    assert password_fingerprint(1, a) != password_fingerprint(2, a)
+    assert password_fingerprint(1, a) != password_fingerprint(1, encrypt_for_storage("hunter3"))
+    assert fingerprints_many(1, [a, "hunter2"]) == [password_fingerprint(1, a)] * 2   # legacy plaintext row
+
+
+def test_fingerprint_follows_api_writes(api, vault_entry):
+    from database.engine import SessionLocal
+    from database.models import Password, User
+    from src.security.encryption import encrypt_for_storage
+
+    uid, _ = vault_entry
+    with SessionLocal() as s:
+        other = User(username="other", email=f"other{time.time_ns()}@example.com", password_hash="x", salt="x")
+        s.add(other)
+        s.commit()
+        other_id = other.id
+
+    def add(user_id, site, plaintext):
+        api.post("/passwords", json={"user_id": user_id, "site_name": site, "username": "me",
+                                     "encrypted_password": encrypt_for_storage(plaintext)})
+        with SessionLocal() as s:
+            return s.query(Password).filter_by(user_id=user_id, site_name=site).one().id
+
+    def fingerprint(pid):
+        with SessionLocal() as s:
+            return s.get(Password, pid).fingerprint
+
+    a, b, c = add(uid, "a", "same"), add(uid, "b", "same"), add(other_id, "a", "same")
+    assert fingerprint(a) == fingerprint(b) != fingerprint(c)
+    assert api.get(f"/stats/{uid}").get_json()["reused"] == 2
+
+    assert api.put(f"/passwords/{b}", json={"site_name": "renamed"}).get_json()["ok"]
+    assert fingerprint(b) == fingerprint(a)                  # not a password change
+
+    assert api.put(f"/passwords/{b}", json={"encrypted_password": encrypt_for_storage("changed")}).get_json()["ok"]
+    assert fingerprint(b) not in (None, fingerprint(a))
+    assert api.get(f"/stats/{uid}").get_json()["reused"] == 0
+
+    assert api.put(f"/passwords/{b}", json={"encrypted_password": encrypt_for_storage("same")}).get_json()["ok"]
+    assert fingerprint(b) == fingerprint(a)
+
+
+# ============================================================
+# BREACH INDEX
+# ============================================================
+@pytest.fixture(scope="module")
+def breach_dump(tmp_path_factory):
+    """A small SHA-1 dump (unsorted, with duplicates and both ends of the key space)
+    and the counts it should produce."""
+    import random
+
+    rng = random.Random(1234)
+    counts = {}
+    for _ in range(3000):
+        counts[rng.randbytes(20)] = rng.randint(1, 1000)
+    first, last = b"\x00" * 20, b"\xff" * 20
+    counts[first], counts[last] = 7, 9
+    lines = [f"{h.hex().upper()}:{n}" for h, n in counts.items()]
+    dup = next(iter(counts))
+    lines.append(f"{dup.hex()}:5")              # lower case, counted twice
+    counts[dup] += 5
+    rng.shuffle(lines)
+    path = tmp_path_factory.mktemp("breach") / "dump.txt"
+    path.write_text("# comment\n" + "\n".join(lines) + "\n")
+    return path, counts
+
+
+@pytest.fixture(scope="module")
+def breach_index(breach_dump):
+    from src.security.breach_index import build_breach_index
+
+    path, counts = breach_dump
+    out = path.with_name("breach.idx")
+    assert build_breach_index(str(path), str(out), run_records=700) == len(counts)   # several sorted runs
+    return out
+
+
+def test_breach_index_lookups(breach_dump, breach_index):
+    import random
+
+    from src.security.breach_index import BreachIndex
+
+    _, counts = breach_dump
+    with BreachIndex(str(breach_index)) as idx:
+        assert len(idx) == len(counts)
+        assert all(idx.count_sha1(h) == n for h, n in counts.items())
+        assert idx.count("00" * 20) == 7 and idx.count("FF" * 20) == 9     # first and last record
+        assert idx.count(next(iter(counts)).hex().upper()) == idx.count(next(iter(counts)).hex())
+
+        rng = random.Random(99)
+        misses = [rng.randbytes(20) for _ in range(2000)]
+        misses += [h[:19] + bytes([h[19] ^ 1]) for h in list(counts)[:200]]   # same fan-out bucket
+        assert all(idx.count_sha1(h) == 0 for h in misses if h not in counts)
+        assert idx.count_sha1(b"\x00" * 19 + b"\x01") == 0
+
+        prefix = next(iter(counts)).hex().upper()[:5]
+        expected = sorted((h.hex().upper()[5:], n) for h, n in counts.items() if h.hex().upper().startswith(prefix))
+        assert list(idx.range(prefix)) == expected
+        assert list(idx.digests()) == sorted(counts)
+
+
+def test_breach_index_rejects_bad_files(breach_index, tmp_path):
+    from src.security.breach_index import BreachIndex
+
+    data = breach_index.read_bytes()
+    for name, content in (("empty", b""), ("truncated", data[:-3]), ("other", b"NOTANIDX" + data[8:])):
+        path = tmp_path / name
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            BreachIndex(str(path))
+
+
+@pytest.mark.parametrize("source", ["index", "dump"])
+def test_bloom_has_no_false_negatives(breach_dump, breach_index, tmp_path, source):
+    import random
+
+    from src.security.breach_bloom import BloomFilter, build_bloom_from_file
+
+    dump, counts = breach_dump
+    out = tmp_path / "breach.bloom"
+    src = breach_index if source == "index" else dump
+    # the dump repeats one hash, so it counts one key more than the index
+    assert build_bloom_from_file(str(src), str(out), fp_rate=0.01)[0] == len(counts) + (source == "dump")
+    with BloomFilter(str(out)) as bloom:
+        assert all(bloom.might_contain(h) for h in counts)
+        assert all(h.hex() in bloom and h.hex().upper() in bloom for h in list(counts)[:50])
+
+        rng = random.Random(7)
+        misses = [h for h in (rng.randbytes(20) for _ in range(20000)) if h not in counts]
+        false_hits = sum(bloom.might_contain(h) for h in misses)
+        assert false_hits / len(misses) < 3 * 0.01
+        assert bloom.fp_rate < 0.02
+
+
+def test_bloom_guard_skips_inner_source_on_miss(breach_index, tmp_path):
+    from src.security.breach_bloom import BloomFilter, BloomGuardedSource, build_bloom_from_file
+    from src.security.breach_index import BreachIndex
+
+    out = tmp_path / "breach.bloom"
+    build_bloom_from_file(str(breach_index), str(out))
+    calls = []
+
+    class Inner(BreachIndex):
+        def count(self, sha1_hex):
+            calls.append(sha1_hex)
+            return super().count(sha1_hex)
+
+    with BloomFilter(str(out)) as bloom, Inner(str(breach_index)) as idx:
+        guarded = BloomGuardedSource(bloom, idx)
+        assert guarded.count("FF" * 20) == 9 and calls == ["FF" * 20]
+        absent = hashlib.sha1(b"not in the generated dump").hexdigest()
+        assert not idx.count_sha1(bytes.fromhex(absent)) and absent not in bloom
+        assert guarded.count(absent) == 0 and len(calls) == 1